@@ -0,0 +1,76 @@
+"""Profile context for the adviser chatbot.
+
+``build_context`` condenses a saved questionnaire profile into the few facts
+the adviser backend needs (risk category and score, goal, asset classes the
+user already holds) plus a one-line prompt fragment. ``AdviserContextCache``
+keeps the built context per user so a chat message costs a dictionary lookup
+rather than a profile read and formatting; entries are dropped whenever
+``database.save_user_profile`` writes that user's profile.
+"""
+import os
+import threading
+
+import database as db
+import risk_scoring
+from ttl_cache import TTLCache
+
+ADVISER_CONTEXT_CACHE_SIZE = int(os.environ.get('FINSENTIO_ADVISER_CONTEXT_CACHE_SIZE', '4096'))
+# Writes invalidate entries directly; the TTL only bounds staleness from other processes
+ADVISER_CONTEXT_CACHE_TTL = float(os.environ.get('FINSENTIO_ADVISER_CONTEXT_CACHE_TTL', '3600'))
+
+# Cached value for users without a saved profile
+_NO_CONTEXT = object()
+
+
+def build_context(profile):
+    """Structured adviser context for a profile dict (as returned by get_user_profile)"""
+    score, category = risk_scoring.score_profile(profile)
+    assets = list(profile.get('previous_investments') or [])
+    goal = profile.get('investment_goal')
+    prompt = f"Risk tolerance: {category} ({score:.0f}/100)."
+    if goal:
+        prompt += f" Goal: {goal}."
+    prompt += f" Has invested in: {', '.join(assets)}." if assets else " No previous investments."
+    return {
+        'risk_category': category,
+        'risk_score': score,
+        'investment_goal': goal,
+        'previous_investments': assets,
+        'preferred_allocation': profile.get('investment_allocation'),
+        'prompt': prompt,
+    }
+
+
+class AdviserContextCache:
+    """Per-user adviser contexts, rebuilt only after the user's profile changes"""
+
+    def __init__(self, maxsize=ADVISER_CONTEXT_CACHE_SIZE, ttl=ADVISER_CONTEXT_CACHE_TTL):
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        # Bumped on every profile write, so a build that raced a save is not cached
+        self._write_seq = 0
+        self._lock = threading.Lock()
+        db.add_profile_listener(self.invalidate)
+
+    def get(self, user_id):
+        """The user's context dict (shared: treat as read-only), or None without a profile"""
+        context = self._cache.get(user_id)
+        if context is None:
+            write_seq = self._write_seq
+            success, profile = db.get_user_profile(user_id)
+            if not success and profile != "Profile not found":
+                # A database error: answer without personalization, but don't cache it
+                return None
+            context = build_context(profile) if success else _NO_CONTEXT
+            with self._lock:
+                if write_seq == self._write_seq:
+                    self._cache.set(user_id, context)
+        return None if context is _NO_CONTEXT else context
+
+    def invalidate(self, user_id):
+        """Drop a user's context; called by database after every profile write"""
+        with self._lock:
+            self._write_seq += 1
+            self._cache.pop(user_id)
+
+    def stats(self):
+        return self._cache.stats()
@@ -0,0 +1,180 @@
+"""Response cache for the education chatbot.
+
+Questions are normalized (case, contractions, punctuation, whitespace and a
+light suffix stemmer) so "What is an ETF" and "what's an etf?" share one
+entry. Entries live in an LRU table with a TTL, can be written through to the
+``answer_cache`` table for warm restarts (``load()`` warms a new cache from
+it), and an optional token-overlap lookup serves near-duplicate questions.
+
+Only context-free first turns are cached: the key is the question alone, so
+``cached_stream_reply`` bypasses the cache whenever there is conversation
+history (a follow-up's answer depends on it) or a per-user context, which
+keeps the profile-personalized adviser tab out of it. Exact hits, similar hits
+and misses are counted in ``metrics`` per cache name.
+"""
+import os
+import threading
+import time
+
+import database as db
+import metrics
+from chat_backend import stream_reply
+from text_normalization import normalize_question
+from ttl_cache import TTLCache
+
+ANSWER_CACHE_SIZE = int(os.environ.get('FINSENTIO_ANSWER_CACHE_SIZE', '10000'))
+ANSWER_CACHE_TTL = float(os.environ.get('FINSENTIO_ANSWER_CACHE_TTL', str(24 * 60 * 60)))
+ANSWER_CACHE_PERSIST = os.environ.get('FINSENTIO_ANSWER_CACHE_PERSIST', '0') == '1'
+# Minimum Jaccard similarity for a near-duplicate hit; 0 disables similarity lookup
+ANSWER_CACHE_SIMILARITY = float(os.environ.get('FINSENTIO_ANSWER_CACHE_SIMILARITY', '0'))
+
+# Words ignored by the similarity lookup (the exact key keeps them)
+_STOPWORDS = frozenset(
+    "a an the is are was were be of to in on for and or what how why who which "
+    "do does did can could should would i me my you your it its this that there "
+    "about please tell explain mean means meaning".split()
+)
+
+
+class AnswerCache:
+    """LRU + TTL cache of chatbot answers keyed on normalized questions"""
+
+    def __init__(self, name='answers', maxsize=ANSWER_CACHE_SIZE, ttl=ANSWER_CACHE_TTL,
+                 persist=ANSWER_CACHE_PERSIST, similarity=ANSWER_CACHE_SIMILARITY):
+        self.label = f'cache={name}'
+        self.ttl = ttl
+        self.persist = persist
+        self.similarity = similarity
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        # token -> normalized keys containing it, for the similarity lookup
+        self._index = {}
+        self._index_size = 0
+        self._lock = threading.Lock()
+        self.exact_hits = 0
+        self.similar_hits = 0
+        self.misses = 0
+
+    def get(self, question):
+        """Return a cached answer for the question, or None"""
+        key = normalize_question(question)
+        answer = self._cache.get(key)
+        if answer is None and self.similarity > 0:
+            answer = self._similar(key)
+            if answer is not None:
+                with self._lock:
+                    self.similar_hits += 1
+                metrics.inc('finsentio_answer_cache_similar_hits_total', self.label)
+                return answer
+        with self._lock:
+            if answer is None:
+                self.misses += 1
+            else:
+                self.exact_hits += 1
+        if answer is None:
+            metrics.inc('finsentio_answer_cache_misses_total', self.label)
+        else:
+            metrics.inc('finsentio_answer_cache_exact_hits_total', self.label)
+        return answer
+
+    def put(self, question, answer):
+        """Cache an answer (and write it through to SQLite if persistent)"""
+        key = normalize_question(question)
+        self._cache.set(key, answer)
+        if self.similarity > 0:
+            self._add_to_index(key)
+        if self.persist:
+            with db.get_db_connection() as conn:
+                conn.execute(
+                    'INSERT OR REPLACE INTO answer_cache (question_key, answer, expires_at) VALUES (?, ?, ?)',
+                    (key, answer, time.time() + self.ttl)
+                )
+                conn.commit()
+
+    def load(self):
+        """Warm the cache from SQLite, dropping expired rows; return entries loaded"""
+        now = time.time()
+        with db.get_db_connection() as conn:
+            conn.execute('DELETE FROM answer_cache WHERE expires_at <= ?', (now,))
+            conn.commit()
+            rows = conn.execute(
+                'SELECT question_key, answer, expires_at FROM answer_cache ORDER BY expires_at DESC LIMIT ?',
+                (self._cache.maxsize,)
+            ).fetchall()
+        # Oldest first so the freshest entries end up most recently used
+        for row in reversed(rows):
+            self._cache.set(row['question_key'], row['answer'], ttl=row['expires_at'] - now)
+            if self.similarity > 0:
+                self._add_to_index(row['question_key'])
+        return len(rows)
+
+    def _tokens(self, key):
+        return frozenset(word for word in key.split() if word not in _STOPWORDS)
+
+    def _add_to_index(self, key):
+        with self._lock:
+            for token in self._tokens(key):
+                keys = self._index.setdefault(token, set())
+                if key not in keys:
+                    keys.add(key)
+                    self._index_size += 1
+            # Evicted keys are only removed lazily; rebuild once they dominate
+            if self._index_size > 4 * max(len(self._cache), 1) + 1000:
+                self._rebuild_index()
+
+    def _rebuild_index(self):
+        self._index = {}
+        self._index_size = 0
+        for key in self._cache.keys():
+            for token in self._tokens(key):
+                self._index.setdefault(token, set()).add(key)
+                self._index_size += 1
+
+    def _similar(self, key):
+        """Best cached answer whose token set overlaps enough with the key's"""
+        tokens = self._tokens(key)
+        if not tokens:
+            return None
+        with self._lock:
+            candidates = set()
+            for token in tokens:
+                candidates.update(self._index.get(token, ()))
+        best_score, best_key = 0.0, None
+        for candidate in candidates:
+            other = self._tokens(candidate)
+            score = len(tokens & other) / len(tokens | other)
+            if score > best_score:
+                best_score, best_key = score, candidate
+        if best_key is None or best_score < self.similarity:
+            return None
+        return self._cache.get(best_key)
+
+    def stats(self):
+        """Hit/miss counters and hit rate"""
+        with self._lock:
+            lookups = self.exact_hits + self.similar_hits + self.misses
+            hits = self.exact_hits + self.similar_hits
+            return {
+                'exact_hits': self.exact_hits,
+                'similar_hits': self.similar_hits,
+                'misses': self.misses,
+                'hit_rate': hits / lookups if lookups else 0.0,
+                'size': len(self._cache),
+            }
+
+
+def cached_stream_reply(cache, backend, endpoint, message, history, context=None):
+    """stream_reply with an answer cache in front; follow-ups and personalized (context) replies bypass it"""
+    if history or context is not None:
+        yield from stream_reply(backend, endpoint, message, history, context)
+        return
+
+    answer = cache.get(message)
+    if answer is not None:
+        yield answer
+        return
+
+    reply = None
+    for reply in stream_reply(backend, endpoint, message, history):
+        yield reply
+    if reply:
+        cache.put(message, reply)
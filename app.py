@@ -1,101 +1,353 @@
+import asyncio
+import functools
 import gradio as gr
 import database as db
+import chat_history
+import metrics
+from adviser_context import AdviserContextCache
+from answer_cache import AnswerCache, cached_stream_reply
+from batch_scheduler import CHAT_BATCHING, CHAT_QUEUE_LIMIT, BatchScheduler, SchedulerBusy
+from chat_backend import PlaceholderBackend, load_backend, stream_reply
+from cohort_stats import ALL_USERS, format_comparison
+from db_executor import DBQueueFull
+from glossary_index import format_answer, open_index
+import monte_carlo
+from portfolio_analytics import WINDOWS, format_report, load_dataset
+from sessions import SessionStore
 
-# Global user session state
-current_user = None
+# The objects below are built on first use (or by create_app), so importing this
+# module opens nothing, registers no listeners and starts no threads
 
-def login(username, password):
-    """Login function for the interface"""
-    global current_user
-    success, result = db.authenticate_user(username, password)
+# Logged-in users are tracked per browser session: each client holds an opaque
+# token in gr.State and handlers resolve it to a user id through the store
+@functools.cache
+def get_sessions():
+    """The session store"""
+    return SessionStore()
+
+# Model backends for the two chatbot tabs (see chat_backend.load_backend)
+def _chat_backend(env_var, name, placeholder):
+    """The backend named by env_var (else a placeholder), behind a BatchScheduler with CHAT_BATCHING"""
+    backend = load_backend(env_var, PlaceholderBackend(placeholder))
+    if CHAT_BATCHING:
+        # Concurrent messages share micro-batched inference calls (see batch_scheduler)
+        backend = BatchScheduler(backend, name)
+    return backend
+
+@functools.cache
+def get_education_backend():
+    """The education chatbot backend"""
+    return _chat_backend('FINSENTIO_EDUCATION_BACKEND', 'education',
+                         "This is the Education Chatbot. It will be implemented soon!")
+
+@functools.cache
+def get_advisor_backend():
+    """The advisor chatbot backend"""
+    return _chat_backend('FINSENTIO_ADVISOR_BACKEND', 'advisor',
+                         "This is the Advisor & Analyzer Chatbot. It will be implemented soon!")
+
+# Gradio runs one call per event at a time by default, which would leave nothing to batch
+CHAT_CONCURRENCY = CHAT_QUEUE_LIMIT if CHAT_BATCHING else 'default'
+
+# FAQ-style opening questions repeat across users, so their answers are cached
+# (and, if persisted, warmed from SQLite by create_app)
+@functools.cache
+def get_education_answers():
+    """The education answer cache"""
+    return AnswerCache('education')
+
+# "What is X" questions about glossary terms are answered locally, without the backend
+@functools.cache
+def get_glossary():
+    """The glossary index, opened on first use; None without a corpus or a usable index"""
+    return open_index()
+
+# The adviser sees each user's profile, condensed once per profile save
+@functools.cache
+def get_adviser_contexts():
+    """The per-user adviser context cache (registers its profile listener when built)"""
+    return AdviserContextCache()
+
+# Answers the profile form starts with, in the order of its inputs and outputs
+PROFILE_DEFAULTS = {
+    'risk_taker': 'Cautious',
+    'risk_word': 'Uncertainty',
+    'game_show': '$1,000 in cash',
+    'investment_allocation': '60% in low-risk, 30% in medium-risk, 10% in high-risk investments',
+    'market_follow': 'Weekly',
+    'new_investment': 'Research thoroughly before investing',
+    'buy_things': 'Neutral',
+    'finance_reading': 'Neutral',
+    'previous_investments': [],
+    'investment_goal': 'Long-term savings',
+}
+PROFILE_FIELDS = tuple(PROFILE_DEFAULTS)
+
+# What the profile form shows as far as the server knows (None: unknown, e.g.
+# after logout) and whether the user has a stored profile
+PROFILE_VIEW_START = {'shown': PROFILE_DEFAULTS, 'stored': False}
+
+def _profile_updates(profile, shown=None):
+    """One update per form field, carrying a value only where the form shows something else"""
+    updates = []
+    for field in PROFILE_FIELDS:
+        value = profile.get(field, PROFILE_DEFAULTS[field])
+        updates.append(gr.update() if shown is not None and shown.get(field) == value else gr.update(value=value))
+    return tuple(updates)
+
+def _chat_histories(user_id):
+    """The latest page of both conversations, with their chat views"""
+    outputs = []
+    for tab, welcome in (('education', EDUCATION_WELCOME), ('advisor', ADVISER_WELCOME)):
+        turns = chat_history.recent_turns(user_id, tab)
+        view = dict(CHAT_VIEW_START, oldest_id=turns[0][0] if turns else None)
+        outputs += [chat_history.as_pairs(turns) or [welcome], view]
+    return tuple(outputs)
+
+def _hydrate(user_id, profile_view):
+    """Profile form updates, profile view and chat histories for a freshly logged-in user"""
+    found, profile_data = db.get_user_profile(user_id)
+    profile = profile_data if found else PROFILE_DEFAULTS
+    shown = (profile_view or PROFILE_VIEW_START)['shown']
+    return (found, {'shown': dict(profile), 'stored': found},
+            _profile_updates(profile, shown), _chat_histories(user_id))
+
+def _login_failed(message, profile_view):
+    return ((message, gr.update(visible=True), gr.update(visible=False), None, profile_view)
+            + (gr.update(),) * (len(PROFILE_FIELDS) + 4))
+
+async def login(username, password, profile_view=None):
+    """Log in and return the whole dashboard (profile form and chats) in one response"""
+    # Password hashing runs on the hashing pool, keeping Gradio workers free
+    success, result = await db.authenticate_user_async(username, password)
     
-    if success:
-        current_user = result
-        # Try to load user profile
-        profile_success, profile_data = db.get_user_profile(current_user)
-        if profile_success:
-            # User has an existing profile, we'll need to populate form in the load_profile function
-            return "Login successful!", gr.update(visible=False), gr.update(visible=True)
-        else:
-            # User doesn't have a profile yet
-            return "Login successful! Please complete your profile.", gr.update(visible=False), gr.update(visible=True)
-    else:
-        return f"Login failed: {result}", gr.update(visible=True), gr.update(visible=False)
+    if not success:
+        return _login_failed(f"Login failed: {result}", profile_view)
+    
+    try:
+        token = await get_sessions().create_async(result)
+        # The profile and chat reads go to the DB executor in one hop
+        found, profile_view, updates, chats = await db.run_async(_hydrate, result, profile_view)
+    except (DBQueueFull, asyncio.TimeoutError):
+        return _login_failed(f"Login failed: {db.SERVER_BUSY_MESSAGE}", profile_view)
+    message = "Login successful!" if found else "Login successful! Please complete your profile."
+    return (message, gr.update(visible=False), gr.update(visible=True), token, profile_view) + updates + chats
 
-def register(username, password, email, confirm_password):
+async def register(username, password, email, confirm_password):
     """Register function for the interface"""
     if password != confirm_password:
         return "Passwords do not match", gr.update(visible=True), gr.update(visible=False)
     
-    success, message = db.register_user(username, password, email)
+    success, message = await db.register_user_async(username, password, email)
     
     if success:
         return f"{message}. Please login.", gr.update(visible=True), gr.update(visible=False)
     else:
         return message, gr.update(visible=True), gr.update(visible=False)
 
-def logout():
+async def logout(session_token):
     """Logout function for the interface"""
-    global current_user
-    current_user = None
-    return gr.update(visible=True), gr.update(visible=False)
-
-def save_profile(risk_taker, risk_word, game_show, investment_allocation, 
-                market_follow, new_investment, buy_things, finance_reading,
-                previous_investments, investment_goal):
-    """Save user profile information to the database"""
-    if current_user is None:
-        return "Error: User not logged in"
+    await get_sessions().delete_async(session_token)
+    # The next user's login rewrites the whole profile form
+    return gr.update(visible=True), gr.update(visible=False), None, dict(PROFILE_VIEW_START, shown=None)
+
+async def save_profile(session_token, risk_taker, risk_word, game_show, investment_allocation, 
+                       market_follow, new_investment, buy_things, finance_reading,
+                       previous_investments, investment_goal, profile_view=None):
+    """Save the answers that changed since the form was loaded or last saved"""
+    user_id = await get_sessions().get_user_async(session_token)
+    if user_id is None:
+        return "Error: User not logged in", profile_view
     
     # Checkbox groups için özel işlem, liste şeklinde geliyorlar
     previous_investments_list = previous_investments if isinstance(previous_investments, list) else []
-    
-    success, message = db.save_user_profile(
-        current_user,
+    answers = dict(zip(PROFILE_FIELDS, (
         risk_taker, risk_word, game_show, investment_allocation,
         market_follow, new_investment, buy_things, finance_reading,
         previous_investments_list, investment_goal
-    )
+    )))
+    
+    # A first profile is saved whole; later saves send only what the user changed
+    view = profile_view or dict(PROFILE_VIEW_START, shown=None)
+    if view['stored'] and view['shown'] is not None:
+        changes = {field: value for field, value in answers.items() if view['shown'].get(field) != value}
+    else:
+        changes = answers
+    if not changes:
+        return "No changes to save.", profile_view
+    
+    success, message = await db.update_user_profile_async(user_id, changes)
     
     if success:
-        return "Profile saved successfully!"
+        return "Profile saved successfully!", {'shown': answers, 'stored': True}
     else:
-        return f"Error saving profile: {message}"
+        return f"Error saving profile: {message}", profile_view
 
-def load_profile():
-    """Load user profile from database"""
-    if current_user is None:
-        return (gr.update(), gr.update(), gr.update(), gr.update(), gr.update(), 
-                gr.update(), gr.update(), gr.update(), gr.update(), gr.update())
+async def load_profile(session_token):
+    """Reset the profile form to the stored profile"""
+    user_id = await get_sessions().get_user_async(session_token)
+    if user_id is None:
+        return (gr.update(),) * len(PROFILE_FIELDS) + (gr.update(),)
+    
+    success, profile_data = await db.get_user_profile_async(user_id)
+    
+    if not success:
+        return (gr.update(),) * len(PROFILE_FIELDS) + (gr.update(),)
     
-    success, profile_data = db.get_user_profile(current_user)
+    # Return updates for all fields: the form may hold unsaved edits
+    return _profile_updates(profile_data) + ({'shown': dict(profile_data), 'stored': True},)
+
+def _peer_comparison(user_id):
+    """The comparison table for a user, from their profile and the cohort counters"""
+    success, profile_data = db.get_user_profile(user_id)
+    if not success:
+        return "Save your profile first to see how your answers compare."
     
+    success, score = db.get_user_risk_score(user_id)
+    category = score[1] if success else None
+    success, everyone = db.get_cohort_counts(ALL_USERS)
     if not success:
-        return (gr.update(), gr.update(), gr.update(), gr.update(), gr.update(), 
-                gr.update(), gr.update(), gr.update(), gr.update(), gr.update())
+        return f"Error: {everyone}"
+    peers = ({}, 0)
+    if category:
+        success, counts = db.get_cohort_counts(category)
+        if success:
+            peers = counts
+    return format_comparison(profile_data, category, everyone, peers)
+
+async def compare_with_peers(session_token):
+    """Share of all investors, and of the user's risk category, who gave each of the user's answers"""
+    user_id = await get_sessions().get_user_async(session_token)
+    if user_id is None:
+        return "Error: User not logged in"
+    
+    try:
+        return await db.run_async(_peer_comparison, user_id)
+    except (DBQueueFull, asyncio.TimeoutError):
+        return f"Error: {db.SERVER_BUSY_MESSAGE}"
+
+def _allocation_report(selected, window):
+    dataset = load_dataset()
+    if dataset is None:
+        return "Market analysis is not available: no price data has been installed."
+    return format_report(dataset, selected, window)
+
+async def analyze_allocation(session_token, period):
+    """Compare the questionnaire's allocation mixes on local price data, highlighting the user's"""
+    user_id = await get_sessions().get_user_async(session_token)
+    if user_id is None:
+        return "Error: User not logged in"
     
-    # Return updates for all fields
-    return (
-        gr.update(value=profile_data.get('risk_taker', 'Cautious')),
-        gr.update(value=profile_data.get('risk_word', 'Uncertainty')),
-        gr.update(value=profile_data.get('game_show', '$1,000 in cash')),
-        gr.update(value=profile_data.get('investment_allocation', '60% in low-risk, 30% in medium-risk, 10% in high-risk investments')),
-        gr.update(value=profile_data.get('market_follow', 'Weekly')),
-        gr.update(value=profile_data.get('new_investment', 'Research thoroughly before investing')),
-        gr.update(value=profile_data.get('buy_things', 'Neutral')),
-        gr.update(value=profile_data.get('finance_reading', 'Neutral')),
-        gr.update(value=profile_data.get('previous_investments', [])),
-        gr.update(value=profile_data.get('investment_goal', 'Long-term savings'))
+    success, profile_data = await db.get_user_profile_async(user_id)
+    selected = profile_data.get('investment_allocation') if success else None
+    # Loading (or converting) the price data and the NumPy work run in a thread, off the event loop
+    return await asyncio.to_thread(_allocation_report, selected, WINDOWS.get(period))
+
+async def project_outcomes(session_token):
+    """Monte Carlo projection of the user's allocation over their investment goal's horizon"""
+    user_id = await get_sessions().get_user_async(session_token)
+    if user_id is None:
+        return "Error: User not logged in"
+    
+    success, profile_data = await db.get_user_profile_async(user_id)
+    if not success or profile_data.get('investment_allocation') not in monte_carlo.ALLOCATION_MIXES:
+        return "Save your profile first to see projections for your allocation."
+    
+    goal = profile_data.get('investment_goal')
+    result = await asyncio.to_thread(monte_carlo.project, profile_data['investment_allocation'], goal)
+    return monte_carlo.format_projection(result, goal)
+
+EDUCATION_WELCOME = ["System", "Welcome to the Financial Education Chatbot! How can I help you learn today?"]
+ADVISER_WELCOME = ["System", "Welcome to your personalized Financial Adviser! How can I assist you today?"]
+
+# What a chat tab shows: turns from oldest_id on (None: nothing shown yet), at most
+# chat_history.CHAT_VIEW_TURNS of them;
+# start_id is the last turn before the most recent "Clear Chat"
+CHAT_VIEW_START = {'oldest_id': None, 'start_id': 0}
+
+def _chat_exchange(tab, message, session_token, view, reply_stream):
+    """Stream one exchange; the conversation is rebuilt from server-side history"""
+    user_id = get_sessions().get_user(session_token)
+    if user_id is None:
+        yield [[message, "Please log in again to continue the conversation."]], view
+        return
+    
+    view = dict(view or CHAT_VIEW_START)
+    # Each exchange sends back only the latest page; older turns come back through "Load earlier messages"
+    turns = chat_history.recent_turns(user_id, tab, chat_history.CHAT_PAGE_SIZE - 1, view['start_id'])
+    if turns:
+        view['oldest_id'] = turns[0][0]
+    shown = chat_history.as_pairs(turns)
+    history = chat_history.context_window(user_id, tab, view['start_id'])
+    
+    reply = ''
+    try:
+        for reply in reply_stream(message, history, user_id):
+            yield shown + [[message, reply]], view
+    except SchedulerBusy as e:
+        yield shown + [[message, str(e)]], view
+        return
+    
+    turn_id = chat_history.append_turn(user_id, tab, message, reply)
+    if view['oldest_id'] is None:
+        view['oldest_id'] = turn_id
+    yield shown + [[message, reply]], view
+
+# Chatbot functions: generators that stream the reply into the chat as it is produced
+def _education_reply(message, history, user_id):
+    """Glossary definition if the question asks for one, otherwise the (cached) backend reply"""
+    glossary = get_glossary()
+    entry = glossary.lookup(message) if glossary is not None else None
+    if entry is not None:
+        yield format_answer(entry)
+        return
+    yield from cached_stream_reply(
+        get_education_answers(), get_education_backend().for_user(user_id), 'education', message, history
     )
 
-# Mock chatbot functions
-def education_chatbot(message, history):
-    """Placeholder for education chatbot"""
-    return history + [[message, "This is the Education Chatbot. It will be implemented soon!"]]
+def education_chatbot(message, session_token, view):
+    """Education chatbot, streamed token by token"""
+    yield from _chat_exchange('education', message, session_token, view, _education_reply)
+
+def advisor_chatbot(message, session_token, view):
+    """Advisor and analyzer chatbot, streamed token by token and personalized with the user's profile"""
+    yield from _chat_exchange(
+        'advisor', message, session_token, view,
+        lambda msg, history, user_id: stream_reply(
+            get_advisor_backend().for_user(user_id), 'advisor', msg, history, get_adviser_contexts().get(user_id)
+        )
+    )
 
-def advisor_chatbot(message, history):
-    """Placeholder for advisor and analyzer chatbot"""
-    return history + [[message, "This is the Advisor & Analyzer Chatbot. It will be implemented soon!"]]
+def _earlier_messages(user_id, tab, view):
+    view = dict(view or CHAT_VIEW_START)
+    # Paging back stops at the last "Clear Chat"
+    older = chat_history.turns_before(user_id, tab, view['oldest_id'] or view['start_id'] + 1,
+                                      after_id=view['start_id'])
+    if not older:
+        return gr.update(), view
+    view['oldest_id'] = older[0][0]
+    return chat_history.as_pairs(chat_history.turns_from(user_id, tab, view['oldest_id'])), view
+
+async def load_earlier_messages(tab, session_token, view):
+    """Prepend the previous page of a conversation"""
+    user_id = await get_sessions().get_user_async(session_token)
+    if user_id is None:
+        return gr.update(), view
+    
+    try:
+        return await db.run_async(_earlier_messages, user_id, tab, view)
+    except (DBQueueFull, asyncio.TimeoutError):
+        return gr.update(), view
+
+async def clear_chat(tab, session_token):
+    """Clear the visible conversation and start a fresh context window"""
+    user_id = await get_sessions().get_user_async(session_token)
+    try:
+        start_id = await db.run_async(chat_history.latest_turn_id, user_id, tab) if user_id is not None else 0
+    except (DBQueueFull, asyncio.TimeoutError):
+        # Without the boundary the old turns would come back; leave the chat as it is
+        return gr.update(), gr.update()
+    return [], dict(CHAT_VIEW_START, start_id=start_id)
 
 # Create custom CSS for larger text with green theme
 custom_css = """
@@ -171,287 +423,382 @@ custom_css = """
 }
 """
 
-# Create the main application
-with gr.Blocks(title="FINSENTIO", css=custom_css, theme=gr.themes.Soft()) as app:
-    with gr.Blocks(elem_classes=["larger-text"]):
-        gr.Markdown("# FINSENTIO")
+def create_app():
+    """Build the Gradio UI and open what it serves from; importing this module does neither"""
+    get_glossary()
+    get_adviser_contexts()
+    get_education_backend()
+    get_advisor_backend()
+    if get_education_answers().persist:
+        get_education_answers().load()
+
+    with gr.Blocks(title="FINSENTIO", css=custom_css, theme=gr.themes.Soft()) as app:
+        with gr.Blocks(elem_classes=["larger-text"]):
+            gr.Markdown("# FINSENTIO")
         
-        # Create dashboard interface
-        with gr.Group(visible=False) as dashboard:
-            gr.Markdown("# Welcome to your Dashboard")
+            # Per-browser session token, resolved to a user id by the session store
+            session_token = gr.State(None)
+            # Server-side record of what the profile form shows, so updates carry only changes
+            profile_view = gr.State(PROFILE_VIEW_START)
+        
+            # Create dashboard interface
+            with gr.Group(visible=False) as dashboard:
+                gr.Markdown("# Welcome to your Dashboard")
             
-            with gr.Tabs():
-                with gr.TabItem("Profile"):
-                    gr.Markdown("## User Risk Profile Assessment")
-                    gr.Markdown("Please answer the following questions to help us understand your investment preferences and risk tolerance.")
+                with gr.Tabs():
+                    with gr.TabItem("Profile"):
+                        gr.Markdown("## User Risk Profile Assessment")
+                        gr.Markdown("Please answer the following questions to help us understand your investment preferences and risk tolerance.")
                     
-                    # Question 1
-                    with gr.Row():
-                        with gr.Column():
-                            risk_taker = gr.Radio(
-                                label="1. How would your best friend describe you as a risk taker?",
-                                choices=[
-                                    "A real gambler",
-                                    "Willing to take risks after completing adequate research",
-                                    "Cautious",
-                                    "A real risk avoider"
-                                ],
-                                value="Cautious",
-                                scale=2
-                            )
+                        # Question 1
+                        with gr.Row():
+                            with gr.Column():
+                                risk_taker = gr.Radio(
+                                    label="1. How would your best friend describe you as a risk taker?",
+                                    choices=[
+                                        "A real gambler",
+                                        "Willing to take risks after completing adequate research",
+                                        "Cautious",
+                                        "A real risk avoider"
+                                    ],
+                                    value="Cautious",
+                                    scale=2
+                                )
                     
-                    # Question 2
-                    with gr.Row():
-                        with gr.Column():
-                            risk_word = gr.Radio(
-                                label="2. When you think of the word \"risk\", which of the following words comes to mind first?",
-                                choices=[
-                                    "Loss",
-                                    "Uncertainty",
-                                    "Opportunity",
-                                    "Thrill"
-                                ],
-                                value="Uncertainty",
-                                scale=2
-                            )
+                        # Question 2
+                        with gr.Row():
+                            with gr.Column():
+                                risk_word = gr.Radio(
+                                    label="2. When you think of the word \"risk\", which of the following words comes to mind first?",
+                                    choices=[
+                                        "Loss",
+                                        "Uncertainty",
+                                        "Opportunity",
+                                        "Thrill"
+                                    ],
+                                    value="Uncertainty",
+                                    scale=2
+                                )
                     
-                    # Question 3
-                    with gr.Row():
-                        with gr.Column():
-                            game_show = gr.Radio(
-                                label="3. You are on a TV game show and can choose one of the following. Which would you take?",
-                                choices=[
-                                    "$1,000 in cash",
-                                    "A 50% chance at winning $5,000",
-                                    "A 25% chance at winning $10,000",
-                                    "A 5% chance at winning $100,000"
-                                ],
-                                value="$1,000 in cash",
-                                scale=2
-                            )
+                        # Question 3
+                        with gr.Row():
+                            with gr.Column():
+                                game_show = gr.Radio(
+                                    label="3. You are on a TV game show and can choose one of the following. Which would you take?",
+                                    choices=[
+                                        "$1,000 in cash",
+                                        "A 50% chance at winning $5,000",
+                                        "A 25% chance at winning $10,000",
+                                        "A 5% chance at winning $100,000"
+                                    ],
+                                    value="$1,000 in cash",
+                                    scale=2
+                                )
                     
-                    # Question 4
-                    with gr.Row():
-                        with gr.Column():
-                            investment_allocation = gr.Radio(
-                                label="4. If you had to invest $20,000, which of the following allocations would you find most appealing?",
-                                choices=[
-                                    "60% in low-risk, 30% in medium-risk, 10% in high-risk investments",
-                                    "30% in low-risk, 30% in medium-risk, 40% in high-risk investments",
-                                    "10% in low-risk, 40% in medium-risk, 50% in high-risk investments"
-                                ],
-                                value="60% in low-risk, 30% in medium-risk, 10% in high-risk investments",
-                                scale=2
-                            )
+                        # Question 4
+                        with gr.Row():
+                            with gr.Column():
+                                investment_allocation = gr.Radio(
+                                    label="4. If you had to invest $20,000, which of the following allocations would you find most appealing?",
+                                    choices=[
+                                        "60% in low-risk, 30% in medium-risk, 10% in high-risk investments",
+                                        "30% in low-risk, 30% in medium-risk, 40% in high-risk investments",
+                                        "10% in low-risk, 40% in medium-risk, 50% in high-risk investments"
+                                    ],
+                                    value="60% in low-risk, 30% in medium-risk, 10% in high-risk investments",
+                                    scale=2
+                                )
                     
-                    # Question 5
-                    with gr.Row():
-                        with gr.Column():
-                            market_follow = gr.Radio(
-                                label="5. How often do you follow financial markets?",
-                                choices=[
-                                    "Daily",
-                                    "Weekly",
-                                    "Occasionally",
-                                    "Never"
-                                ],
-                                value="Weekly",
-                                scale=2
-                            )
+                        # Question 5
+                        with gr.Row():
+                            with gr.Column():
+                                market_follow = gr.Radio(
+                                    label="5. How often do you follow financial markets?",
+                                    choices=[
+                                        "Daily",
+                                        "Weekly",
+                                        "Occasionally",
+                                        "Never"
+                                    ],
+                                    value="Weekly",
+                                    scale=2
+                                )
                     
-                    # Question 6
-                    with gr.Row():
-                        with gr.Column():
-                            new_investment = gr.Radio(
-                                label="6. What would you do when you hear about a new investment opportunity?",
-                                choices=[
-                                    "Immediately jump in",
-                                    "Research thoroughly before investing",
-                                    "Ask others first, then decide",
-                                    "Wait and observe over time"
-                                ],
-                                value="Research thoroughly before investing",
-                                scale=2
-                            )
+                        # Question 6
+                        with gr.Row():
+                            with gr.Column():
+                                new_investment = gr.Radio(
+                                    label="6. What would you do when you hear about a new investment opportunity?",
+                                    choices=[
+                                        "Immediately jump in",
+                                        "Research thoroughly before investing",
+                                        "Ask others first, then decide",
+                                        "Wait and observe over time"
+                                    ],
+                                    value="Research thoroughly before investing",
+                                    scale=2
+                                )
                     
-                    # Question 7
-                    with gr.Row():
-                        with gr.Column():
-                            buy_things = gr.Radio(
-                                label="7. I rarely buy things I don't need.",
-                                choices=[
-                                    "Agree",
-                                    "Neutral",
-                                    "Disagree"
-                                ],
-                                value="Neutral",
-                                scale=2
-                            )
+                        # Question 7
+                        with gr.Row():
+                            with gr.Column():
+                                buy_things = gr.Radio(
+                                    label="7. I rarely buy things I don't need.",
+                                    choices=[
+                                        "Agree",
+                                        "Neutral",
+                                        "Disagree"
+                                    ],
+                                    value="Neutral",
+                                    scale=2
+                                )
                     
-                    # Question 8
-                    with gr.Row():
-                        with gr.Column():
-                            finance_reading = gr.Radio(
-                                label="8. I like to read about finance and the economy.",
-                                choices=[
-                                    "Agree",
-                                    "Neutral",
-                                    "Disagree"
-                                ],
-                                value="Neutral",
-                                scale=2
-                            )
+                        # Question 8
+                        with gr.Row():
+                            with gr.Column():
+                                finance_reading = gr.Radio(
+                                    label="8. I like to read about finance and the economy.",
+                                    choices=[
+                                        "Agree",
+                                        "Neutral",
+                                        "Disagree"
+                                    ],
+                                    value="Neutral",
+                                    scale=2
+                                )
                     
-                    # Question 9
-                    with gr.Row():
-                        with gr.Column():
-                            previous_investments = gr.CheckboxGroup(
-                                label="9. Which of the following have you invested in before? (You can choose more than one)",
-                                choices=[
-                                    "Stocks",
-                                    "Cryptocurrency",
-                                    "Foreign currencies",
-                                    "Gold or other commodities",
-                                    "Fixed deposit accounts",
-                                    "I have never invested"
-                                ],
-                                value=[],
-                                scale=2
-                            )
+                        # Question 9
+                        with gr.Row():
+                            with gr.Column():
+                                previous_investments = gr.CheckboxGroup(
+                                    label="9. Which of the following have you invested in before? (You can choose more than one)",
+                                    choices=[
+                                        "Stocks",
+                                        "Cryptocurrency",
+                                        "Foreign currencies",
+                                        "Gold or other commodities",
+                                        "Fixed deposit accounts",
+                                        "I have never invested"
+                                    ],
+                                    value=[],
+                                    scale=2
+                                )
                     
-                    # Question 10
-                    with gr.Row():
-                        with gr.Column():
-                            investment_goal = gr.Radio(
-                                label="10. What is your main goal for investing?",
-                                choices=[
-                                    "Short-term profit",
-                                    "Long-term savings",
-                                    "Retirement planning",
-                                    "Wealth preservation"
-                                ],
-                                value="Long-term savings",
-                                scale=2
-                            )
+                        # Question 10
+                        with gr.Row():
+                            with gr.Column():
+                                investment_goal = gr.Radio(
+                                    label="10. What is your main goal for investing?",
+                                    choices=[
+                                        "Short-term profit",
+                                        "Long-term savings",
+                                        "Retirement planning",
+                                        "Wealth preservation"
+                                    ],
+                                    value="Long-term savings",
+                                    scale=2
+                                )
+                    
+                        # Save button
+                        with gr.Row():
+                            save_button = gr.Button("Save Profile", size="lg", variant="primary")
+                            revert_button = gr.Button("Revert to Saved", size="lg")
+                        profile_message = gr.Markdown("")
                     
-                    # Save button
-                    with gr.Row():
-                        save_button = gr.Button("Save Profile", size="lg", variant="primary")
-                    profile_message = gr.Markdown("")
+                        # Answer distributions from the incrementally maintained cohort counters
+                        with gr.Accordion("How You Compare", open=False):
+                            compare_button = gr.Button("Compare My Answers", variant="primary")
+                            compare_output = gr.Markdown("")
+                        compare_button.click(
+                            fn=compare_with_peers,
+                            inputs=[session_token],
+                            outputs=[compare_output],
+                            api_name="compare_with_peers"
+                        )
                     
-                    # Connect save button to function
-                    save_button.click(
-                        fn=save_profile,
-                        inputs=[
-                            risk_taker, risk_word, game_show, investment_allocation,
-                            market_follow, new_investment, buy_things, finance_reading,
-                            previous_investments, investment_goal
-                        ],
-                        outputs=profile_message
-                    )
+                        # Connect save button to function
+                        save_button.click(
+                            fn=save_profile,
+                            inputs=[
+                                session_token,
+                                risk_taker, risk_word, game_show, investment_allocation,
+                                market_follow, new_investment, buy_things, finance_reading,
+                                previous_investments, investment_goal, profile_view
+                            ],
+                            outputs=[profile_message, profile_view],
+                            api_name="save_profile"
+                        )
+                        revert_button.click(
+                            fn=load_profile,
+                            inputs=[session_token],
+                            outputs=[
+                                risk_taker, risk_word, game_show, investment_allocation,
+                                market_follow, new_investment, buy_things, finance_reading,
+                                previous_investments, investment_goal, profile_view
+                            ],
+                            api_name="load_profile"
+                        )
                 
-                with gr.TabItem("Education Chatbot"):
-                    gr.Markdown("## Financial Education Chatbot")
-                    gr.Markdown("Ask any questions about financial terms, concepts, or strategies to improve your knowledge!")
+                    with gr.TabItem("Education Chatbot"):
+                        gr.Markdown("## Financial Education Chatbot")
+                        gr.Markdown("Ask any questions about financial terms, concepts, or strategies to improve your knowledge!")
                     
-                    # Education chatbot interface
-                    education_chat = gr.Chatbot(
-                        label="Chat History",
-                        height=400,
-                        value=[["System", "Welcome to the Financial Education Chatbot! How can I help you learn today?"]]
-                    )
-                    education_msg = gr.Textbox(
-                        label="Your Question",
-                        placeholder="Ask me anything about finance...",
-                        scale=7
-                    )
-                    education_submit = gr.Button("Ask", scale=1, variant="primary")
-                    education_clear = gr.Button("Clear Chat", scale=1)
+                        # Education chatbot interface
+                        education_chat = gr.Chatbot(
+                            label="Chat History",
+                            height=400,
+                            value=[EDUCATION_WELCOME]
+                        )
+                        education_view = gr.State(CHAT_VIEW_START)
+                        education_msg = gr.Textbox(
+                            label="Your Question",
+                            placeholder="Ask me anything about finance...",
+                            scale=7
+                        )
+                        education_submit = gr.Button("Ask", scale=1, variant="primary")
+                        education_earlier = gr.Button("Load Earlier Messages", scale=1)
+                        education_clear = gr.Button("Clear Chat", scale=1)
                     
-                    # Connect chatbot components
-                    education_submit.click(
-                        fn=education_chatbot,
-                        inputs=[education_msg, education_chat],
-                        outputs=[education_chat],
-                        api_name="education_chat"
-                    )
-                    education_clear.click(lambda: [], None, education_chat)
+                        # Connect chatbot components; the history itself stays on the server
+                        education_submit.click(
+                            fn=education_chatbot,
+                            inputs=[education_msg, session_token, education_view],
+                            outputs=[education_chat, education_view],
+                            api_name="education_chat",
+                            concurrency_limit=CHAT_CONCURRENCY
+                        )
+                        education_earlier.click(
+                            functools.partial(load_earlier_messages, 'education'),
+                            [session_token, education_view], [education_chat, education_view],
+                            api_name="education_earlier"
+                        )
+                        education_clear.click(
+                            functools.partial(clear_chat, 'education'),
+                            [session_token], [education_chat, education_view],
+                            api_name="education_clear"
+                        )
                 
-                with gr.TabItem("Adviser & Analyzer"):
-                    gr.Markdown("## Financial Adviser & Analyzer")
-                    gr.Markdown("Get personalized financial advice and analysis based on your profile and market conditions.")
+                    with gr.TabItem("Adviser & Analyzer"):
+                        gr.Markdown("## Financial Adviser & Analyzer")
+                        gr.Markdown("Get personalized financial advice and analysis based on your profile and market conditions.")
                     
-                    # Adviser chatbot interface
-                    adviser_chat = gr.Chatbot(
-                        label="Chat History",
-                        height=400,
-                        value=[["System", "Welcome to your personalized Financial Adviser! How can I assist you today?"]]
-                    )
-                    adviser_msg = gr.Textbox(
-                        label="Your Question",
-                        placeholder="Ask for financial advice or market analysis...",
-                        scale=7
-                    )
-                    adviser_submit = gr.Button("Ask", scale=1, variant="primary")
-                    adviser_clear = gr.Button("Clear Chat", scale=1)
+                        # Adviser chatbot interface
+                        adviser_chat = gr.Chatbot(
+                            label="Chat History",
+                            height=400,
+                            value=[ADVISER_WELCOME]
+                        )
+                        adviser_view = gr.State(CHAT_VIEW_START)
+                        adviser_msg = gr.Textbox(
+                            label="Your Question",
+                            placeholder="Ask for financial advice or market analysis...",
+                            scale=7
+                        )
+                        adviser_submit = gr.Button("Ask", scale=1, variant="primary")
+                        adviser_earlier = gr.Button("Load Earlier Messages", scale=1)
+                        adviser_clear = gr.Button("Clear Chat", scale=1)
                     
-                    # Connect chatbot components
-                    adviser_submit.click(
-                        fn=advisor_chatbot,
-                        inputs=[adviser_msg, adviser_chat],
-                        outputs=[adviser_chat],
-                        api_name="adviser_chat"
-                    )
-                    adviser_clear.click(lambda: [], None, adviser_chat)
+                        # Connect chatbot components; the history itself stays on the server
+                        adviser_submit.click(
+                            fn=advisor_chatbot,
+                            inputs=[adviser_msg, session_token, adviser_view],
+                            outputs=[adviser_chat, adviser_view],
+                            api_name="adviser_chat",
+                            concurrency_limit=CHAT_CONCURRENCY
+                        )
+                        adviser_earlier.click(
+                            functools.partial(load_earlier_messages, 'advisor'),
+                            [session_token, adviser_view], [adviser_chat, adviser_view],
+                            api_name="adviser_earlier"
+                        )
+                        adviser_clear.click(
+                            functools.partial(clear_chat, 'advisor'),
+                            [session_token], [adviser_chat, adviser_view],
+                            api_name="adviser_clear"
+                        )
+                    
+                        # Allocation analysis over local historical prices
+                        with gr.Accordion("Market Analysis", open=False):
+                            analysis_period = gr.Dropdown(
+                                choices=list(WINDOWS) + ["Full history"],
+                                value="3 years",
+                                label="Period"
+                            )
+                            analyze_button = gr.Button("Analyze My Allocation", variant="primary")
+                            analysis_output = gr.Markdown("")
+                            projection_button = gr.Button("Project My Outcomes", variant="primary")
+                            projection_output = gr.Markdown("")
+                        analyze_button.click(
+                            fn=analyze_allocation,
+                            inputs=[session_token, analysis_period],
+                            outputs=[analysis_output],
+                            api_name="analyze_allocation"
+                        )
+                        projection_button.click(
+                            fn=project_outcomes,
+                            inputs=[session_token],
+                            outputs=[projection_output],
+                            api_name="project_outcomes"
+                        )
             
-            # Logout button
-            with gr.Row():
-                logout_button = gr.Button("Logout", size="lg", variant="stop")
+                # Logout button
+                with gr.Row():
+                    logout_button = gr.Button("Logout", size="lg", variant="stop")
         
-        # Create auth interface
-        with gr.Group(visible=True) as auth_interface:
-            with gr.Tabs():
-                with gr.TabItem("Login"):
-                    username_login = gr.Textbox(label="Username", scale=2)
-                    password_login = gr.Textbox(label="Password", type="password", scale=2)
-                    with gr.Row():
-                        login_button = gr.Button("Login", size="lg", variant="primary")
-                    login_message = gr.Markdown("")
+            # Create auth interface
+            with gr.Group(visible=True) as auth_interface:
+                with gr.Tabs():
+                    with gr.TabItem("Login"):
+                        username_login = gr.Textbox(label="Username", scale=2)
+                        password_login = gr.Textbox(label="Password", type="password", scale=2)
+                        with gr.Row():
+                            login_button = gr.Button("Login", size="lg", variant="primary")
+                        login_message = gr.Markdown("")
                 
-                with gr.TabItem("Register"):
-                    username_register = gr.Textbox(label="Username", scale=2)
-                    email_register = gr.Textbox(label="Email", scale=2)
-                    password_register = gr.Textbox(label="Password", type="password", scale=2)
-                    confirm_password = gr.Textbox(label="Confirm Password", type="password", scale=2)
-                    with gr.Row():
-                        register_button = gr.Button("Register", size="lg", variant="primary")
-                    register_message = gr.Markdown("")
+                    with gr.TabItem("Register"):
+                        username_register = gr.Textbox(label="Username", scale=2)
+                        email_register = gr.Textbox(label="Email", scale=2)
+                        password_register = gr.Textbox(label="Password", type="password", scale=2)
+                        confirm_password = gr.Textbox(label="Confirm Password", type="password", scale=2)
+                        with gr.Row():
+                            register_button = gr.Button("Register", size="lg", variant="primary")
+                        register_message = gr.Markdown("")
         
-        # Connect the buttons to functions
-        login_button.click(
-            fn=login,
-            inputs=[username_login, password_login],
-            outputs=[login_message, auth_interface, dashboard]
-        ).then(
-            fn=load_profile,
-            inputs=None,
-            outputs=[
-                risk_taker, risk_word, game_show, investment_allocation,
-                market_follow, new_investment, buy_things, finance_reading,
-                previous_investments, investment_goal
-            ]
-        )
+            # Connect the buttons to functions
+            # One event logs in and fills the whole dashboard: the profile form and both chats
+            login_button.click(
+                fn=login,
+                inputs=[username_login, password_login, profile_view],
+                outputs=[
+                    login_message, auth_interface, dashboard, session_token, profile_view,
+                    risk_taker, risk_word, game_show, investment_allocation,
+                    market_follow, new_investment, buy_things, finance_reading,
+                    previous_investments, investment_goal,
+                    education_chat, education_view, adviser_chat, adviser_view
+                ],
+                api_name="login"
+            )
         
-        register_button.click(
-            fn=register,
-            inputs=[username_register, password_register, email_register, confirm_password],
-            outputs=[register_message, auth_interface, dashboard]
-        )
+            register_button.click(
+                fn=register,
+                inputs=[username_register, password_register, email_register, confirm_password],
+                outputs=[register_message, auth_interface, dashboard],
+                api_name="register"
+            )
         
-        logout_button.click(
-            fn=logout,
-            outputs=[auth_interface, dashboard]
-        )
+            logout_button.click(
+                fn=logout,
+                inputs=[session_token],
+                outputs=[auth_interface, dashboard, session_token, profile_view],
+                api_name="logout"
+            )
+
+    # Time every handler wired above, labelled by its api_name
+    return metrics.instrument_blocks(app)
 
 if __name__ == "__main__":
-    app.launch()
\ No newline at end of file
+    # Simulate the common allocation/goal projections while the server starts
+    monte_carlo.precompute_in_background()
+    metrics.start_http_server()
+    metrics.start_snapshot_writer()
+    create_app().launch()
\ No newline at end of file
@@ -0,0 +1,215 @@
+"""Micro-batching scheduler between the chatbot handlers and a model backend.
+
+A model decodes a batch of sequences for little more than the cost of one,
+so instead of one inference call per message, concurrent requests are
+collected into micro-batches: the scheduler thread waits up to ``max_wait``
+after the oldest queued request for others to arrive (or until the batch is
+full), runs the batch through the backend's ``stream_batch`` and fans each
+step's chunks back to the callers, which stream them as usual.
+
+Batches favour short prompts, since a long prompt makes the whole batch wait
+for its encoding, but a request queued for ``max_queue_delay`` goes first
+whatever its length. Requests are taken round-robin across users, so one
+user's burst can't fill every batch, and each user may have at most
+``max_per_user`` requests in flight. Beyond ``max_pending`` queued requests
+``SchedulerBusy`` is raised instead of building an unbounded backlog.
+
+    FINSENTIO_CHAT_BATCHING=1 FINSENTIO_EDUCATION_BACKEND=local_model:LocalModelBackend python app.py
+"""
+import os
+import queue
+import threading
+import time
+from collections import Counter
+
+import metrics
+from chat_backend import ChatBackend, prompt_tokens
+
+CHAT_BATCHING = os.environ.get('FINSENTIO_CHAT_BATCHING', '0') == '1'
+CHAT_BATCH_SIZE = int(os.environ.get('FINSENTIO_CHAT_BATCH_SIZE', '16'))
+CHAT_BATCH_WAIT = float(os.environ.get('FINSENTIO_CHAT_BATCH_WAIT_MS', '10')) / 1000
+CHAT_QUEUE_LIMIT = int(os.environ.get('FINSENTIO_CHAT_QUEUE_LIMIT', '64'))
+CHAT_USER_LIMIT = int(os.environ.get('FINSENTIO_CHAT_USER_LIMIT', '2'))
+# Requests queued this long are scheduled next regardless of prompt length
+CHAT_MAX_QUEUE_DELAY = float(os.environ.get('FINSENTIO_CHAT_MAX_QUEUE_DELAY_MS', '2000')) / 1000
+
+_DONE = object()
+
+
+class SchedulerBusy(Exception):
+    """Raised when the scheduler (or the user's share of it) is full"""
+
+
+class _Request:
+    __slots__ = ('user', 'args', 'tokens', 'queued_at', 'chunks', 'cancelled')
+
+    def __init__(self, user, args):
+        self.user = user
+        self.args = args
+        self.tokens = prompt_tokens(*args)
+        self.queued_at = time.monotonic()
+        self.chunks = queue.SimpleQueue()
+        self.cancelled = False
+
+
+class _UserBackend(ChatBackend):
+    """A scheduler bound to one user"""
+
+    def __init__(self, scheduler, user_id):
+        self.scheduler = scheduler
+        self.user_id = user_id
+
+    def stream(self, message, history, context=None):
+        return self.scheduler.stream(message, history, context, user=self.user_id)
+
+
+class BatchScheduler(ChatBackend):
+    """Front a backend with a scheduler thread that decodes concurrent requests in micro-batches"""
+
+    def __init__(self, backend, name='chat', max_batch_size=CHAT_BATCH_SIZE, max_wait=CHAT_BATCH_WAIT,
+                 max_pending=CHAT_QUEUE_LIMIT, max_per_user=CHAT_USER_LIMIT,
+                 max_queue_delay=CHAT_MAX_QUEUE_DELAY):
+        self.backend = backend
+        self.name = name
+        # A backend that can't batch would only run the batch one request after another
+        self.max_batch_size = max_batch_size if backend.supports_batching else 1
+        self.max_wait = max_wait
+        self.max_pending = max_pending
+        self.max_per_user = max_per_user
+        self.max_queue_delay = max_queue_delay
+        self._pending = []
+        self._in_flight = Counter()
+        self._condition = threading.Condition()
+        self._closed = False
+        self.batches = 0
+        self.requests = 0
+        self.rejected = 0
+        self._thread = threading.Thread(target=self._run, name=f'batch-{name}', daemon=True)
+        self._thread.start()
+
+    def for_user(self, user_id):
+        return _UserBackend(self, user_id)
+
+    def submit(self, message, history, context=None, user=None):
+        """Queue a request; raise SchedulerBusy if the queue or the user's share is full"""
+        request = _Request(user, (message, history, context))
+        with self._condition:
+            if self._closed:
+                raise SchedulerBusy("The assistant is shutting down")
+            if len(self._pending) >= self.max_pending:
+                self.rejected += 1
+                raise SchedulerBusy("The assistant is busy, please try again in a moment")
+            if user is not None and self._in_flight[user] >= self.max_per_user:
+                self.rejected += 1
+                raise SchedulerBusy("Please wait for your previous question to be answered")
+            self._in_flight[user] += 1
+            self._pending.append(request)
+            if len(self._pending) == 1 or len(self._pending) >= self.max_batch_size:
+                self._condition.notify()
+        return request
+
+    def stream(self, message, history, context=None, user=None):
+        """Yield the reply chunks as the request's batch decodes them"""
+        request = self.submit(message, history, context, user)
+        try:
+            while True:
+                chunk = request.chunks.get()
+                if chunk is _DONE:
+                    return
+                if isinstance(chunk, BaseException):
+                    raise chunk
+                yield chunk
+        finally:
+            # Closed early (e.g. the client went away): stop spending the model on it
+            request.cancelled = True
+
+    def _take_batch(self):
+        """Wait for a full batch or the oldest request's window; None once closed and drained"""
+        with self._condition:
+            while True:
+                self._drop_cancelled()
+                if self._pending:
+                    wait = self._pending[0].queued_at + self.max_wait - time.monotonic()
+                    if len(self._pending) >= self.max_batch_size or wait <= 0 or self._closed:
+                        break
+                    self._condition.wait(wait)
+                elif self._closed:
+                    return None
+                else:
+                    self._condition.wait()
+
+            # Overdue requests first, then round-robin over users, shortest prompt first
+            now = time.monotonic()
+            turns = Counter()
+            ranked = []
+            for request in self._pending:
+                overdue = now - request.queued_at >= self.max_queue_delay
+                ranked.append((not overdue, turns[request.user], request.tokens, request.queued_at, request))
+                turns[request.user] += 1
+            ranked.sort(key=lambda entry: entry[:4])
+            batch = [entry[-1] for entry in ranked[:self.max_batch_size]]
+            chosen = set(map(id, batch))
+            self._pending = [r for r in self._pending if id(r) not in chosen]
+            return batch
+
+    def _finish(self, request, result=_DONE):
+        """Hand the request its last item and free its user's slot (call with the lock held)"""
+        request.chunks.put(result)
+        self._in_flight[request.user] -= 1
+        if not self._in_flight[request.user]:
+            del self._in_flight[request.user]
+
+    def _drop_cancelled(self):
+        """Forget queued requests whose callers stopped listening (call with the lock held)"""
+        if any(request.cancelled for request in self._pending):
+            for request in self._pending:
+                if request.cancelled:
+                    self._finish(request)
+            self._pending = [request for request in self._pending if not request.cancelled]
+
+    def _run(self):
+        label = f'backend={self.name}'
+        while True:
+            batch = self._take_batch()
+            if batch is None:
+                return
+            started = time.monotonic()
+            for request in batch:
+                metrics.observe('finsentio_chat_queue_wait_seconds', label, started - request.queued_at)
+            metrics.inc('finsentio_chat_batches_total', label)
+            metrics.inc('finsentio_chat_batched_requests_total', label, len(batch))
+            self.batches += 1
+            self.requests += len(batch)
+            result = _DONE
+            steps = self.backend.stream_batch([request.args for request in batch])
+            try:
+                for step in steps:
+                    for request, chunk in zip(batch, step):
+                        if chunk is not None and not request.cancelled:
+                            request.chunks.put(chunk)
+                    if all(request.cancelled for request in batch):
+                        break
+            except Exception as e:
+                result = e
+            finally:
+                steps.close()
+            with self._condition:
+                for request in batch:
+                    self._finish(request, result)
+
+    def close(self, timeout=None):
+        """Answer the queued requests and stop the scheduler thread"""
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+        self._thread.join(timeout)
+
+    def stats(self):
+        """Batches run, requests answered, mean batch size and rejected requests"""
+        return {
+            'batches': self.batches,
+            'requests': self.requests,
+            'mean_batch_size': self.requests / self.batches if self.batches else 0.0,
+            'rejected': self.rejected,
+            'pending': len(self._pending),
+        }
@@ -0,0 +1,75 @@
+"""Per-message cost of the adviser's profile context.
+
+Compares building the context on every message (profile read from SQLite and
+formatted each time) with the per-user AdviserContextCache, and checks that a
+profile save is picked up by the next message.
+
+    python -m benchmarks.adviser_context --users 10000
+"""
+import argparse
+import random
+import time
+
+from benchmarks.common import use_temp_database, summarize
+from benchmarks.seed import random_profile, seed_database
+
+DB_PATH = use_temp_database()
+
+import database as db  # noqa: E402  (must follow use_temp_database)
+from adviser_context import AdviserContextCache, build_context  # noqa: E402
+from risk_scoring import QUESTIONS  # noqa: E402  (save_user_profile argument order)
+
+
+def timed(fn, ids):
+    latencies = []
+    started = time.perf_counter()
+    for user_id in ids:
+        t0 = time.perf_counter()
+        fn(user_id)
+        latencies.append(time.perf_counter() - t0)
+    return summarize(latencies, time.perf_counter() - started)
+
+
+def print_us(label, result):
+    print(f"{label:<34} p50 {result['p50_ms'] * 1000:8.1f} us   "
+          f"p95 {result['p95_ms'] * 1000:8.1f} us   p99 {result['p99_ms'] * 1000:8.1f} us")
+
+
+def uncached(user_id):
+    db.clear_profile_cache()
+    success, profile = db.get_user_profile(user_id)
+    return build_context(profile) if success else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=10000)
+    parser.add_argument('--active', type=int, default=500, help="users chatting during the run")
+    parser.add_argument('--messages', type=int, default=50000)
+    args = parser.parse_args()
+
+    seed_database(DB_PATH, args.users)
+    rng = random.Random(0)
+    active = rng.sample(range(1, args.users + 1), args.active)
+    messages = [rng.choice(active) for _ in range(args.messages)]
+    contexts = AdviserContextCache()
+
+    print(f"{args.users:,} users, {args.active} active, {args.messages:,} messages")
+    print_us('rebuild per message', timed(uncached, messages[:5000]))
+    print_us('cached (first message builds)', timed(contexts.get, messages))
+    print_us('cached (warm)', timed(contexts.get, messages))
+    print(f"context cache: {contexts.stats()}")
+
+    user_id = active[0]
+    before = contexts.get(user_id)
+    profile = random_profile(rng)
+    profile['investment_goal'] = 'Wealth preservation' if before['investment_goal'] != 'Wealth preservation' \
+        else 'Short-term profit'
+    db.save_user_profile(user_id, *(profile[question] for question in QUESTIONS))
+    after = contexts.get(user_id)
+    print(f"after save: goal {before['investment_goal']!r} -> {after['investment_goal']!r}")
+    db.close_db()
+
+
+if __name__ == '__main__':
+    main()
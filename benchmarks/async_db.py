@@ -0,0 +1,111 @@
+"""Many concurrent sessions on the database: sync calls vs the async API.
+
+Every session is an asyncio task that reads random profiles (the profile
+cache is off, so each read is a SQLite query) and now and then saves one.
+The same load runs three ways: sync calls made straight from the coroutines
+(what an async handler calling database.py used to do), sync calls on a
+thread pool (how Gradio runs sync handlers), and the async API on the DB
+executor. Reports throughput, latency, event loop lag (how late a 10 ms
+heartbeat fires) and the peak number of threads.
+
+    python -m benchmarks.async_db --sessions 2000 --duration 5
+"""
+import argparse
+import asyncio
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.common import use_temp_database, summarize, print_result
+from benchmarks.seed import random_profile, seed_database
+
+DB_PATH = use_temp_database()
+os.environ['FINSENTIO_PROFILE_CACHE_SIZE'] = '0'
+
+import database as db  # noqa: E402  (must follow use_temp_database)
+
+HEARTBEAT = 0.01
+
+
+async def drive(call, args):
+    """Run the session tasks for args.duration; returns (operation summary, loop lag summary, peak threads, rejected)"""
+    latencies = []
+    rejected = [0]
+    lags = []
+    peak_threads = [threading.active_count()]
+    deadline = time.perf_counter() + args.duration
+    profiles = [random_profile(random.Random(i)) for i in range(50)]
+
+    async def session(index):
+        rng = random.Random(index)
+        while time.perf_counter() < deadline:
+            user_id = rng.randint(1, args.users)
+            started = time.perf_counter()
+            if rng.random() < args.write_ratio:
+                profile = profiles[rng.randrange(len(profiles))]
+                ok, result = await call(db.update_user_profile, db.update_user_profile_async, user_id,
+                                        {'risk_taker': profile['risk_taker']})
+            else:
+                ok, result = await call(db.get_user_profile, db.get_user_profile_async, user_id)
+            if result == db.SERVER_BUSY_MESSAGE:
+                rejected[0] += 1
+            else:
+                latencies.append(time.perf_counter() - started)
+            # A handler returns after each call, letting other sessions' requests in
+            await asyncio.sleep(0)
+
+    async def heartbeat():
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            await asyncio.sleep(HEARTBEAT)
+            lags.append(time.perf_counter() - started - HEARTBEAT)
+            peak_threads[0] = max(peak_threads[0], threading.active_count())
+
+    started = time.perf_counter()
+    await asyncio.gather(heartbeat(), *(session(i) for i in range(args.sessions)))
+    elapsed = time.perf_counter() - started
+    return summarize(latencies, elapsed), summarize(lags, elapsed), peak_threads[0], rejected[0]
+
+
+def report(label, result):
+    operations, lags, threads, rejected = result
+    print_result(label, operations)
+    print(f"  event loop lag p50 {lags['p50_ms']:.1f} ms, p99 {lags['p99_ms']:.1f} ms; "
+          f"peak threads {threads}; {rejected} calls turned away as busy")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=20000)
+    parser.add_argument('--sessions', type=int, default=2000)
+    parser.add_argument('--duration', type=float, default=5.0)
+    parser.add_argument('--write-ratio', type=float, default=0.1)
+    parser.add_argument('--pool-threads', type=int, default=40, help="thread pool size for the sync path "
+                                                                     "(Gradio's default is 40)")
+    args = parser.parse_args()
+
+    seed_database(DB_PATH, args.users)
+    print(f"{args.sessions} concurrent sessions, {args.write_ratio:.0%} saves, {args.duration:.0f}s per mode")
+
+    async def blocking(sync_fn, async_fn, *call_args):
+        return sync_fn(*call_args)
+
+    pool = ThreadPoolExecutor(max_workers=args.pool_threads)
+
+    async def threaded(sync_fn, async_fn, *call_args):
+        return await asyncio.get_running_loop().run_in_executor(pool, sync_fn, *call_args)
+
+    async def native(sync_fn, async_fn, *call_args):
+        return await async_fn(*call_args)
+
+    report('sync on the event loop', asyncio.run(drive(blocking, args)))
+    report(f'sync on {args.pool_threads} threads', asyncio.run(drive(threaded, args)))
+    pool.shutdown()
+    report(f'async API ({db.DB_WORKERS} DB workers)', asyncio.run(drive(native, args)))
+    db.close_db()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""Chatbot throughput and latency: one inference call per message vs micro-batches.
+
+Concurrent users send questions of mixed length (a short question, or one
+with a few turns of history) to the local stand-in model, first calling it
+directly, each message its own forward passes, then through a BatchScheduler.
+Reports completed replies per second, reply latency and time to first token,
+plus the tokens/second recorded in the chat metrics histograms.
+
+    python -m benchmarks.chat_batching --users 32 --batch-size 16
+"""
+import argparse
+import random
+import threading
+import time
+
+import metrics
+from benchmarks.common import run_threads, print_result, summarize
+from batch_scheduler import BatchScheduler
+from chat_backend import stream_reply
+from local_model import LocalModelBackend
+
+QUESTION = "What is the difference between an index fund and an actively managed mutual fund"
+HISTORY_TURN = ["How do bonds work?", "A bond is a loan to a government or company that pays interest " * 4]
+
+
+def run(label, backend, args):
+    first_tokens = []
+    lock = threading.Lock()
+
+    def ask(worker, iteration):
+        rng = random.Random(worker * 7919 + iteration)
+        history = [HISTORY_TURN] * rng.choice([0, 0, 0, 2, 6])
+        started = time.perf_counter()
+        stream = stream_reply(backend.for_user(worker), label, QUESTION, history)
+        next(stream)
+        ttft = time.perf_counter() - started
+        for _ in stream:
+            pass
+        with lock:
+            first_tokens.append(ttft)
+
+    result = run_threads(ask, args.users, args.duration)
+    print_result(f'{label} replies', result)
+    print_result(f'{label} first token', summarize(first_tokens, args.duration))
+    rates = metrics.registry.histogram('finsentio_chat_tokens_per_second', f'endpoint={label}', metrics.RATE_BUCKETS)
+    print(f"{label + ' tokens/s':<28} mean {rates.sum / max(rates.count, 1):.1f} over {rates.count} replies")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=32, help="concurrent users, one request in flight each")
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--batch-size', type=int, default=16)
+    parser.add_argument('--wait-ms', type=float, default=10.0)
+    args = parser.parse_args()
+
+    model = LocalModelBackend()
+    print(f"{args.users} concurrent users, {len(model.words)}-word replies, {args.duration:.0f}s per mode")
+    direct = run('unbatched', model, args)
+    scheduler = BatchScheduler(model, 'bench', max_batch_size=args.batch_size, max_wait=args.wait_ms / 1000,
+                               max_pending=args.users)
+    batched = run('batched', scheduler, args)
+    scheduler.close()
+    stats = scheduler.stats()
+    print(f"mean batch size {stats['mean_batch_size']:.1f}; "
+          f"throughput with batching: {batched['throughput'] / direct['throughput']:.2f}x")
+
+
+if __name__ == '__main__':
+    main()
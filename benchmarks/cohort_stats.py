@@ -0,0 +1,66 @@
+"""Cohort comparison: scanning every profile vs the incremental answer counters.
+
+Times one "how you compare" read done the naive way (json.loads over every
+user_profiles row) and from the answer_counts table, the full rebuild job,
+and a profile save, which now also moves the user's counters.
+
+    python -m benchmarks.cohort_stats --users 100000
+"""
+import argparse
+import json
+import random
+import time
+from collections import Counter
+
+from benchmarks.common import use_temp_database, run_threads, print_result
+from benchmarks.seed import random_profile, seed_database
+
+DB_PATH = use_temp_database()
+
+import cohort_stats  # noqa: E402
+import database as db  # noqa: E402  (must follow use_temp_database)
+from risk_scoring import QUESTIONS  # noqa: E402
+
+
+def naive_counts():
+    """The per-page-view approach the counters replace"""
+    counts = Counter()
+    with db.get_db_connection() as conn:
+        for (profile_data,) in conn.execute('SELECT profile_data FROM user_profiles'):
+            counts.update(cohort_stats.answer_pairs(json.loads(profile_data)))
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=100000)
+    parser.add_argument('--duration', type=float, default=3.0)
+    args = parser.parse_args()
+
+    seed_database(DB_PATH, args.users)
+    print(f"{args.users:,} profiles")
+
+    started = time.perf_counter()
+    naive_counts()
+    print(f"  json scan of every profile   {(time.perf_counter() - started) * 1000:10.1f} ms")
+
+    started = time.perf_counter()
+    with db.get_db_connection() as conn:
+        conn.execute('BEGIN IMMEDIATE')
+        cohort_stats.rebuild(conn)
+        conn.commit()
+    print(f"  full rebuild                 {(time.perf_counter() - started) * 1000:10.1f} ms")
+
+    print_result('  counters read (all + peers)', run_threads(
+        lambda worker, i: (db.get_cohort_counts(), db.get_cohort_counts('Moderate')), 1, args.duration))
+
+    rng = random.Random(0)
+    profiles = [random_profile(rng) for _ in range(100)]
+    print_result('  profile save with counters', run_threads(
+        lambda worker, i: db.save_user_profile(
+            rng.randint(1, args.users), *[profiles[i % 100][q] for q in QUESTIONS]), 1, args.duration))
+    db.close_db()
+
+
+if __name__ == '__main__':
+    main()
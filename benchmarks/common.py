@@ -0,0 +1,64 @@
+import os
+import tempfile
+import threading
+import time
+
+
+def use_temp_database(name='bench.db'):
+    """Point the database module at a fresh file in a temp dir; call before importing database"""
+    path = os.path.join(tempfile.mkdtemp(prefix='finsentio-bench-'), name)
+    os.environ['FINSENTIO_DB_PATH'] = path
+    return path
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(pct / 100.0 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def summarize(latencies, elapsed):
+    """Throughput and latency percentiles (in milliseconds) for a run"""
+    ordered = sorted(latencies)
+    return {
+        'ops': len(ordered),
+        'throughput': len(ordered) / elapsed if elapsed else 0.0,
+        'p50_ms': percentile(ordered, 50) * 1000,
+        'p95_ms': percentile(ordered, 95) * 1000,
+        'p99_ms': percentile(ordered, 99) * 1000,
+    }
+
+
+def run_threads(fn, threads, duration):
+    """Call fn(worker_index, iteration) from several threads for `duration` seconds"""
+    latencies = []
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+    start_barrier = threading.Barrier(threads)
+
+    def worker(index):
+        local = []
+        start_barrier.wait()
+        iteration = 0
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            fn(index, iteration)
+            local.append(time.perf_counter() - started)
+            iteration += 1
+        with lock:
+            latencies.extend(local)
+
+    started = time.perf_counter()
+    workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    return summarize(latencies, time.perf_counter() - started)
+
+
+def print_result(label, result):
+    print(f"{label:<28} {result['throughput']:>10.0f} ops/s   "
+          f"p50 {result['p50_ms']:7.2f} ms   p95 {result['p95_ms']:7.2f} ms   p99 {result['p99_ms']:7.2f} ms")
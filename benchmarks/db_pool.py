@@ -0,0 +1,112 @@
+"""Concurrency benchmark: connection-per-call vs the pooled WAL connections.
+
+Run from the repository root:
+
+    python -m benchmarks.db_pool --threads 16 --duration 5
+"""
+import argparse
+import json
+import os
+import sqlite3
+
+from benchmarks.common import use_temp_database, run_threads, print_result
+
+DB_PATH = use_temp_database()
+
+import database as db  # noqa: E402  (must follow use_temp_database)
+
+PROFILE = {
+    'risk_taker': 'Cautious', 'risk_word': 'Uncertainty', 'game_show': '$1,000 in cash',
+    'investment_allocation': '60% in low-risk, 30% in medium-risk, 10% in high-risk investments',
+    'market_follow': 'Weekly', 'new_investment': 'Research thoroughly before investing',
+    'buy_things': 'Neutral', 'finance_reading': 'Neutral',
+    'previous_investments': ['Stocks'], 'investment_goal': 'Long-term savings',
+}
+
+
+def seed(path, users):
+    """Insert users and profiles directly, skipping password hashing"""
+    conn = sqlite3.connect(path)
+    conn.executescript('''
+    CREATE TABLE IF NOT EXISTS users (
+        id INTEGER PRIMARY KEY AUTOINCREMENT, username TEXT UNIQUE NOT NULL,
+        password_hash TEXT NOT NULL, email TEXT UNIQUE NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP);
+    CREATE TABLE IF NOT EXISTS user_profiles (
+        id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER NOT NULL,
+        profile_data TEXT NOT NULL, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP);
+    ''')
+    conn.executemany(
+        'INSERT INTO users (username, password_hash, email) VALUES (?, ?, ?)',
+        ((f'user{i}', b'x' * 64, f'user{i}@example.com') for i in range(users))
+    )
+    conn.executemany(
+        'INSERT INTO user_profiles (user_id, profile_data) VALUES (?, ?)',
+        ((i + 1, json.dumps(PROFILE)) for i in range(users))
+    )
+    conn.commit()
+    conn.close()
+
+
+def unpooled_read(path, user_id):
+    """The pre-pool access pattern: open, query, close on every call"""
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    row = conn.execute('SELECT profile_data FROM user_profiles WHERE user_id = ?', (user_id,)).fetchone()
+    conn.close()
+    return json.loads(row['profile_data'])
+
+
+def unpooled_write(path, user_id):
+    conn = sqlite3.connect(path)
+    conn.execute(
+        'UPDATE user_profiles SET profile_data = ?, updated_at = CURRENT_TIMESTAMP WHERE user_id = ?',
+        (json.dumps(PROFILE), user_id)
+    )
+    conn.commit()
+    conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=5.0)
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--write-every', type=int, default=5,
+                        help='one write per N operations (default: 20%% writes)')
+    args = parser.parse_args()
+
+    baseline_path = os.path.join(os.path.dirname(DB_PATH), 'baseline.db')
+    seed(baseline_path, args.users)
+    seed(DB_PATH, args.users)
+    db.initialize_db()
+
+    def baseline_op(worker, iteration):
+        user_id = (worker * 7919 + iteration) % args.users + 1
+        if iteration % args.write_every == 0:
+            try:
+                unpooled_write(baseline_path, user_id)
+            except sqlite3.OperationalError:
+                pass  # 'database is locked' is part of what the baseline measures
+        else:
+            unpooled_read(baseline_path, user_id)
+
+    def pooled_op(worker, iteration):
+        user_id = (worker * 7919 + iteration) % args.users + 1
+        if iteration % args.write_every == 0:
+            db.save_user_profile(user_id, *PROFILE.values())
+        else:
+            db.get_user_profile(user_id)
+
+    print(f"{args.threads} threads, {args.duration:.0f}s each, {args.users} users")
+    baseline = run_threads(baseline_op, args.threads, args.duration)
+    print_result('connection per call', baseline)
+    pooled = run_threads(pooled_op, args.threads, args.duration)
+    print_result(f'pool (size {db.POOL_SIZE}, WAL)', pooled)
+    print(f"speedup: {pooled['throughput'] / baseline['throughput']:.2f}x")
+    db.close_db()
+
+
+if __name__ == '__main__':
+    main()
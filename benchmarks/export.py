@@ -0,0 +1,49 @@
+"""Bulk export throughput per format, and peak Python memory as the table grows.
+
+Seeds a temp database in steps and exports it after each one; a streaming
+export's peak allocation should stay flat while the row count grows.
+
+    python -m benchmarks.export --users 50000 200000
+"""
+import argparse
+import os
+import time
+import tracemalloc
+
+from benchmarks.common import use_temp_database
+from benchmarks.seed import seed_database
+
+DB_PATH = use_temp_database()
+
+import bulk_export  # noqa: E402  (must follow use_temp_database)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, nargs='+', default=[50000, 200000])
+    parser.add_argument('--formats', nargs='+', default=['csv', 'jsonl'], choices=bulk_export.FORMATS)
+    args = parser.parse_args()
+
+    directory = os.path.dirname(DB_PATH)
+    seeded = 0
+    for users in sorted(args.users):
+        seed_database(DB_PATH, users - seeded, profile_ratio=0.8, seed=seeded)
+        seeded = users
+        print(f"{users:,} users:")
+        for fmt in args.formats:
+            path = os.path.join(directory, f'export.{fmt}')
+            started = time.perf_counter()
+            count, _ = bulk_export.export(path, fmt)
+            elapsed = time.perf_counter() - started
+
+            tracemalloc.start()
+            bulk_export.export(path, fmt)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            print(f"  {fmt:<8} {count / elapsed:>10.0f} rows/s   {os.path.getsize(path) / 2 ** 20:7.1f} MiB file"
+                  f"   peak Python memory {peak / 2 ** 20:6.2f} MiB")
+            os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+"""Glossary index build size, open time and query latency on a large synthetic corpus.
+
+Generates N glossary-style documents with a Zipf-distributed vocabulary,
+compiles them with glossary_index.build_index and times index opening,
+free-text search and "what is X" lookups. The bundled corpus is timed too.
+
+    python -m benchmarks.glossary --documents 50000
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from benchmarks.common import summarize
+import glossary_index as gi
+
+
+def synthetic_corpus(documents, vocabulary=20000, words=40, seed=0, skip_ranks=100):
+    """Random glossary entries; term i is a two-word name built from the vocabulary.
+
+    Word frequencies follow Zipf's law with the top `skip_ranks` ranks left
+    out, as those are the stopwords tokenize() drops from real text.
+    """
+    rng = random.Random(seed)
+    vocab = [f"w{i}x{rng.randrange(10 ** 6)}" for i in range(vocabulary)]
+    weights = [1 / (rank + 1 + skip_ranks) for rank in range(vocabulary)]
+    for i in range(documents):
+        term = f"{vocab[rng.randrange(vocabulary)]} {vocab[rng.randrange(vocabulary)]} {i}"
+        yield {
+            'term': term,
+            'aliases': [],
+            'definition': ' '.join(rng.choices(vocab, weights, k=words)),
+        }
+
+
+def timed(fn, queries):
+    latencies = []
+    started = time.perf_counter()
+    for query in queries:
+        t0 = time.perf_counter()
+        fn(query)
+        latencies.append(time.perf_counter() - t0)
+    return summarize(latencies, time.perf_counter() - started)
+
+
+def print_us(label, result):
+    print(f"  {label:<24} p50 {result['p50_ms'] * 1000:8.1f} us   "
+          f"p95 {result['p95_ms'] * 1000:8.1f} us   p99 {result['p99_ms'] * 1000:8.1f} us")
+
+
+def bench(index, queries, terms):
+    print_us('search (3 terms)', timed(lambda q: index.search_ids(q, 5), queries))
+    print_us('lookup "what is X"', timed(index.lookup, [f"What is {term}?" for term in terms]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--documents', type=int, default=50000)
+    parser.add_argument('--queries', type=int, default=2000)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(prefix='finsentio-bench-'), 'glossary.idx')
+    docs = list(synthetic_corpus(args.documents))
+    started = time.perf_counter()
+    header = gi.build_index(docs, path)
+    print(f"{header['documents']:,} documents, {header['terms']:,} terms: built in "
+          f"{time.perf_counter() - started:.1f}s, {os.path.getsize(path) / 2 ** 20:.1f} MiB")
+
+    started = time.perf_counter()
+    index = gi.GlossaryIndex(path)
+    print(f"  open (mmap)              {(time.perf_counter() - started) * 1000:.2f} ms")
+
+    rng = random.Random(1)
+    words = [word for doc in rng.sample(docs, 200) for word in doc['definition'].split()]
+    queries = [' '.join(rng.sample(words, 3)) for _ in range(args.queries)]
+    terms = [doc['term'] for doc in rng.choices(docs, k=args.queries)]
+    bench(index, queries, terms)
+    hits = sum(index.lookup(f"What is {term}?") is not None for term in terms[:200])
+    print(f"  lookup hit rate          {hits / 200:.0%}")
+    os.remove(path)
+
+    print(f"bundled corpus ({gi.GLOSSARY_CORPUS}):")
+    bundled = gi.load_index()
+    entries = [bundled.document(i) for i in range(len(bundled))]
+    bench(bundled, [doc['definition'][:40] for doc in entries] * 10, [doc['term'] for doc in entries] * 10)
+
+
+if __name__ == '__main__':
+    main()
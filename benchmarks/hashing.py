@@ -0,0 +1,85 @@
+"""Mixed-load benchmark: blocking logins vs async logins on the hashing pool.
+
+Simulates Gradio's handler thread pool. In `sync` mode each login holds a
+handler thread for the whole PBKDF2 run; in `async` mode it awaits the hashing
+pool and the handler threads stay free. Login clients hammer the server while a
+probe client repeatedly calls a cheap handler (get_user_profile); we report
+login throughput and the probe's latency percentiles, including queue wait.
+
+    python -m benchmarks.hashing --server-workers 8 --login-clients 32 --duration 5
+"""
+import argparse
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.common import use_temp_database, summarize, print_result
+
+use_temp_database()
+
+import database as db  # noqa: E402  (must follow use_temp_database)
+
+
+async def run(mode, args):
+    loop = asyncio.get_running_loop()
+    server = ThreadPoolExecutor(max_workers=args.server_workers)
+    deadline = time.perf_counter() + args.duration
+    login_latencies, probe_latencies = [], []
+    rejected = 0
+
+    async def login_client(index):
+        nonlocal rejected
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            if mode == 'sync':
+                ok, _ = await loop.run_in_executor(server, db.authenticate_user, 'bench', 'password')
+            else:
+                ok, _ = await db.authenticate_user_async('bench', 'password')
+            if ok:
+                login_latencies.append(time.perf_counter() - started)
+            else:
+                rejected += 1
+
+    async def probe_client():
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            await loop.run_in_executor(server, db.get_user_profile, 1)
+            probe_latencies.append(time.perf_counter() - started)
+            await asyncio.sleep(args.probe_interval)
+
+    started = time.perf_counter()
+    await asyncio.gather(probe_client(), *(login_client(i) for i in range(args.login_clients)))
+    elapsed = time.perf_counter() - started
+    server.shutdown()
+    return summarize(login_latencies, elapsed), summarize(probe_latencies, elapsed), rejected
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--server-workers', type=int, default=8)
+    parser.add_argument('--login-clients', type=int, default=32)
+    parser.add_argument('--duration', type=float, default=5.0)
+    parser.add_argument('--probe-interval', type=float, default=0.005)
+    args = parser.parse_args()
+
+    db.register_user('bench', 'password', 'bench@example.com')
+    ok, user_id = db.authenticate_user('bench', 'password')
+    db.save_user_profile(user_id, 'Cautious', 'Loss', '$1,000 in cash',
+                         '60% in low-risk, 30% in medium-risk, 10% in high-risk investments',
+                         'Weekly', 'Research thoroughly before investing', 'Neutral', 'Neutral',
+                         [], 'Long-term savings')
+
+    print(f"{args.server_workers} server workers, {args.login_clients} login clients, "
+          f"{db.HASH_WORKERS} hash workers (queue limit {db.HASH_QUEUE_LIMIT})")
+    for mode in ('sync', 'async'):
+        logins, probes, rejected = asyncio.run(run(mode, args))
+        print(f"[{mode}]")
+        print_result('  login', logins)
+        print_result('  load_profile (probe)', probes)
+        if rejected:
+            print(f"  rejected logins (queue full): {rejected}")
+    db.close_db()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+"""End-to-end login over HTTP: login + two chained hydrate events vs one login event.
+
+Serves the app and, next to it, a copy of the previous login flow (login,
+then load_profile, then load_chat_histories, each its own queued event and
+client round trip, the profile read twice) and logs concurrent gradio_client
+users in through each. Reports logins/s, end-to-end latency, queue events
+per login and handler time per login (from the handler metrics).
+
+    python -m benchmarks.login --threads 8 --duration 10
+"""
+import argparse
+import os
+import threading
+import time
+
+from benchmarks.common import use_temp_database, run_threads, print_result
+from benchmarks.seed import PASSWORD, seed_database
+
+DB_PATH = use_temp_database()
+# Cheap password hashes, so the comparison is about events and round trips
+os.environ.setdefault('FINSENTIO_PBKDF2_ITERATIONS', '1000')
+
+import gradio as gr  # noqa: E402
+import app  # noqa: E402  (must follow use_temp_database)
+import database as db  # noqa: E402
+import metrics  # noqa: E402
+import risk_scoring as rs  # noqa: E402
+
+
+async def login_only(username, password):
+    """The login handler before hydration moved into it"""
+    success, result = await db.authenticate_user_async(username, password)
+    if not success:
+        return f"Login failed: {result}", gr.update(visible=True), gr.update(visible=False), None
+    token = app.get_sessions().create(result)
+    db.get_user_profile(result)
+    return "Login successful!", gr.update(visible=False), gr.update(visible=True), token
+
+
+def legacy_blocks():
+    """login.then(load_profile).then(load_chat_histories), as the app used to wire it"""
+    async def load_profile(session_token):
+        return (await app.load_profile(session_token))[:len(app.PROFILE_FIELDS)]
+
+    with gr.Blocks() as blocks:
+        token = gr.State(None)
+        username, password = gr.Textbox(), gr.Textbox()
+        message, auth, dashboard = gr.Markdown(), gr.Group(), gr.Group()
+        fields = [gr.CheckboxGroup(choices=list(rs.PREVIOUS_INVESTMENT_WEIGHTS)) if field == 'previous_investments'
+                  else gr.Textbox() for field in app.PROFILE_FIELDS]
+        chats = [gr.Chatbot(), gr.State(), gr.Chatbot(), gr.State()]
+        button = gr.Button()
+        button.click(
+            login_only, [username, password], [message, auth, dashboard, token], api_name='login'
+        ).then(
+            load_profile, [token], fields, api_name='load_profile'
+        ).then(
+            lambda session_token: app._chat_histories(app.get_sessions().get_user(session_token)), [token], chats,
+            api_name='load_chat_histories'
+        )
+    return metrics.instrument_blocks(blocks)
+
+
+def handler_seconds():
+    histograms = metrics.registry.snapshot()['histograms'].get('finsentio_handler_seconds', {})
+    return sum(series['sum'] for series in histograms.values())
+
+
+def serve(blocks, port):
+    """Run the Blocks under uvicorn in a background thread; returns the server"""
+    import uvicorn
+    from fastapi import FastAPI
+
+    server = uvicorn.Server(uvicorn.Config(gr.mount_gradio_app(FastAPI(), blocks, path='/'),
+                                           host='127.0.0.1', port=port, log_level='warning'))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+def run(label, blocks, endpoints, args):
+    from gradio_client import Client
+
+    server = serve(blocks, args.port)
+    clients = [Client(f'http://127.0.0.1:{args.port}', verbose=False) for _ in range(args.threads)]
+    lock = threading.Lock()
+    logins = [0]
+
+    def log_in(worker, iteration):
+        client = clients[worker]
+        username = f'user{(worker * 7919 + iteration) % args.users + 1}'
+        client.predict(username, PASSWORD, api_name='/login')
+        # The browser runs the chained events after the login event returns
+        for endpoint in endpoints:
+            client.predict(api_name=endpoint)
+        with lock:
+            logins[0] += 1
+
+    metrics.registry.reset()
+    result = run_threads(log_in, args.threads, args.duration)
+    server.should_exit = True
+    print_result(label, result)
+    print(f"  {1 + len(endpoints)} queue event(s) per login, "
+          f"{handler_seconds() / max(1, logins[0]) * 1000:.2f} ms handler time per login")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--port', type=int, default=7880, help="the second flow uses port + 1")
+    args = parser.parse_args()
+
+    seed_database(DB_PATH, args.users)
+    print(f"{args.threads} concurrent clients, {args.duration:.0f}s per flow")
+    before = run('login, then 2 hydrate events', legacy_blocks(), ['/load_profile', '/load_chat_histories'], args)
+    args.port += 1
+    after = run('login and hydrate in 1 event', app.create_app(), [], args)
+    print(f"login latency p50: {before['p50_ms']:.1f} ms -> {after['p50_ms']:.1f} ms; "
+          f"logins/s: {after['throughput'] / before['throughput']:.2f}x")
+    db.close_db()
+
+
+if __name__ == '__main__':
+    main()
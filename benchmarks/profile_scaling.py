@@ -0,0 +1,96 @@
+"""Profile read/write latency as the user count grows.
+
+Builds synthetic databases of increasing size with the current schema and
+times get_user_profile (cache misses only) and save_user_profile (upserts) on
+random users. With the unique index on user_profiles(user_id) both stay
+O(log n): latency should be nearly flat from 10k to 1M users.
+
+    python -m benchmarks.profile_scaling --sizes 10000 100000 1000000
+"""
+import argparse
+import json
+import os
+import random
+import sqlite3
+import time
+
+from benchmarks.common import use_temp_database, summarize, print_result
+
+DB_PATH = use_temp_database()
+
+import database as db  # noqa: E402  (must follow use_temp_database)
+import migrations  # noqa: E402
+
+ANSWERS = ('Cautious', 'Uncertainty', '$1,000 in cash',
+           '60% in low-risk, 30% in medium-risk, 10% in high-risk investments',
+           'Weekly', 'Research thoroughly before investing', 'Neutral', 'Neutral',
+           ['Stocks'], 'Long-term savings')
+PROFILE_JSON = json.dumps(dict(zip(
+    ('risk_taker', 'risk_word', 'game_show', 'investment_allocation', 'market_follow',
+     'new_investment', 'buy_things', 'finance_reading', 'previous_investments', 'investment_goal'),
+    ANSWERS)))
+
+
+def build(path, users, batch=50000):
+    """Create a migrated database with `users` users, each with a profile"""
+    conn = sqlite3.connect(path)
+    conn.execute('PRAGMA journal_mode = WAL')
+    conn.execute('PRAGMA synchronous = OFF')
+    migrations.migrate(conn)
+    for start in range(0, users, batch):
+        ids = range(start + 1, min(users, start + batch) + 1)
+        conn.executemany(
+            'INSERT INTO users (id, username, password_hash, email) VALUES (?, ?, ?, ?)',
+            ((i, f'user{i}', b'x' * 64, f'user{i}@example.com') for i in ids)
+        )
+        conn.executemany(
+            'INSERT INTO user_profiles (user_id, profile_data) VALUES (?, ?)',
+            ((i, PROFILE_JSON) for i in ids)
+        )
+        conn.commit()
+    plan = conn.execute(
+        'EXPLAIN QUERY PLAN SELECT profile_data FROM user_profiles WHERE user_id = ?', (1,)
+    ).fetchone()[-1]
+    conn.close()
+    return plan
+
+
+def timed(fn, args_list):
+    latencies = []
+    started = time.perf_counter()
+    for args in args_list:
+        t0 = time.perf_counter()
+        fn(*args)
+        latencies.append(time.perf_counter() - t0)
+    return summarize(latencies, time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000])
+    parser.add_argument('--ops', type=int, default=5000)
+    args = parser.parse_args()
+
+    for size in args.sizes:
+        path = os.path.join(os.path.dirname(DB_PATH), f'users_{size}.db')
+        started = time.perf_counter()
+        plan = build(path, size)
+        print(f"{size:,} users (built in {time.perf_counter() - started:.1f}s) - {plan}")
+
+        db.close_db()
+        db.DB_PATH = path
+        db.clear_profile_cache()
+
+        ops = min(args.ops, size)
+        # Distinct ids so every read misses the profile cache and goes to SQLite
+        read_ids = random.sample(range(1, size + 1), ops)
+        print_result('  get_user_profile', timed(db.get_user_profile, [(i,) for i in read_ids]))
+        write_ids = random.sample(range(1, size + 1), ops)
+        print_result('  save_user_profile', timed(db.save_user_profile, [(i,) + ANSWERS for i in write_ids]))
+        print(f"  profile cache: {db.profile_cache_stats()['hits']} hits")
+        db.close_db()
+        os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""Risk scoring throughput: vectorized batch scoring vs row-by-row.
+
+Scores --profiles synthetic answer sets with risk_scoring.score_columns and a
+sample with the per-profile score_profile, then runs the SQLite backfill job
+over a --db-rows table.
+
+    python -m benchmarks.risk_scoring --profiles 1000000 --db-rows 200000
+"""
+import argparse
+import json
+import sqlite3
+import time
+
+import numpy as np
+
+from benchmarks.common import use_temp_database
+
+DB_PATH = use_temp_database()
+
+import database as db  # noqa: E402  (must follow use_temp_database)
+import risk_scoring as rs  # noqa: E402
+
+
+def synthetic_columns(count, seed=0):
+    rng = np.random.default_rng(seed)
+    columns = {}
+    for question in rs.QUESTIONS:
+        if question == 'previous_investments':
+            assets = list(rs.PREVIOUS_INVESTMENT_WEIGHTS)
+            choices = [json.dumps(assets[:k]) for k in range(len(assets) + 1)]
+        else:
+            choices = list(rs.ANSWER_WEIGHTS[question])
+        columns[question] = np.array(choices, dtype=object)[rng.integers(0, len(choices), count)]
+    return columns
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--profiles', type=int, default=1000000)
+    parser.add_argument('--db-rows', type=int, default=200000)
+    args = parser.parse_args()
+
+    columns = synthetic_columns(args.profiles)
+
+    started = time.perf_counter()
+    scores, categories = rs.score_columns(columns)
+    vectorized = time.perf_counter() - started
+    print(f"score_columns: {args.profiles:,} profiles in {vectorized:.2f}s "
+          f"({args.profiles / vectorized:,.0f} profiles/s)")
+
+    sample = min(args.profiles, 100000)
+    profiles = [{q: columns[q][i] for q in rs.QUESTIONS} for i in range(sample)]
+    started = time.perf_counter()
+    row_scores = [rs.score_profile(p)[0] for p in profiles]
+    per_row = time.perf_counter() - started
+    print(f"score_profile: {sample:,} profiles in {per_row:.2f}s "
+          f"({sample / per_row:,.0f} profiles/s, {per_row / sample * args.profiles:.1f}s extrapolated)")
+    mismatches = int(np.sum(np.abs(np.array(row_scores) - scores[:sample]) > 0.011))
+    print(f"  batch vs row-by-row mismatches: {mismatches}")
+
+    db.initialize_db()
+    conn = sqlite3.connect(DB_PATH)
+    rows = zip(range(1, args.db_rows + 1), *(columns[q][:args.db_rows] for q in rs.QUESTIONS))
+    conn.executemany(
+        'INSERT INTO user_profiles (user_id, profile_data) VALUES (?, ?)',
+        ((row[0], json.dumps({q: (json.loads(v) if q == 'previous_investments' else v)
+                              for q, v in zip(rs.QUESTIONS, row[1:])}))
+         for row in rows)
+    )
+    conn.commit()
+    started = time.perf_counter()
+    updated = rs.backfill_risk_scores(conn)
+    elapsed = time.perf_counter() - started
+    print(f"backfill: {updated:,} rows in {elapsed:.2f}s ({updated / elapsed:,.0f} rows/s)")
+    conn.close()
+    db.close_db()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""Synthetic data generator: seed a users.db-style database with N users and profiles.
+
+Every generated user has the password "password" (hashed once and reused, so
+seeding a million users takes seconds) and a random questionnaire profile
+with its risk score.
+
+    python -m benchmarks.seed /tmp/bench.db --users 100000
+"""
+import argparse
+import json
+import random
+import sqlite3
+import time
+
+import cohort_stats
+import migrations
+import risk_scoring as rs
+
+PASSWORD = 'password'
+
+_ASSETS = list(rs.PREVIOUS_INVESTMENT_WEIGHTS)
+
+
+def random_profile(rng):
+    """A random but valid questionnaire profile"""
+    profile = {q: rng.choice(list(answers)) for q, answers in rs.ANSWER_WEIGHTS.items()}
+    profile['previous_investments'] = rng.sample(_ASSETS, rng.randint(0, 3))
+    return profile
+
+
+def seed_database(path, users, profile_ratio=1.0, batch=50000, seed=0):
+    """Create (or extend) a migrated database with `users` synthetic users.
+
+    Users are named user<N> with email user<N>@example.com; a `profile_ratio`
+    share of them get a profile. Returns the id range of the inserted users.
+    """
+    import database as db
+
+    rng = random.Random(seed)
+    password_hash = db.hash_password(PASSWORD)
+    conn = sqlite3.connect(path)
+    conn.execute('PRAGMA synchronous = OFF')
+    migrations.migrate(conn)
+    offset = conn.execute('SELECT COALESCE(MAX(id), 0) FROM users').fetchone()[0]
+
+    for start in range(offset + 1, offset + users + 1, batch):
+        ids = range(start, min(offset + users, start + batch - 1) + 1)
+        conn.executemany(
+            'INSERT INTO users (id, username, password_hash, email) VALUES (?, ?, ?, ?)',
+            ((i, f'user{i}', password_hash, f'user{i}@example.com') for i in ids)
+        )
+        profiles = []
+        for i in ids:
+            if rng.random() < profile_ratio:
+                profile = random_profile(rng)
+                score, category = rs.score_profile(profile)
+                profiles.append((i, json.dumps(profile), score, category))
+        conn.executemany(
+            'INSERT INTO user_profiles (user_id, profile_data, risk_score, risk_category) VALUES (?, ?, ?, ?)',
+            profiles
+        )
+        conn.commit()
+    # Profiles were inserted directly, so recount the cohort answer counters
+    cohort_stats.rebuild(conn)
+    conn.commit()
+    conn.close()
+    return range(offset + 1, offset + users + 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('path', help="SQLite database file to create or extend")
+    parser.add_argument('--users', type=int, default=10000)
+    parser.add_argument('--profile-ratio', type=float, default=1.0)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    ids = seed_database(args.path, args.users, args.profile_ratio, seed=args.seed)
+    print(f"Seeded users {ids.start}-{ids.stop - 1} into {args.path} in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
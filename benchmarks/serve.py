@@ -0,0 +1,93 @@
+"""Throughput of serve.py as the number of worker processes grows.
+
+Seeds a temp database, starts ``serve.py`` with each worker count in turn
+and drives one API endpoint through the proxy with gradio_client from
+several threads. Scaling is bounded by the host's cores: on a single-core
+machine extra workers only add overhead.
+
+    python -m benchmarks.serve --workers 1 2 4 --threads 16 --endpoint login
+"""
+import argparse
+import json
+import os
+import random
+import signal
+import subprocess
+import sys
+import time
+import urllib.request
+
+from benchmarks.common import use_temp_database, run_threads, print_result
+from benchmarks.seed import PASSWORD, seed_database
+
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def wait_healthy(url, workers, timeout=180):
+    """Block until the proxy reports `workers` healthy workers"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(url + '/healthz', timeout=2) as r:
+                status = json.load(r)
+            if sum(w['healthy'] for w in status['workers']) == workers:
+                return
+        except Exception:
+            pass
+        time.sleep(0.5)
+    raise RuntimeError(f"serve.py did not become healthy within {timeout}s")
+
+
+def run(workers, args):
+    from gradio_client import Client
+
+    url = f'http://127.0.0.1:{args.port}'
+    server = subprocess.Popen(
+        [sys.executable, os.path.join(_ROOT, 'serve.py'), '--workers', str(workers),
+         '--host', '127.0.0.1', '--port', str(args.port)],
+        env=dict(os.environ, PYTHONPATH=_ROOT), cwd=_ROOT,
+    )
+    try:
+        wait_healthy(url, workers)
+        clients = []
+        for i in range(args.threads):
+            client = Client(url, verbose=False)
+            client.predict(f'user{i + 1}', PASSWORD, api_name='/login')
+            clients.append(client)
+
+        def call(index, iteration):
+            client = clients[index]
+            if args.endpoint == 'login':
+                client.predict(f'user{random.randint(1, args.users)}', PASSWORD, api_name='/login')
+            else:
+                client.predict(api_name='/' + args.endpoint)
+
+        return run_threads(call, args.threads, args.duration)
+    finally:
+        server.send_signal(signal.SIGTERM)
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=15.0)
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--endpoint', default='login', choices=['login', 'load_profile'])
+    parser.add_argument('--port', type=int, default=7870)
+    args = parser.parse_args()
+
+    path = use_temp_database()
+    seed_database(path, max(args.users, args.threads))
+    print(f"{os.cpu_count()} CPU(s), {args.threads} client threads, /{args.endpoint} for {args.duration:.0f}s")
+    baseline = None
+    for workers in args.workers:
+        result = run(workers, args)
+        baseline = baseline or result['throughput']
+        print_result(f'{workers} worker(s)', result)
+        print(f"{'':<28} {result['throughput'] / baseline:.2f}x the first run")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+"""Session load test: hundreds of concurrent sessions through the app handlers.
+
+Each simulated user saves a profile tagged with its own id through
+app.save_profile and reads it back with app.load_profile; any answer that comes
+back for a different user counts as cross-talk. A second pass measures token
+lookup latency as the session table grows.
+
+    python -m benchmarks.sessions --users 500 --threads 32
+"""
+import argparse
+import asyncio
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.common import use_temp_database, summarize, print_result
+
+DB_PATH = use_temp_database()
+
+import app  # noqa: E402  (must follow use_temp_database)
+import database as db  # noqa: E402
+from sessions import SessionStore  # noqa: E402
+
+
+def seed_users(count):
+    db.initialize_db()
+    conn = sqlite3.connect(DB_PATH)
+    conn.executemany(
+        'INSERT INTO users (username, password_hash, email) VALUES (?, ?, ?)',
+        ((f'user{i}', b'x' * 64, f'user{i}@example.com') for i in range(count))
+    )
+    conn.commit()
+    ids = [row[0] for row in conn.execute('SELECT id FROM users ORDER BY id')]
+    conn.close()
+    return ids
+
+
+async def user_round_trip(token, user_id, rounds):
+    """Save and reload a profile tagged with user_id; return (latencies, cross-talk count)"""
+    latencies, crosstalk = [], 0
+    for _ in range(rounds):
+        started = time.perf_counter()
+        await app.save_profile(token, 'Cautious', 'Loss', '$1,000 in cash',
+                               '60% in low-risk, 30% in medium-risk, 10% in high-risk investments',
+                               'Weekly', 'Research thoroughly before investing', 'Neutral', 'Neutral',
+                               [f'user-{user_id}'], 'Long-term savings')
+        updates = await app.load_profile(token)
+        latencies.append(time.perf_counter() - started)
+        if updates[8].get('value') != [f'user-{user_id}']:
+            crosstalk += 1
+    return latencies, crosstalk
+
+
+def lookup_latency(size, lookups=100000):
+    """Mean ns per get_user() with `size` live sessions"""
+    store = SessionStore(max_sessions=size, persist=False)
+    tokens = [store.create(i) for i in range(size)]
+    started = time.perf_counter_ns()
+    for i in range(lookups):
+        store.get_user(tokens[i % size])
+    return (time.perf_counter_ns() - started) / lookups
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=500)
+    parser.add_argument('--threads', type=int, default=32)
+    parser.add_argument('--rounds', type=int, default=5)
+    args = parser.parse_args()
+
+    user_ids = seed_users(args.users)
+    tokens = {user_id: app.get_sessions().create(user_id) for user_id in user_ids}
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.threads) as pool:
+        results = list(pool.map(lambda uid: asyncio.run(user_round_trip(tokens[uid], uid, args.rounds)), user_ids))
+    elapsed = time.perf_counter() - started
+
+    latencies = [lat for lats, _ in results for lat in lats]
+    crosstalk = sum(count for _, count in results)
+    print(f"{args.users} concurrent sessions, {args.threads} threads, {args.rounds} save+load rounds each")
+    print_result('save+load round trip', summarize(latencies, elapsed))
+    print(f"cross-talk: {crosstalk} of {len(latencies)} reads")
+
+    print("session lookup latency:")
+    for size in (100, 1000, 10000, 100000):
+        print(f"  {size:>7} sessions: {lookup_latency(size):8.0f} ns/lookup")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+"""Startup cost: import time, UI build and first-request latency in fresh processes.
+
+Each run starts a new interpreter that imports ``database``, ``gradio`` and
+``app``, serves a first and a second profile read and builds the UI with
+``create_app()``, timing every step. The eager ordering initializes the
+schema and builds the UI during the imports, as importing the modules used
+to; in the lazy one the first request opens the database and only a process
+that serves the UI builds it. Reports the median of --runs processes.
+
+    python -m benchmarks.startup --runs 5
+    python -m benchmarks.startup --db :memory:
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+from benchmarks.common import use_temp_database
+from benchmarks.seed import seed_database
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs in the child process; prints {step: milliseconds} as JSON
+CHILD = '''
+import json, sys, time
+eager = sys.argv[1] == 'eager'
+timings = {}
+
+def step(name, fn):
+    started = time.perf_counter()
+    result = fn()
+    timings[name] = time.perf_counter() - started
+    return result
+
+started = time.perf_counter()
+db = step('import database', lambda: __import__('database'))
+if eager:
+    step('initialize schema', db.initialize_db)
+step('import gradio', lambda: __import__('gradio'))
+app = step('import app', lambda: __import__('app'))
+if eager:
+    step('build UI', app.create_app)
+timings['ready'] = time.perf_counter() - started
+step('first request', lambda: db.get_user_profile(1))
+step('second request', lambda: db.get_user_profile(2))
+if not eager:
+    step('create_app (to serve)', app.create_app)
+print(json.dumps({name: seconds * 1000 for name, seconds in timings.items()}))
+'''
+
+
+def measure(order, runs, env):
+    """Median milliseconds per step over `runs` fresh processes"""
+    samples = []
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, '-c', CHILD, order], cwd=ROOT, env=env, check=True,
+                                capture_output=True, text=True).stdout
+        samples.append(json.loads(output.strip().splitlines()[-1]))
+    return {step: statistics.median(sample[step] for sample in samples) for step in samples[0]}
+
+
+def report(label, timings):
+    print(label)
+    for step, ms in timings.items():
+        print(f"  {step:<24} {ms:9.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--db', default=None, help="database path for the children, e.g. :memory: "
+                                                   "(default: a seeded temp file)")
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    if args.db is None:
+        path = use_temp_database()
+        seed_database(path, args.users)
+        env['FINSENTIO_DB_PATH'] = path
+    else:
+        env['FINSENTIO_DB_PATH'] = args.db
+
+    print(f"{args.runs} fresh processes per ordering, database {env['FINSENTIO_DB_PATH']}")
+    eager = measure('eager', args.runs, env)
+    lazy = measure('lazy', args.runs, env)
+    report('eager: schema and UI set up on import (as before)', eager)
+    report('lazy: schema on first use, UI in create_app()', lazy)
+    print(f"import to ready: {eager['ready']:.0f} ms -> {lazy['ready']:.0f} ms "
+          f"({eager['ready'] - eager['import gradio']:.0f} ms -> {lazy['ready'] - lazy['import gradio']:.0f} ms "
+          f"besides importing gradio); first request: {eager['first request']:.1f} ms -> "
+          f"{lazy['first request']:.1f} ms")
+
+if __name__ == '__main__':
+    main()
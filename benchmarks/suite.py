@@ -0,0 +1,252 @@
+"""Benchmark suite for the database layer and the Gradio handlers.
+
+Seeds a temporary database with synthetic users, runs a microbenchmark for
+each database.py function, then drives a concurrent mixed workload through
+the app.py handlers (called directly, or over HTTP against a running app with
+--url). Results are throughput and p50/p95/p99 latency per endpoint, written
+as JSON and optionally compared against a stored baseline.
+
+    python -m benchmarks.suite --users 10000 --threads 16 --output run.json
+    python -m benchmarks.suite --baseline baseline.json --fail-on-regression
+    python -m benchmarks.suite --save-baseline baseline.json
+    python -m benchmarks.suite --url http://127.0.0.1:7860 --skip-micro
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import sys
+import threading
+import time
+
+from benchmarks.common import use_temp_database, run_threads, summarize, print_result
+from benchmarks.seed import PASSWORD, random_profile, seed_database
+
+DB_PATH = use_temp_database()
+
+import database as db  # noqa: E402  (must follow use_temp_database)
+
+PROFILE_FIELDS = ('risk_taker', 'risk_word', 'game_show', 'investment_allocation', 'market_follow',
+                  'new_investment', 'buy_things', 'finance_reading', 'previous_investments',
+                  'investment_goal')
+
+# Relative frequency of each endpoint in the mixed load
+LOAD_MIX = {
+    'load_profile': 40,
+    'save_profile': 10,
+    'education_chat': 20,
+    'adviser_chat': 20,
+    'login': 8,
+    'register': 2,
+}
+
+
+def profile_args(rng):
+    profile = random_profile(rng)
+    return tuple(profile[field] for field in PROFILE_FIELDS)
+
+
+def run_micro(users, duration):
+    """Single-threaded timing of each database.py function"""
+    rng = random.Random(1)
+    counter = iter(range(10 ** 9))
+    cases = {
+        'db.register_user': lambda: db.register_user(f'micro{next(counter)}', PASSWORD,
+                                                     f'micro{next(counter)}@example.com'),
+        'db.authenticate_user': lambda: db.authenticate_user('user1', PASSWORD),
+        'db.save_user_profile': lambda: db.save_user_profile(rng.randint(1, users), *profile_args(rng)),
+        'db.get_user_profile (hot)': lambda: db.get_user_profile(1),
+        'db.get_user_profile (random)': lambda: db.get_user_profile(rng.randint(1, users)),
+        'db.get_user_risk_score': lambda: db.get_user_risk_score(rng.randint(1, users)),
+    }
+    results = {}
+    for name, fn in cases.items():
+        results[name] = run_threads(lambda worker, iteration: fn(), 1, duration)
+        print_result(name, results[name])
+    return results
+
+
+class DirectDriver:
+    """Calls the app.py handler functions in-process"""
+
+    def __init__(self):
+        import app
+        self.app = app
+
+    def start(self, user_id):
+        return {'token': self.app.get_sessions().create(user_id), 'views': {}}
+
+    def call(self, state, endpoint, rng):
+        app = self.app
+        if endpoint == 'load_profile':
+            asyncio.run(app.load_profile(state['token']))
+        elif endpoint == 'save_profile':
+            asyncio.run(app.save_profile(state['token'], *profile_args(rng)))
+        elif endpoint == 'education_chat':
+            for _, view in app.education_chatbot("What is an ETF?", state['token'], state['views'].get('education')):
+                pass
+            state['views']['education'] = view
+        elif endpoint == 'adviser_chat':
+            for _, view in app.advisor_chatbot("How should I invest?", state['token'], state['views'].get('advisor')):
+                pass
+            state['views']['advisor'] = view
+        elif endpoint == 'login':
+            asyncio.run(app.login(f"user{rng.randint(1, 100)}", PASSWORD))
+        elif endpoint == 'register':
+            name = f"load{threading.get_ident()}_{time.perf_counter_ns()}"
+            asyncio.run(app.register(name, PASSWORD, f"{name}@example.com", PASSWORD))
+
+
+class HttpDriver:
+    """Calls the named API endpoints of a running app through gradio_client"""
+
+    def __init__(self, url):
+        from gradio_client import Client
+        self.url = url
+        self.client_class = Client
+
+    def start(self, user_id):
+        client = self.client_class(self.url, verbose=False)
+        client.predict(f"user{user_id}", PASSWORD, api_name="/login")
+        return {'client': client}
+
+    def call(self, state, endpoint, rng):
+        client = state['client']
+        if endpoint == 'load_profile':
+            client.predict(api_name="/load_profile")
+        elif endpoint == 'save_profile':
+            client.predict(*profile_args(rng), api_name="/save_profile")
+        elif endpoint == 'education_chat':
+            client.predict("What is an ETF?", api_name="/education_chat")
+        elif endpoint == 'adviser_chat':
+            client.predict("How should I invest?", api_name="/adviser_chat")
+        elif endpoint == 'login':
+            client.predict(f"user{rng.randint(1, 100)}", PASSWORD, api_name="/login")
+        elif endpoint == 'register':
+            name = f"load{threading.get_ident()}_{time.perf_counter_ns()}"
+            client.predict(name, PASSWORD, f"{name}@example.com", PASSWORD, api_name="/register")
+
+
+def run_load(driver, threads, duration):
+    """Mixed concurrent load; returns per-endpoint summaries"""
+    endpoints = [name for name, weight in LOAD_MIX.items() for _ in range(weight)]
+    latencies = {name: [] for name in LOAD_MIX}
+    errors = {name: 0 for name in LOAD_MIX}
+    lock = threading.Lock()
+    barrier = threading.Barrier(threads)
+    deadline = [0.0]
+
+    def worker(index):
+        rng = random.Random(index)
+        state = driver.start(index + 1)
+        local = {name: [] for name in LOAD_MIX}
+        local_errors = {name: 0 for name in LOAD_MIX}
+        if barrier.wait() == 0:
+            deadline[0] = time.perf_counter() + duration
+        barrier.wait()
+        while time.perf_counter() < deadline[0]:
+            endpoint = rng.choice(endpoints)
+            started = time.perf_counter()
+            try:
+                driver.call(state, endpoint, rng)
+            except Exception:
+                local_errors[endpoint] += 1
+                continue
+            local[endpoint].append(time.perf_counter() - started)
+        with lock:
+            for name in LOAD_MIX:
+                latencies[name].extend(local[name])
+                errors[name] += local_errors[name]
+
+    started = time.perf_counter()
+    workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    results = {}
+    for name in LOAD_MIX:
+        results[name] = dict(summarize(latencies[name], elapsed), errors=errors[name])
+        print_result(name, results[name])
+    return results
+
+
+def compare(current, baseline, tolerance, min_delta_ms):
+    """Print per-endpoint changes against a baseline; return the regressed endpoints.
+
+    p99 changes smaller than min_delta_ms are treated as noise.
+    """
+    regressions = []
+    print(f"\nComparison with baseline (tolerance {tolerance:.0%}):")
+    for section in ('micro', 'load'):
+        for name, result in current.get(section, {}).items():
+            base = baseline.get(section, {}).get(name)
+            if not base or not base['throughput']:
+                continue
+            throughput = result['throughput'] / base['throughput'] - 1
+            p99 = result['p99_ms'] / base['p99_ms'] - 1 if base['p99_ms'] else 0.0
+            p99_delta_ms = result['p99_ms'] - base['p99_ms']
+            regressed = throughput < -tolerance or (p99 > tolerance and p99_delta_ms > min_delta_ms)
+            if regressed:
+                regressions.append(f"{section}:{name}")
+            print(f"  {'REGRESSION ' if regressed else ''}{section}:{name:<28} "
+                  f"throughput {throughput:+.1%}   p99 {p99:+.1%}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=10000)
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=5.0, help="seconds per load run")
+    parser.add_argument('--micro-duration', type=float, default=1.0, help="seconds per microbenchmark")
+    parser.add_argument('--skip-micro', action='store_true')
+    parser.add_argument('--url', help="drive a running app over HTTP instead of calling handlers directly")
+    parser.add_argument('--output', help="write results JSON to this file")
+    parser.add_argument('--baseline', help="compare against this results JSON")
+    parser.add_argument('--save-baseline', help="also write results to this baseline file")
+    parser.add_argument('--tolerance', type=float, default=0.10)
+    parser.add_argument('--min-delta-ms', type=float, default=1.0,
+                        help="ignore p99 increases smaller than this")
+    parser.add_argument('--fail-on-regression', action='store_true')
+    args = parser.parse_args()
+
+    if not args.url:
+        seed_database(DB_PATH, args.users)
+
+    results = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'config': {
+            'users': args.users, 'threads': args.threads, 'duration': args.duration,
+            'mode': 'http' if args.url else 'direct', 'cpus': os.cpu_count(),
+            'python': platform.python_version(), 'pool_size': db.POOL_SIZE,
+        },
+    }
+    if not args.skip_micro and not args.url:
+        print("Microbenchmarks:")
+        results['micro'] = run_micro(args.users, args.micro_duration)
+
+    print(f"\nMixed load: {args.threads} threads for {args.duration:.0f}s ({results['config']['mode']})")
+    driver = HttpDriver(args.url) if args.url else DirectDriver()
+    results['load'] = run_load(driver, args.threads, args.duration)
+
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            regressions = compare(results, json.load(f), args.tolerance, args.min_delta_ms)
+        if regressions and args.fail_on_regression:
+            print(f"\n{len(regressions)} regression(s): {', '.join(regressions)}")
+            sys.exit(1)
+    db.close_db()
+
+
+if __name__ == '__main__':
+    main()
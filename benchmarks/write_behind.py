@@ -0,0 +1,90 @@
+"""Profile-save throughput and reader latency: per-save commits vs write-behind group commits.
+
+Writer threads save profiles of a small hot set of users (so the queue has
+repeated saves to coalesce) while reader threads query profiles straight
+from SQLite, bypassing the profile cache. Each mode runs on the same
+database; --sync sets the synchronous pragma of every connection so FULL
+(an fsync per commit) can be compared as well as the default NORMAL.
+
+    python -m benchmarks.write_behind --writers 16 --readers 4 --sync FULL
+"""
+import argparse
+import random
+import threading
+
+from benchmarks.common import use_temp_database, run_threads, print_result
+from benchmarks.seed import random_profile, seed_database
+
+DB_PATH = use_temp_database()
+
+import database as db  # noqa: E402  (must follow use_temp_database)
+from db_pool import DEFAULT_PRAGMAS  # noqa: E402
+
+
+def read_profile(user_id):
+    with db.get_db_connection() as conn:
+        return conn.execute('SELECT profile_data FROM user_profiles WHERE user_id = ?', (user_id,)).fetchone()
+
+
+def run(label, args, profiles):
+    def write(worker, iteration):
+        rng = random.Random(worker * 100003 + iteration)
+        user_id = rng.randint(1, args.hot_users)
+        ok, message = db.save_user_profile(user_id, *profiles[rng.randrange(len(profiles))])
+        if not ok:
+            raise RuntimeError(message)
+
+    def read(worker, iteration):
+        read_profile((worker * 7919 + iteration) % args.users + 1)
+
+    readers = {}
+    thread = threading.Thread(target=lambda: readers.update(run_threads(read, args.readers, args.duration)))
+    thread.start()
+    writers = run_threads(write, args.writers, args.duration)
+    thread.join()
+    if db.WRITE_BEHIND:
+        db.get_write_queue().flush()
+    print(f"{label}:")
+    print_result('  profile saves', writers)
+    print_result('  profile reads', readers)
+    return writers
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--writers', type=int, default=16)
+    parser.add_argument('--readers', type=int, default=4)
+    parser.add_argument('--duration', type=float, default=5.0)
+    parser.add_argument('--users', type=int, default=10000)
+    parser.add_argument('--hot-users', type=int, default=500, help="users whose profiles get saved")
+    parser.add_argument('--sync', default='NORMAL', choices=['OFF', 'NORMAL', 'FULL'])
+    args = parser.parse_args()
+
+    seed_database(DB_PATH, args.users)
+    rng = random.Random(0)
+    questions = ['risk_taker', 'risk_word', 'game_show', 'investment_allocation', 'market_follow',
+                 'new_investment', 'buy_things', 'finance_reading', 'previous_investments', 'investment_goal']
+    profiles = [[profile[q] for q in questions] for profile in (random_profile(rng) for _ in range(100))]
+
+    # Rebuild the pool so every connection uses the requested sync level, timed like the
+    # app's (and the write-behind writer's) connections
+    db.close_db()
+    db._pool = db._open_pool(db.POOL_SIZE, pragmas=dict(DEFAULT_PRAGMAS, synchronous=args.sync),
+                             **db._pool_instrumentation())
+    db.WRITE_SYNC = args.sync
+
+    print(f"{args.writers} writers, {args.readers} readers, {args.hot_users} hot users, "
+          f"synchronous={args.sync}, {args.duration:.0f}s per mode")
+    db.WRITE_BEHIND = False
+    direct = run('commit per save', args, profiles)
+    db.WRITE_BEHIND = True
+    db.WRITE_ACK = 'commit'
+    grouped = run(f'write-behind (batches of up to {db.WRITE_BATCH_SIZE}, ack after commit)', args, profiles)
+    db.WRITE_ACK = 'queued'
+    run('write-behind (ack when queued)', args, profiles)
+    print(f"save throughput with group commit: {grouped['throughput'] / direct['throughput']:.2f}x")
+    db.close_db()
+
+
+if __name__ == '__main__':
+    main()
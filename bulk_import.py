@@ -0,0 +1,206 @@
+"""Bulk user import.
+
+Streams users from CSV or JSONL, hashes passwords across a process pool and
+inserts them in chunked transactions. Memory use depends on the chunk size
+only, never on the size of the input.
+
+Rows that can't be imported, including malformed JSONL lines and non-text
+fields, are reported as failed rows and the import carries on.
+
+    python bulk_import.py partner_users.csv --report report.jsonl
+"""
+import argparse
+import csv
+import itertools
+import json
+import os
+import sqlite3
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import database as db
+
+CHUNK_SIZE = 1000
+USER_FIELDS = ('username', 'email', 'password')
+
+
+class InvalidRow:
+    """An input row that could not be parsed; it is reported as a failed row"""
+
+    def __init__(self, reason):
+        self.reason = reason
+
+
+def read_users(path, fmt=None):
+    """Yield {'username', 'password', 'email'} dicts (or InvalidRow) from a CSV or JSONL file"""
+    fmt = fmt or ('jsonl' if path.endswith(('.jsonl', '.ndjson')) else 'csv')
+    with open(path, newline='', encoding='utf-8') as f:
+        if fmt == 'csv':
+            yield from csv.DictReader(f)
+        else:
+            for line_number, line in enumerate(f, 1):
+                if line.strip():
+                    try:
+                        yield json.loads(line)
+                    except json.JSONDecodeError as e:
+                        yield InvalidRow(f"Invalid JSON on line {line_number}: {e.msg}")
+
+
+def _row_error(row):
+    """Why a row can't be imported whatever its values, or None"""
+    if isinstance(row, InvalidRow):
+        return row.reason
+    if not isinstance(row, dict):
+        return "Row is not an object with username, email and password"
+    if not all(isinstance(row.get(field) or '', str) for field in USER_FIELDS):
+        return "Username, email and password must be text"
+    return None
+
+
+def _hash_chunk(passwords):
+    """Runs in a worker process"""
+    return [db.hash_password(password) for password in passwords]
+
+
+def _existing(conn, column, values):
+    """Return the subset of values already present in users.<column>"""
+    if not values:
+        return set()
+    placeholders = ','.join('?' * len(values))
+    rows = conn.execute(f'SELECT {column} FROM users WHERE {column} IN ({placeholders})', list(values))
+    return {row[0] for row in rows}
+
+
+def _import_chunk(rows, start, executor, workers):
+    """Validate, hash and insert one chunk; return its per-row results"""
+    results = [None] * len(rows)
+    candidates = []
+    seen_usernames, seen_emails = set(), set()
+
+    for offset, row in enumerate(rows):
+        error = _row_error(row)
+        if error:
+            username = row.get('username') if isinstance(row, dict) else None
+            results[offset] = (start + offset, '' if username is None else str(username), False, error)
+            continue
+        username = (row.get('username') or '').strip()
+        email = (row.get('email') or '').strip()
+        password = row.get('password') or ''
+        if not username or not email or not password:
+            results[offset] = (start + offset, username, False, "Missing username, email or password")
+        elif username in seen_usernames:
+            results[offset] = (start + offset, username, False, "Username already exists")
+        elif email in seen_emails:
+            results[offset] = (start + offset, username, False, "Email already exists")
+        else:
+            seen_usernames.add(username)
+            seen_emails.add(email)
+            candidates.append((offset, username, password, email))
+
+    # One IN query per column instead of two SELECTs per user
+    with db.get_db_connection() as conn:
+        taken_usernames = _existing(conn, 'username', [c[1] for c in candidates])
+        taken_emails = _existing(conn, 'email', [c[3] for c in candidates])
+
+    to_insert = []
+    for offset, username, password, email in candidates:
+        if username in taken_usernames:
+            results[offset] = (start + offset, username, False, "Username already exists")
+        elif email in taken_emails:
+            results[offset] = (start + offset, username, False, "Email already exists")
+        else:
+            to_insert.append((offset, username, password, email))
+
+    passwords = [c[2] for c in to_insert]
+    if executor is None:
+        hashes = _hash_chunk(passwords)
+    else:
+        step = max(1, -(-len(passwords) // workers))
+        parts = [passwords[i:i + step] for i in range(0, len(passwords), step)]
+        hashes = [h for part in executor.map(_hash_chunk, parts) for h in part]
+
+    with db.get_db_connection() as conn:
+        try:
+            conn.executemany(
+                'INSERT INTO users (username, password_hash, email) VALUES (?, ?, ?)',
+                [(c[1], h, c[3]) for c, h in zip(to_insert, hashes)]
+            )
+            conn.commit()
+            for offset, username, _, _ in to_insert:
+                results[offset] = (start + offset, username, True, "User registered successfully")
+        except sqlite3.IntegrityError:
+            # A concurrent registration took a name; fall back to row-by-row inserts
+            conn.rollback()
+            for (offset, username, _, email), password_hash in zip(to_insert, hashes):
+                try:
+                    conn.execute(
+                        'INSERT INTO users (username, password_hash, email) VALUES (?, ?, ?)',
+                        (username, password_hash, email)
+                    )
+                    results[offset] = (start + offset, username, True, "User registered successfully")
+                except sqlite3.IntegrityError:
+                    results[offset] = (start + offset, username, False, "Username or email already exists")
+            conn.commit()
+    return results
+
+
+def register_users_bulk(users, chunk_size=CHUNK_SIZE, workers=None):
+    """Register many users; yields (row_number, username, success, message) per input row.
+
+    ``users`` is any iterable of dicts with username, password and email keys.
+    Rows are processed one chunk at a time, each chunk committed in a single
+    transaction. ``workers`` sets the hashing process count (0 hashes inline).
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    executor = ProcessPoolExecutor(max_workers=workers) if workers > 0 else None
+    try:
+        iterator = iter(users)
+        start = 0
+        while True:
+            rows = list(itertools.islice(iterator, chunk_size))
+            if not rows:
+                break
+            yield from _import_chunk(rows, start, executor, workers)
+            start += len(rows)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk-register users from a CSV or JSONL file")
+    parser.add_argument('path', help="input file with username, password and email columns/keys")
+    parser.add_argument('--format', choices=['csv', 'jsonl'], help="input format (default: from extension)")
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+    parser.add_argument('--workers', type=int, default=None, help="hashing processes (default: CPU count)")
+    parser.add_argument('--report', help="write a JSONL per-row report to this file")
+    args = parser.parse_args(argv)
+
+    report = open(args.report, 'w', encoding='utf-8') if args.report else None
+    imported = failed = 0
+    started = time.perf_counter()
+    try:
+        results = register_users_bulk(read_users(args.path, args.format), args.chunk_size, args.workers)
+        for row_number, username, success, message in results:
+            if success:
+                imported += 1
+            else:
+                failed += 1
+            if report:
+                report.write(json.dumps({'row': row_number, 'username': username,
+                                         'success': success, 'message': message}) + '\n')
+    finally:
+        if report:
+            report.close()
+
+    elapsed = time.perf_counter() - started
+    total = imported + failed
+    print(f"Imported {imported} of {total} users in {elapsed:.1f}s "
+          f"({total / elapsed if elapsed else 0:.0f} rows/s), {failed} failed", file=sys.stderr)
+    return 0 if failed == 0 else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,105 @@
+"""Pluggable model backends for the chatbot tabs.
+
+A backend implements ``ChatBackend.stream``, yielding the reply a chunk
+(token) at a time. ``stream_reply`` drives a backend for a Gradio handler,
+yielding the growing reply text and recording time-to-first-token and
+tokens/second per endpoint as metrics histogram samples.
+
+Backends are chosen per tab from the environment as ``module:attribute``
+(a ChatBackend subclass or factory), e.g.
+``FINSENTIO_EDUCATION_BACKEND=my_models:LlamaBackend``; by default the
+deterministic ``PlaceholderBackend`` is used.
+"""
+import importlib
+import os
+import time
+
+import metrics
+
+
+class ChatBackend:
+    """Interface for chatbot model backends"""
+
+    # Whether stream_batch decodes several requests together (see batch_scheduler)
+    supports_batching = False
+
+    def stream(self, message, history, context=None):
+        """Yield the reply to `message` as successive text chunks.
+
+        `history` is the list of previous [user, assistant] pairs and
+        `context` optional extra data for the prompt (e.g. the user's profile).
+        """
+        raise NotImplementedError
+
+    def complete(self, message, history, context=None):
+        """Return the whole reply at once"""
+        return ''.join(self.stream(message, history, context))
+
+    def stream_batch(self, requests):
+        """Yield, per decoding step, one chunk (or None) for each (message, history, context) request.
+
+        The default answers the requests one after another; batched backends
+        override it to decode them together and set ``supports_batching``.
+        """
+        for index, (message, history, context) in enumerate(requests):
+            for chunk in self.stream(message, history, context):
+                step = [None] * len(requests)
+                step[index] = chunk
+                yield step
+
+    def for_user(self, user_id):
+        """The backend to use for one user's requests (schedulers use this for fairness)"""
+        return self
+
+
+class PlaceholderBackend(ChatBackend):
+    """Deterministic local stand-in that streams a fixed reply word by word"""
+
+    def __init__(self, reply, token_delay=0.0):
+        self.reply = reply
+        self.token_delay = token_delay
+
+    def stream(self, message, history, context=None):
+        for index, word in enumerate(self.reply.split(' ')):
+            if self.token_delay:
+                time.sleep(self.token_delay)
+            yield word if index == 0 else ' ' + word
+
+
+def prompt_tokens(message, history, context=None):
+    """Rough prompt length in words: the message, the history and the context"""
+    words = len(message.split())
+    for turn in history:
+        words += sum(len(part.split()) for part in turn if part)
+    if context:
+        words += len(str(context).split())
+    return words
+
+
+def load_backend(env_var, default):
+    """Instantiate the backend named by env_var ('module:attribute'), or return default"""
+    spec = os.environ.get(env_var)
+    if not spec:
+        return default
+    module_name, _, attribute = spec.partition(':')
+    factory = getattr(importlib.import_module(module_name), attribute)
+    return factory()
+
+
+def stream_reply(backend, endpoint, message, history, context=None):
+    """Yield the accumulated reply text after each chunk, recording stream metrics"""
+    started = time.perf_counter()
+    ttft = None
+    tokens = 0
+    reply = ''
+    for chunk in backend.stream(message, history, context):
+        if ttft is None:
+            ttft = time.perf_counter() - started
+        tokens += 1
+        reply += chunk
+        yield reply
+    elapsed = time.perf_counter() - started
+    label = f'endpoint={endpoint}'
+    metrics.observe('finsentio_chat_ttft_seconds', label, elapsed if ttft is None else ttft)
+    metrics.observe('finsentio_chat_tokens_per_second', label, tokens / elapsed if elapsed > 0 else 0.0,
+                    metrics.RATE_BUCKETS)
@@ -0,0 +1,109 @@
+"""Server-side chat history.
+
+Every chatbot exchange is appended to the ``chat_messages`` table, keyed by
+user and tab. The handlers no longer receive the whole conversation from the
+browser: they rebuild what is on screen from here, feed the backend only a
+bounded context window (optionally prefixed with a summary of older turns
+from a pluggable summarizer) and load older turns a page at a time when the
+user asks for them.
+"""
+import os
+
+import database as db
+
+# Turns of recent conversation passed to the model backend
+CHAT_CONTEXT_TURNS = int(os.environ.get('FINSENTIO_CHAT_CONTEXT_TURNS', '10'))
+# Turns shown after login and after each exchange, and loaded per "Load earlier messages" click
+CHAT_PAGE_SIZE = int(os.environ.get('FINSENTIO_CHAT_PAGE_SIZE', '20'))
+# Most turns a tab shows after loading earlier pages; the newest drop out of view beyond it
+CHAT_VIEW_TURNS = int(os.environ.get('FINSENTIO_CHAT_VIEW_TURNS', '100'))
+# Older turns handed to the summarizer, beyond the context window
+SUMMARY_SOURCE_TURNS = 50
+
+_summarizer = None
+
+
+def set_summarizer(summarizer):
+    """Register fn(turns) -> str that condenses turns older than the context window.
+
+    ``turns`` is a list of (message, reply) pairs, oldest first. Pass None to
+    disable summarization.
+    """
+    global _summarizer
+    _summarizer = summarizer
+
+
+def _insert_turn(conn, user_id, tab, message, reply):
+    cursor = conn.execute(
+        'INSERT INTO chat_messages (user_id, tab, message, reply) VALUES (?, ?, ?, ?)',
+        (user_id, tab, message, reply)
+    )
+    return cursor.lastrowid
+
+
+def append_turn(user_id, tab, message, reply):
+    """Store one exchange and return its id (after the group commit in write-behind mode)"""
+    return db.submit_write(None, _insert_turn, user_id, tab, message, reply).result()
+
+
+def latest_turn_id(user_id, tab):
+    """Id of the newest stored turn, or 0"""
+    with db.get_db_connection() as conn:
+        row = conn.execute(
+            'SELECT MAX(id) FROM chat_messages WHERE user_id = ? AND tab = ?', (user_id, tab)
+        ).fetchone()
+    return row[0] or 0
+
+
+def recent_turns(user_id, tab, limit=CHAT_PAGE_SIZE, after_id=0):
+    """The newest `limit` turns with id > after_id, as (id, message, reply), oldest first"""
+    with db.get_db_connection() as conn:
+        rows = conn.execute(
+            '''SELECT id, message, reply FROM chat_messages
+               WHERE user_id = ? AND tab = ? AND id > ?
+               ORDER BY id DESC LIMIT ?''',
+            (user_id, tab, after_id, limit)
+        ).fetchall()
+    return [tuple(row) for row in reversed(rows)]
+
+
+def turns_before(user_id, tab, before_id, limit=CHAT_PAGE_SIZE, after_id=0):
+    """Up to `limit` turns older than before_id (and with id > after_id), oldest first"""
+    with db.get_db_connection() as conn:
+        rows = conn.execute(
+            '''SELECT id, message, reply FROM chat_messages
+               WHERE user_id = ? AND tab = ? AND id < ? AND id > ?
+               ORDER BY id DESC LIMIT ?''',
+            (user_id, tab, before_id, after_id, limit)
+        ).fetchall()
+    return [tuple(row) for row in reversed(rows)]
+
+
+def turns_from(user_id, tab, first_id, limit=CHAT_VIEW_TURNS):
+    """Up to `limit` turns with id >= first_id, oldest first"""
+    with db.get_db_connection() as conn:
+        rows = conn.execute(
+            '''SELECT id, message, reply FROM chat_messages
+               WHERE user_id = ? AND tab = ? AND id >= ?
+               ORDER BY id LIMIT ?''',
+            (user_id, tab, first_id, limit)
+        ).fetchall()
+    return [tuple(row) for row in rows]
+
+
+def context_window(user_id, tab, after_id=0, turns=CHAT_CONTEXT_TURNS):
+    """History pairs to feed the backend: the last `turns` exchanges after after_id,
+    preceded by a summary of older ones when a summarizer is registered"""
+    window = recent_turns(user_id, tab, turns, after_id)
+    history = [[message, reply] for _, message, reply in window]
+    if _summarizer is not None and window:
+        older = turns_before(user_id, tab, window[0][0], SUMMARY_SOURCE_TURNS, after_id)
+        older = [(message, reply) for _, message, reply in older]
+        if older:
+            history.insert(0, ["Summary of the earlier conversation", _summarizer(older)])
+    return history
+
+
+def as_pairs(turns):
+    """Convert (id, message, reply) rows to gr.Chatbot [message, reply] pairs"""
+    return [[message, reply] for _, message, reply in turns]
@@ -0,0 +1,158 @@
+"""Answer counters behind the dashboard's "How You Compare" panel.
+
+The ``answer_counts`` table holds, for every cohort (all users, and each risk
+category), how many profiles picked each answer to each question, plus the
+number of profiles in the cohort. ``apply_change`` is called by the profile
+write with the user's old and new answers, in the same transaction, so the
+counters never drift from ``user_profiles`` and reading a cohort costs a
+few dozen primary-key rows however many profiles there are. ``rebuild``
+recomputes the table from scratch, for recovery or after bulk changes.
+
+    python cohort_stats.py rebuild
+    python cohort_stats.py show [--cohort Moderate]
+"""
+import argparse
+import json
+import time
+from collections import Counter
+
+from risk_scoring import QUESTIONS
+
+# Cohort of every profile; the other cohorts are the risk categories
+ALL_USERS = 'all'
+# Pseudo-question whose single answer '' counts the profiles in a cohort
+PROFILES = '_profiles'
+
+# Short question names for the comparison table
+QUESTION_LABELS = {
+    'risk_taker': "How a friend would describe you",
+    'risk_word': "What \"risk\" brings to mind",
+    'game_show': "Game show choice",
+    'investment_allocation': "Preferred allocation",
+    'market_follow': "How often you follow markets",
+    'new_investment': "Reaction to a new opportunity",
+    'buy_things': "Rarely buy things you don't need",
+    'finance_reading': "Like reading about finance",
+    'previous_investments': "Invested in before",
+    'investment_goal': "Main investment goal",
+}
+
+_UPSERT = '''INSERT INTO answer_counts (cohort, question, answer, count) VALUES (?, ?, ?, ?)
+             ON CONFLICT (cohort, question, answer) DO UPDATE SET count = count + excluded.count'''
+
+
+def answer_pairs(profile):
+    """(question, answer) pairs counted for a profile, including the cohort-size pair"""
+    pairs = [(PROFILES, '')]
+    for question in QUESTIONS:
+        value = profile.get(question)
+        if isinstance(value, list):
+            pairs.extend((question, answer) for answer in dict.fromkeys(value) if isinstance(answer, str))
+        elif isinstance(value, str):
+            pairs.append((question, value))
+    return pairs
+
+
+def _cohorts(category):
+    return (ALL_USERS, category) if category else (ALL_USERS,)
+
+
+def apply_change(conn, old_profile, old_category, new_profile, new_category):
+    """Move a user's counts from their old answers (None: no profile yet) to the new ones"""
+    deltas = Counter()
+    if old_profile is not None:
+        for cohort in _cohorts(old_category):
+            for question, answer in answer_pairs(old_profile):
+                deltas[cohort, question, answer] -= 1
+    for cohort in _cohorts(new_category):
+        for question, answer in answer_pairs(new_profile):
+            deltas[cohort, question, answer] += 1
+    changes = [(cohort, question, answer, delta) for (cohort, question, answer), delta in deltas.items() if delta]
+    if changes:
+        conn.executemany(_UPSERT, changes)
+
+
+def rebuild(conn, batch_size=10000):
+    """Recompute every counter from user_profiles (the caller commits).
+
+    Profiles are streamed in batches; memory holds one counter per distinct
+    (cohort, question, answer), not the profiles.
+    """
+    deltas = Counter()
+    cursor = conn.cursor()
+    cursor.row_factory = None
+    cursor.execute('SELECT profile_data, risk_category FROM user_profiles')
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            break
+        for profile_data, category in rows:
+            pairs = answer_pairs(json.loads(profile_data))
+            for cohort in _cohorts(category):
+                deltas.update((cohort, question, answer) for question, answer in pairs)
+    conn.execute('DELETE FROM answer_counts')
+    conn.executemany(_UPSERT, [key + (count,) for key, count in deltas.items()])
+
+
+def read_cohort(conn, cohort=ALL_USERS):
+    """({question: {answer: count}}, profile count) of a cohort"""
+    counts = {}
+    total = 0
+    rows = conn.execute(
+        'SELECT question, answer, count FROM answer_counts WHERE cohort = ? AND count > 0', (cohort,)
+    )
+    for question, answer, count in rows:
+        if question == PROFILES:
+            total = count
+        else:
+            counts.setdefault(question, {})[answer] = count
+    return counts, total
+
+
+def format_comparison(profile, category, everyone, peers):
+    """Markdown table of the share of all users, and of the user's risk category, who answered like them"""
+    counts, total = everyone
+    peer_counts, peer_total = peers
+    if not total:
+        return "No saved profiles to compare with yet."
+
+    def share(cohort_counts, cohort_total, question, answer):
+        if not cohort_total:
+            return "-"
+        return f"{cohort_counts.get(question, {}).get(answer, 0) / cohort_total:.0%}"
+
+    peer_heading = f"{category} investors" if category else "Your risk category"
+    lines = [f"How your answers compare with {total:,} investors"
+             + (f" ({peer_total:,} in your {category} risk category)" if category else "") + ":", "",
+             f"| Question | Your answer | All investors | {peer_heading} |",
+             "|---|---|---|---|"]
+    for question, answer in answer_pairs(profile)[1:]:
+        lines.append(f"| {QUESTION_LABELS.get(question, question)} | {answer} | "
+                     f"{share(counts, total, question, answer)} | {share(peer_counts, peer_total, question, answer)} |")
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Peer cohort answer counters")
+    sub = parser.add_subparsers(dest='command', required=True)
+    sub.add_parser('rebuild', help="recompute every counter from user_profiles")
+    show = sub.add_parser('show', help="print a cohort's answer distribution")
+    show.add_argument('--cohort', default=ALL_USERS, help="'all' or a risk category")
+    args = parser.parse_args(argv)
+
+    import database as db
+    with db.get_db_connection() as conn:
+        if args.command == 'rebuild':
+            started = time.perf_counter()
+            conn.execute('BEGIN IMMEDIATE')
+            rebuild(conn)
+            conn.commit()
+            _, total = read_cohort(conn)
+            print(f"Rebuilt counters for {total} profiles in {time.perf_counter() - started:.1f}s")
+        else:
+            counts, total = read_cohort(conn, args.cohort)
+            print(json.dumps({'cohort': args.cohort, 'profiles': total, 'counts': counts}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,186 +1,599 @@
 import sqlite3
-import hashlib
 import os
 import json
+import atexit
+import asyncio
+import functools
+import itertools
+import threading
+from concurrent.futures import Future
+from contextlib import contextmanager
+from urllib.request import pathname2url
+
+import metrics
+import cohort_stats
+import migrations
+import password_hashing
+import risk_scoring
+from db_executor import DBExecutor, DBQueueFull
+from db_pool import ConnectionPool, DEFAULT_PRAGMAS
+from hash_pool import HashExecutor, HashQueueFull
+from ttl_cache import TTLCache
+from write_behind import WriteBehindQueue, WriteQueueFull
+
+# Database location and pool size can be overridden from the environment.
+# ':memory:' keeps the database in process memory, shared by every connection
+# until close_db() (handy for tests); the schema is created on first use
+DB_PATH = os.environ.get('FINSENTIO_DB_PATH', 'users.db')
+POOL_SIZE = int(os.environ.get('FINSENTIO_DB_POOL_SIZE', '8'))
+# Optional read-only replica (e.g. a litestream or rsync copy) for reads that
+# tolerate some lag: cohort counters and bulk exports
+DB_READ_PATH = os.environ.get('FINSENTIO_DB_READ_PATH') or None
+
+# Named in-memory database of the memdb VFS: unlike a shared-cache ':memory:'
+# database, its connections wait on the busy timeout instead of failing with
+# SQLITE_LOCKED while another connection writes
+MEMORY_DB_URI = 'file:/finsentio?vfs=memdb'
+
+# Password hashing worker pool: number of threads and max running + queued jobs
+HASH_WORKERS = int(os.environ.get('FINSENTIO_HASH_WORKERS', str(os.cpu_count() or 2)))
+HASH_QUEUE_LIMIT = int(os.environ.get('FINSENTIO_HASH_QUEUE_LIMIT', '64'))
+
+# Read-through cache in front of get_user_profile, kept fresh by save_user_profile
+PROFILE_CACHE_SIZE = int(os.environ.get('FINSENTIO_PROFILE_CACHE_SIZE', '4096'))
+PROFILE_CACHE_TTL = float(os.environ.get('FINSENTIO_PROFILE_CACHE_TTL', '300'))
+
+# Write-behind mode: profile saves, chat turns and password rehashes are applied by
+# one writer thread in group commits of up to WRITE_BATCH_SIZE writes. Writes that
+# arrive while a batch commits form the next one; a delay holds each batch open longer
+WRITE_BEHIND = os.environ.get('FINSENTIO_WRITE_BEHIND', '0') == '1'
+WRITE_BATCH_SIZE = int(os.environ.get('FINSENTIO_WRITE_BATCH_SIZE', '256'))
+WRITE_BATCH_DELAY = float(os.environ.get('FINSENTIO_WRITE_BATCH_DELAY_MS', '0')) / 1000
+WRITE_QUEUE_LIMIT = int(os.environ.get('FINSENTIO_WRITE_QUEUE_LIMIT', '10000'))
+# 'commit' answers a profile save after its batch commits, 'queued' as soon as it is queued
+WRITE_ACK = os.environ.get('FINSENTIO_WRITE_ACK', 'commit')
+# synchronous pragma of the writer connection: FULL survives power loss, NORMAL
+# application crashes, OFF trades durability for speed
+WRITE_SYNC = os.environ.get('FINSENTIO_WRITE_SYNC', 'NORMAL')
+
+# Async API: worker threads (each holding one connection), max running + queued
+# calls, and the default seconds an async call may take before it is cancelled
+DB_WORKERS = int(os.environ.get('FINSENTIO_DB_WORKERS', '4'))
+DB_QUEUE_LIMIT = int(os.environ.get('FINSENTIO_DB_QUEUE_LIMIT', '10000'))
+DB_TIMEOUT = float(os.environ.get('FINSENTIO_DB_TIMEOUT', '10'))
+
+SERVER_BUSY_MESSAGE = "Server is busy, please try again in a moment"
+DB_TIMEOUT_MESSAGE = "The database took too long to respond, please try again"
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def _pool_instrumentation():
+    """Pool arguments that time every statement and connection wait, unless metrics are off"""
+    if not metrics.ENABLED:
+        return {}
+    return {
+        'factory': metrics.TimedConnection,
+        'on_wait': lambda seconds: metrics.observe('finsentio_db_lock_wait_seconds', 'pool=main', seconds),
+    }
+
+def _open_pool(size, **kwargs):
+    """A connection pool on the configured database"""
+    if DB_PATH == ':memory:':
+        return ConnectionPool(MEMORY_DB_URI, size=size, uri=True, **kwargs)
+    return ConnectionPool(DB_PATH, size=size, **kwargs)
+
+def get_pool():
+    """Return the shared connection pool, creating it and migrating the schema on first use"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                pool = _open_pool(POOL_SIZE, **_pool_instrumentation())
+                with pool.connection() as conn:
+                    migrations.migrate(conn)
+                _pool = pool
+    return _pool
+
+_read_pool = None
+
+def get_read_connection():
+    """Borrow a connection for reads that tolerate lag: the replica if configured, else the primary"""
+    global _read_pool
+    if DB_READ_PATH is None:
+        return get_db_connection()
+    if _read_pool is None:
+        with _pool_lock:
+            if _read_pool is None:
+                uri = 'file:' + pathname2url(os.path.abspath(DB_READ_PATH)) + '?mode=ro'
+                pragmas = {name: value for name, value in DEFAULT_PRAGMAS.items()
+                           if name not in ('journal_mode', 'synchronous')}
+                _read_pool = ConnectionPool(uri, size=POOL_SIZE, uri=True, pragmas=pragmas,
+                                            **_pool_instrumentation())
+    return _read_pool.connection()
+
+@contextmanager
+def _worker_connection(conn):
+    """A DB executor thread's own connection, rolled back on exit like a pooled one"""
+    outer_transaction = conn.in_transaction
+    try:
+        yield conn
+    finally:
+        if not outer_transaction and conn.in_transaction:
+            conn.rollback()
 
 def get_db_connection():
-    """Create a connection to the SQLite database"""
-    conn = sqlite3.connect('users.db')
-    conn.row_factory = sqlite3.Row
-    return conn
+    """Borrow a pooled connection to the SQLite database (use as a context manager)"""
+    conn = _db_executor.connection() if _db_executor is not None else None
+    if conn is not None:
+        return _worker_connection(conn)
+    return get_pool().connection()
+
+_db_executor = None
+
+def get_db_executor():
+    """Return the executor behind the async API, creating it and its connections on first use"""
+    global _db_executor
+    if _db_executor is None:
+        get_pool()
+        with _pool_lock:
+            if _db_executor is None:
+                worker_pool = _open_pool(DB_WORKERS, **_pool_instrumentation())
+                _db_executor = DBExecutor(worker_pool, DB_WORKERS, DB_QUEUE_LIMIT)
+    return _db_executor
+
+async def run_async(fn, *args, timeout=DB_TIMEOUT):
+    """Await a synchronous database function on the DB executor.
+
+    Raises DBQueueFull when too many calls are waiting and asyncio.TimeoutError
+    after `timeout` seconds; a cancelled or timed-out call is dropped or aborted.
+    """
+    return await get_db_executor().run(fn, *args, timeout=timeout)
+
+async def _run_result_async(fn, *args, timeout=DB_TIMEOUT):
+    """run_async for functions returning (success, result), with overload and timeouts as failures"""
+    try:
+        return await run_async(fn, *args, timeout=timeout)
+    except DBQueueFull:
+        return False, SERVER_BUSY_MESSAGE
+    except asyncio.TimeoutError:
+        return False, DB_TIMEOUT_MESSAGE
+
+_write_queue = None
+
+def get_write_queue():
+    """Return the write-behind queue, creating it and its writer connection on first use"""
+    global _write_queue
+    if _write_queue is None:
+        get_pool()
+        with _pool_lock:
+            if _write_queue is None:
+                instrumentation = _pool_instrumentation()
+                instrumentation.pop('on_wait', None)
+                writer_pool = _open_pool(1, pragmas=dict(DEFAULT_PRAGMAS, synchronous=WRITE_SYNC), **instrumentation)
+                _write_queue = WriteBehindQueue(writer_pool, WRITE_BATCH_SIZE, WRITE_BATCH_DELAY, WRITE_QUEUE_LIMIT)
+    return _write_queue
+
+def submit_write(key, fn, *args):
+    """Apply fn(conn, *args) and commit, returning a Future of its result.
+
+    In write-behind mode the write is queued for the next group commit and
+    replaces a pending write with the same key; otherwise it runs right away
+    in its own transaction on a pooled connection.
+    """
+    if WRITE_BEHIND:
+        return get_write_queue().submit(key, fn, *args)
+    future = Future()
+    try:
+        with get_db_connection() as conn:
+            # Take the write lock first: a read-then-write transaction could not wait for it
+            conn.execute('BEGIN IMMEDIATE')
+            result = fn(conn, *args)
+            conn.commit()
+        future.set_result(result)
+    except Exception as e:
+        future.set_exception(e)
+    return future
+
+_hash_executor = None
+
+def get_hash_executor():
+    """Return the shared password hashing executor, creating it on first use"""
+    global _hash_executor
+    if _hash_executor is None:
+        with _pool_lock:
+            if _hash_executor is None:
+                _hash_executor = HashExecutor(HASH_WORKERS, HASH_QUEUE_LIMIT)
+    return _hash_executor
+
+def close_db():
+    """Commit queued writes, close all pooled connections and stop the hashing and DB workers"""
+    global _pool, _read_pool, _hash_executor, _write_queue, _db_executor
+    with _pool_lock:
+        if _db_executor is not None:
+            _db_executor.shutdown()
+            _db_executor.pool.close()
+            _db_executor = None
+        if _write_queue is not None:
+            _write_queue.close()
+            _write_queue.pool.close()
+            _write_queue = None
+        if _pool is not None:
+            _pool.close()
+            _pool = None
+        if _read_pool is not None:
+            _read_pool.close()
+            _read_pool = None
+        if _hash_executor is not None:
+            _hash_executor.shutdown(wait=False)
+            _hash_executor = None
+
+atexit.register(close_db)
+
+# Cached value for users known to have no profile yet
+_NO_PROFILE = object()
+
+# user_id -> (write version, profile); reads cache with version 0
+_profile_cache = TTLCache(maxsize=PROFILE_CACHE_SIZE, ttl=PROFILE_CACHE_TTL)
+# Bumped on every profile write so a read that raced a save doesn't cache stale data
+_profile_write_seq = 0
+_profile_write_lock = threading.Lock()
+# Write versions, so a save that finishes late can't replace a newer one in the cache
+_profile_versions = itertools.count(1)
+
+# Callbacks fn(user_id) run after every profile write, for caches derived from profiles
+_profile_listeners = []
+
+def add_profile_listener(listener):
+    """Call listener(user_id) whenever a user's profile is written"""
+    _profile_listeners.append(listener)
+
+def _profile_written(user_id, profile_data, version=0):
+    """Record a profile write in the cache (None drops the entry) and notify listeners.
+
+    Nothing changes if the cache already holds a newer write version.
+    """
+    global _profile_write_seq
+    with _profile_write_lock:
+        _profile_write_seq += 1
+        cached = _profile_cache.peek(user_id)
+        if cached is None or cached[0] <= version:
+            if profile_data is None:
+                _profile_cache.pop(user_id)
+            else:
+                _profile_cache.set(user_id, (version, profile_data))
+    for listener in _profile_listeners:
+        listener(user_id)
+
+def profile_cache_stats():
+    """Hit/miss/eviction counters of the profile cache; every miss is one SQLite read"""
+    return _profile_cache.stats()
+
+def clear_profile_cache():
+    """Drop every cached profile"""
+    _profile_cache.clear()
 
 def initialize_db():
-    """Initialize the database with tables if they don't exist"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    # Create users table
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS users (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        username TEXT UNIQUE NOT NULL,
-        password_hash TEXT NOT NULL,
-        email TEXT UNIQUE NOT NULL,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-    )
-    ''')
-    
-    # Create user_profiles table
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS user_profiles (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        user_id INTEGER NOT NULL,
-        profile_data TEXT NOT NULL,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        FOREIGN KEY (user_id) REFERENCES users (id)
-    )
-    ''')
-    
-    conn.commit()
-    conn.close()
+    """Create or upgrade the database schema to the latest migration (also done on first use)"""
+    with get_db_connection() as conn:
+        migrations.migrate(conn)
     
+@metrics.timed('finsentio_password_hash_seconds', 'hash')
 def hash_password(password):
-    """Hash a password for secure storage"""
-    salt = os.urandom(32)
-    key = hashlib.pbkdf2_hmac('sha256', password.encode('utf-8'), salt, 100000)
-    return salt + key
+    """Hash a password for secure storage, using the configured algorithm and cost"""
+    return password_hashing.hash_password(password)
 
+@metrics.timed('finsentio_password_hash_seconds', 'verify')
 def verify_password(stored_password, provided_password):
-    """Verify a stored password against a provided password"""
-    salt = stored_password[:32]
-    stored_key = stored_password[32:]
-    key = hashlib.pbkdf2_hmac('sha256', provided_password.encode('utf-8'), salt, 100000)
-    return key == stored_key
+    """Verify a stored password (self-describing or legacy 64-byte hash) against a provided password"""
+    return password_hashing.verify_password(stored_password, provided_password)
 
-def register_user(username, password, email):
-    """Register a new user"""
+def _update_hash(conn, user_id, old_hash, new_hash):
+    conn.execute(
+        'UPDATE users SET password_hash = ? WHERE id = ? AND password_hash = ?',
+        (new_hash, user_id, old_hash)
+    )
+
+def _store_rehash(user_id, old_hash, future):
+    """Replace a stale hash once the new one is ready, unless the password changed meanwhile"""
     try:
-        conn = get_db_connection()
+        submit_write(('password', user_id), _update_hash, user_id, old_hash, future.result())
+    except Exception:
+        # The old hash still verifies; the next login tries again
+        pass
+
+def _schedule_rehash(user_id, stored_password, password):
+    """Upgrade a hash with stale parameters in the background after a successful login"""
+    if not password_hashing.needs_rehash(stored_password):
+        return
+    try:
+        future = get_hash_executor().submit(hash_password, password)
+    except HashQueueFull:
+        return
+    future.add_done_callback(lambda f: _store_rehash(user_id, stored_password, f))
+
+def _check_new_user(username, email):
+    """Return an error message if the username or email is taken, otherwise None"""
+    with get_db_connection() as conn:
         cursor = conn.cursor()
         
         # Check if username already exists
-        cursor.execute('SELECT * FROM users WHERE username = ?', (username,))
+        cursor.execute('SELECT 1 FROM users WHERE username = ?', (username,))
         if cursor.fetchone():
-            conn.close()
-            return False, "Username already exists"
+            return "Username already exists"
         
         # Check if email already exists
-        cursor.execute('SELECT * FROM users WHERE email = ?', (email,))
+        cursor.execute('SELECT 1 FROM users WHERE email = ?', (email,))
         if cursor.fetchone():
-            conn.close()
-            return False, "Email already exists"
-        
-        # Hash the password
-        password_hash = hash_password(password)
-        
-        # Insert the new user
-        cursor.execute(
+            return "Email already exists"
+    return None
+
+def _insert_user(username, password_hash, email):
+    """Insert a new user; the UNIQUE constraints catch a concurrent registration"""
+    with get_db_connection() as conn:
+        conn.execute(
             'INSERT INTO users (username, password_hash, email) VALUES (?, ?, ?)',
             (username, password_hash, email)
         )
-        
         conn.commit()
-        conn.close()
+
+def _fetch_credentials(username):
+    """Return the (id, password_hash) row for a username, or None"""
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('SELECT id, password_hash FROM users WHERE username = ?', (username,))
+        return cursor.fetchone()
+
+def register_user(username, password, email):
+    """Register a new user"""
+    try:
+        error = _check_new_user(username, email)
+        if error:
+            return False, error
+        
+        # Hash the password on the hashing pool, without holding a pooled connection
+        password_hash = get_hash_executor().submit(hash_password, password).result()
+        
+        _insert_user(username, password_hash, email)
         return True, "User registered successfully"
+    except HashQueueFull:
+        return False, SERVER_BUSY_MESSAGE
+    except sqlite3.IntegrityError:
+        return False, "Username or email already exists"
+    except Exception as e:
+        return False, f"Registration error: {str(e)}"
+
+async def register_user_async(username, password, email):
+    """Register a new user without blocking the event loop"""
+    try:
+        error = await run_async(_check_new_user, username, email)
+        if error:
+            return False, error
+        
+        password_hash = await asyncio.wrap_future(get_hash_executor().submit(hash_password, password))
+        
+        await run_async(_insert_user, username, password_hash, email)
+        return True, "User registered successfully"
+    except (HashQueueFull, DBQueueFull):
+        return False, SERVER_BUSY_MESSAGE
+    except asyncio.TimeoutError:
+        return False, DB_TIMEOUT_MESSAGE
+    except sqlite3.IntegrityError:
+        return False, "Username or email already exists"
     except Exception as e:
         return False, f"Registration error: {str(e)}"
 
 def authenticate_user(username, password):
     """Authenticate a user"""
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
+        user = _fetch_credentials(username)
+        
+        if not user:
+            return False, "Invalid username or password"
         
-        cursor.execute('SELECT * FROM users WHERE username = ?', (username,))
-        user = cursor.fetchone()
+        # Verify on the hashing pool so slow hashing doesn't starve the connection pool
+        stored_password = user['password_hash']
+        if get_hash_executor().submit(verify_password, stored_password, password).result():
+            _schedule_rehash(user['id'], stored_password, password)
+            return True, user['id']
+        else:
+            return False, "Invalid username or password"
+    except HashQueueFull:
+        return False, SERVER_BUSY_MESSAGE
+    except Exception as e:
+        return False, f"Authentication error: {str(e)}"
+
+async def authenticate_user_async(username, password):
+    """Authenticate a user without blocking the event loop"""
+    try:
+        user = await run_async(_fetch_credentials, username)
         
         if not user:
-            conn.close()
             return False, "Invalid username or password"
         
         stored_password = user['password_hash']
-        if verify_password(stored_password, password):
-            conn.close()
+        verified = await asyncio.wrap_future(
+            get_hash_executor().submit(verify_password, stored_password, password)
+        )
+        if verified:
+            _schedule_rehash(user['id'], stored_password, password)
             return True, user['id']
         else:
-            conn.close()
             return False, "Invalid username or password"
+    except (HashQueueFull, DBQueueFull):
+        return False, SERVER_BUSY_MESSAGE
+    except asyncio.TimeoutError:
+        return False, DB_TIMEOUT_MESSAGE
     except Exception as e:
         return False, f"Authentication error: {str(e)}"
 
+def _write_profile(conn, user_id, changes):
+    """Merge changed answers into a profile row, rescore it and move its cohort counters.
+
+    Answers not in `changes` keep their stored values; a user without a
+    profile needs every answer. Returns the whole profile written and its
+    write version, taken inside the transaction so versions follow commit order.
+    """
+    previous = conn.execute(
+        'SELECT profile_data, risk_category FROM user_profiles WHERE user_id = ?', (user_id,)
+    ).fetchone()
+    old_profile = json.loads(previous['profile_data']) if previous else None
+    profile_data = dict(old_profile or {}, **changes)
+    missing = [q for q in risk_scoring.QUESTIONS if q not in profile_data]
+    if missing:
+        raise ValueError(f"Profile is missing answers: {', '.join(missing)}")
+    risk_score, risk_category = risk_scoring.score_profile(profile_data)
+    
+    # Insert or update in one statement, using the unique index on user_id;
+    # nothing is written if the user doesn't exist
+    cursor = conn.execute(
+        '''INSERT INTO user_profiles (user_id, profile_data, risk_score, risk_category)
+           SELECT ?, ?, ?, ? WHERE EXISTS (SELECT 1 FROM users WHERE id = ?)
+           ON CONFLICT (user_id) DO UPDATE
+           SET profile_data = excluded.profile_data,
+               risk_score = excluded.risk_score,
+               risk_category = excluded.risk_category,
+               updated_at = CURRENT_TIMESTAMP''',
+        (user_id, json.dumps(profile_data), risk_score, risk_category, user_id)
+    )
+    if cursor.rowcount == 0:
+        raise LookupError("User does not exist")
+    
+    cohort_stats.apply_change(conn, old_profile, previous['risk_category'] if previous else None,
+                              profile_data, risk_category)
+    return profile_data, next(_profile_versions)
+
+def _profile_committed(user_id, version, future):
+    """Refresh the cache with what a queued save actually wrote, or drop it if the save failed"""
+    try:
+        _profile_written(user_id, *future.result())
+    except Exception:
+        _profile_written(user_id, None, version)
+
 def save_user_profile(user_id, risk_taker, risk_word, game_show, investment_allocation, 
                      market_follow, new_investment, buy_things, finance_reading,
                      previous_investments, investment_goal):
     """Save user profile information to the database"""
+    # Create profile data as JSON
+    profile_data = {
+        'risk_taker': risk_taker,
+        'risk_word': risk_word,
+        'game_show': game_show,
+        'investment_allocation': investment_allocation,
+        'market_follow': market_follow,
+        'new_investment': new_investment,
+        'buy_things': buy_things,
+        'finance_reading': finance_reading,
+        'previous_investments': previous_investments,
+        'investment_goal': investment_goal
+    }
+    return update_user_profile(user_id, profile_data)
+
+def update_user_profile(user_id, changes):
+    """Save only the changed answers of a profile; the others keep their stored values"""
+    unknown = set(changes) - set(risk_scoring.QUESTIONS)
+    if unknown:
+        return False, f"Unknown profile fields: {', '.join(sorted(unknown))}"
+    if not changes:
+        return True, "No changes to save"
+    
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        # Check if user exists
-        cursor.execute('SELECT * FROM users WHERE id = ?', (user_id,))
-        if not cursor.fetchone():
-            conn.close()
-            return False, "User does not exist"
-        
-        # Create profile data as JSON
-        profile_data = {
-            'risk_taker': risk_taker,
-            'risk_word': risk_word,
-            'game_show': game_show,
-            'investment_allocation': investment_allocation,
-            'market_follow': market_follow,
-            'new_investment': new_investment,
-            'buy_things': buy_things,
-            'finance_reading': finance_reading,
-            'previous_investments': previous_investments,
-            'investment_goal': investment_goal
-        }
-        
-        # Convert to JSON string
-        profile_json = json.dumps(profile_data)
-        
-        # Check if profile already exists for this user
-        cursor.execute('SELECT * FROM user_profiles WHERE user_id = ?', (user_id,))
-        existing_profile = cursor.fetchone()
+        # A complete profile replaces any save of it still queued; partial
+        # updates must all be applied, in order
+        complete = len(changes) == len(risk_scoring.QUESTIONS)
+        future = submit_write(('profile', user_id) if complete else None, _write_profile,
+                              user_id, dict(changes))
+        if WRITE_BEHIND and WRITE_ACK == 'queued':
+            # Serve this process's reads from the cache until the write commits; commits
+            # then refresh it in commit order, so the last one written is what stays
+            version = next(_profile_versions)
+            if complete:
+                _profile_written(user_id, dict(changes), version)
+            else:
+                found, current = get_user_profile(user_id)
+                _profile_written(user_id, dict(current, **changes) if found else None, version)
+            future.add_done_callback(functools.partial(_profile_committed, user_id, version))
+            return True, "Profile saved successfully"
         
-        if existing_profile:
-            # Update existing profile
-            cursor.execute(
-                'UPDATE user_profiles SET profile_data = ?, updated_at = CURRENT_TIMESTAMP WHERE user_id = ?',
-                (profile_json, user_id)
-            )
-        else:
-            # Insert new profile
-            cursor.execute(
-                'INSERT INTO user_profiles (user_id, profile_data) VALUES (?, ?)',
-                (user_id, profile_json)
-            )
-        
-        conn.commit()
-        conn.close()
+        _profile_written(user_id, *future.result())
         return True, "Profile saved successfully"
+    except WriteQueueFull:
+        return False, SERVER_BUSY_MESSAGE
+    except (LookupError, ValueError) as e:
+        _profile_written(user_id, None)
+        return False, str(e)
     except Exception as e:
+        _profile_written(user_id, None)
         return False, f"Profile save error: {str(e)}"
 
+async def save_user_profile_async(user_id, *answers):
+    """save_user_profile without blocking the event loop"""
+    return await _run_result_async(save_user_profile, user_id, *answers)
+
+async def update_user_profile_async(user_id, changes):
+    """update_user_profile without blocking the event loop"""
+    return await _run_result_async(update_user_profile, user_id, changes)
+
+def _cached_profile(user_id):
+    """(success, profile) from the profile cache, or None on a miss"""
+    cached = _profile_cache.get(user_id)
+    if cached is None:
+        return None
+    if cached[1] is _NO_PROFILE:
+        return False, "Profile not found"
+    return True, dict(cached[1])
+
 def get_user_profile(user_id):
     """Retrieve user profile information from the database"""
+    cached = _cached_profile(user_id)
+    if cached is not None:
+        return cached
+    
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
+        write_seq = _profile_write_seq
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT profile_data FROM user_profiles WHERE user_id = ?', (user_id,))
+            profile = cursor.fetchone()
         
-        cursor.execute('SELECT * FROM user_profiles WHERE user_id = ?', (user_id,))
-        profile = cursor.fetchone()
+        profile_data = json.loads(profile['profile_data']) if profile else _NO_PROFILE
+        with _profile_write_lock:
+            if write_seq == _profile_write_seq:
+                _profile_cache.set(user_id, (0, profile_data))
         
         if not profile:
-            conn.close()
             return False, "Profile not found"
-        
-        profile_data = json.loads(profile['profile_data'])
-        conn.close()
-        return True, profile_data
+        return True, dict(profile_data)
     except Exception as e:
         return False, f"Error retrieving profile: {str(e)}"
 
-# Initialize the database when this module is imported
-initialize_db() 
\ No newline at end of file
+async def get_user_profile_async(user_id):
+    """get_user_profile without blocking the event loop; cache hits don't leave it"""
+    cached = _cached_profile(user_id)
+    if cached is not None:
+        return cached
+    return await _run_result_async(get_user_profile, user_id)
+
+def get_cohort_counts(cohort=cohort_stats.ALL_USERS):
+    """Retrieve a cohort's answer counts and profile count from the incremental counters"""
+    try:
+        with get_read_connection() as conn:
+            return True, cohort_stats.read_cohort(conn, cohort)
+    except Exception as e:
+        return False, f"Error retrieving cohort statistics: {str(e)}"
+
+def get_user_risk_score(user_id):
+    """Retrieve the materialized (risk_score, risk_category) of a user's profile"""
+    try:
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                'SELECT risk_score, risk_category FROM user_profiles WHERE user_id = ?', (user_id,)
+            )
+            row = cursor.fetchone()
+        
+        if not row or row['risk_score'] is None:
+            return False, "Risk score not available"
+        return True, (row['risk_score'], row['risk_category'])
+    except Exception as e:
+        return False, f"Error retrieving risk score: {str(e)}"
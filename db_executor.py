@@ -0,0 +1,136 @@
+import asyncio
+import queue
+import threading
+
+
+# SQLite VM instructions between checks for a cancelled or timed-out call
+PROGRESS_STEPS = 1000
+
+
+class DBQueueFull(Exception):
+    """Raised when too many async database calls are already waiting"""
+
+
+class _Job:
+    __slots__ = ('fn', 'args', 'loop', 'waiter', 'cancelled')
+
+    def __init__(self, fn, args, loop):
+        self.fn = fn
+        self.args = args
+        self.loop = loop
+        self.waiter = loop.create_future()
+        self.cancelled = False
+
+    def settle(self, result, error):
+        """Hand the outcome to the awaiting task (runs on the event loop)"""
+        if self.waiter.done():
+            return
+        if error is None:
+            self.waiter.set_result(result)
+        else:
+            self.waiter.set_exception(error)
+
+
+def _expire(waiter, timeout):
+    if not waiter.done():
+        waiter.set_exception(asyncio.TimeoutError(f"Database call took longer than {timeout}s"))
+
+
+class DBExecutor:
+    """Worker threads that run database calls for async code.
+
+    Each of the ``workers`` threads holds one connection from ``pool`` for its
+    whole life and ``connection()`` hands it to any database code running on
+    that thread, so however many sessions await the database, it is reached
+    through a fixed number of threads and connections. ``max_pending`` caps
+    running plus queued calls; beyond that ``run`` fails fast.
+
+    ``run`` takes a timeout, and when the awaiting task is cancelled or times
+    out a call that hasn't started is dropped while a running one has its
+    SQLite statement aborted by a progress handler, so an abandoned request
+    frees its worker.
+    """
+
+    def __init__(self, pool, workers, max_pending):
+        self.pool = pool
+        self.workers = workers
+        self.max_pending = max_pending
+        self._jobs = queue.SimpleQueue()
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._local = threading.local()
+        self._threads = [threading.Thread(target=self._work, name=f'db-worker-{i}', daemon=True)
+                         for i in range(workers)]
+        for thread in self._threads:
+            thread.start()
+
+    def connection(self):
+        """The calling worker thread's connection, or None on any other thread"""
+        return getattr(self._local, 'conn', None)
+
+    async def run(self, fn, *args, timeout=None):
+        """Await fn(*args) on a worker thread; asyncio.TimeoutError after `timeout` seconds"""
+        if not self._slots.acquire(blocking=False):
+            raise DBQueueFull("Too many database calls in progress")
+        loop = asyncio.get_running_loop()
+        job = _Job(fn, args, loop)
+        self._jobs.put(job)
+        timer = loop.call_later(timeout, _expire, job.waiter, timeout) if timeout else None
+        try:
+            return await job.waiter
+        except BaseException:
+            # Cancelled, timed out or failed: make sure the worker lets go of it
+            job.cancelled = True
+            raise
+        finally:
+            if timer is not None:
+                timer.cancel()
+
+    def _work(self):
+        conn = None
+        current = [None]
+
+        def abandoned():
+            # SQLite progress handler: a truthy return aborts the running statement
+            return current[0].cancelled
+
+        while True:
+            job = self._jobs.get()
+            if job is None:
+                break
+            result = error = None
+            if not job.cancelled:
+                current[0] = job
+                try:
+                    if conn is None:
+                        conn = self.pool.acquire()
+                        conn.set_progress_handler(abandoned, PROGRESS_STEPS)
+                        self._local.conn = conn
+                    result = job.fn(*job.args)
+                except BaseException as e:
+                    error = e
+                if conn is not None and conn.in_transaction:
+                    # Left open by an error or an abort; the pool replaces a broken connection
+                    self._release(conn)
+                    conn = None
+            self._slots.release()
+            if not job.cancelled:
+                try:
+                    job.loop.call_soon_threadsafe(job.settle, result, error)
+                except RuntimeError:
+                    # The awaiting event loop has been closed
+                    pass
+        if conn is not None:
+            self._release(conn)
+
+    def _release(self, conn):
+        self._local.conn = None
+        conn.set_progress_handler(None, 0)
+        self.pool.release(conn)
+
+    def shutdown(self, wait=True):
+        """Stop the workers once the queued calls are done and return their connections"""
+        for _ in self._threads:
+            self._jobs.put(None)
+        if wait:
+            for thread in self._threads:
+                thread.join()
@@ -0,0 +1,142 @@
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+# Pragmas applied to every pooled connection. WAL lets readers run alongside a
+# writer, NORMAL sync is durable across application crashes in WAL mode, and
+# the cache/mmap sizes keep hot pages of users.db in memory.
+DEFAULT_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'cache_size': -16000,        # negative value = size in KiB (~16 MB)
+    'mmap_size': 268435456,      # 256 MB
+    'temp_store': 'MEMORY',
+}
+
+
+class PoolTimeout(Exception):
+    """Raised when no pooled connection becomes available in time"""
+
+
+class PoolClosed(Exception):
+    """Raised when a connection is requested from a closed pool"""
+
+
+class ConnectionPool:
+    """A bounded pool of long-lived SQLite connections"""
+
+    def __init__(self, database, size=8, busy_timeout=5.0, acquire_timeout=30.0, pragmas=None,
+                 factory=sqlite3.Connection, on_wait=None, uri=False):
+        self.database = database
+        # Whether `database` is a file: URI (read-only mode, in-memory VFS, ...)
+        self.uri = uri
+        self.size = size
+        self.busy_timeout = busy_timeout
+        self.acquire_timeout = acquire_timeout
+        self.pragmas = dict(DEFAULT_PRAGMAS if pragmas is None else pragmas)
+        # sqlite3.Connection subclass used for new connections
+        self.factory = factory
+        # Called with the seconds spent blocked when every connection was in use
+        self.on_wait = on_wait
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def _connect(self):
+        """Open a new connection and apply the pool pragmas"""
+        conn = sqlite3.connect(self.database, timeout=self.busy_timeout, check_same_thread=False,
+                               factory=self.factory, uri=self.uri)
+        conn.row_factory = sqlite3.Row
+        conn.execute(f'PRAGMA busy_timeout = {int(self.busy_timeout * 1000)}')
+        for name, value in self.pragmas.items():
+            conn.execute(f'PRAGMA {name} = {value}')
+        return conn
+
+    def acquire(self, timeout=None):
+        """Take a connection from the pool, opening one if the pool is not full yet"""
+        if self._closed:
+            raise PoolClosed("Connection pool is closed")
+
+        try:
+            conn = self._idle.get_nowait()
+            if conn is not None:
+                return conn
+            self._idle.put(None)
+            raise PoolClosed("Connection pool is closed")
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            if self._created < self.size:
+                self._created += 1
+                try:
+                    return self._connect()
+                except Exception:
+                    self._created -= 1
+                    raise
+
+        timeout = self.acquire_timeout if timeout is None else timeout
+        started = time.perf_counter()
+        try:
+            conn = self._idle.get(timeout=timeout)
+        except queue.Empty:
+            raise PoolTimeout(f"No database connection available after {timeout}s")
+        finally:
+            if self.on_wait is not None:
+                self.on_wait(time.perf_counter() - started)
+        if conn is None:
+            self._idle.put(None)
+            raise PoolClosed("Connection pool is closed")
+        return conn
+
+    def release(self, conn):
+        """Return a connection to the pool, rolling back any open transaction"""
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            # A broken connection is dropped and replaced on the next acquire
+            self._discard(conn)
+            return
+
+        if self._closed:
+            self._discard(conn)
+        else:
+            self._idle.put(conn)
+
+    def _discard(self, conn):
+        with self._lock:
+            self._created -= 1
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+
+    @contextmanager
+    def connection(self, timeout=None):
+        """Borrow a connection for the duration of a with-block"""
+        conn = self.acquire(timeout)
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def close(self):
+        """Close all idle connections; borrowed ones are closed when released"""
+        self._closed = True
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            if conn is not None:
+                self._discard(conn)
+        # Wake up any thread still blocked in acquire()
+        self._idle.put(None)
+
+    @property
+    def closed(self):
+        return self._closed
@@ -0,0 +1,321 @@
+"""Financial glossary retrieval for the education chatbot.
+
+The bundled corpus (``data/glossary.jsonl``, one ``{"term", "aliases",
+"definition"}`` or ``{"title", "text"}`` object per line) is compiled offline
+into a BM25 inverted index stored in one flat binary file. The file is opened
+with mmap, so loading it costs a header parse rather than a rebuild, and every
+worker process on the host shares the same page-cache copy.
+
+Each posting stores its precomputed BM25 contribution, so a query only has to
+gather and sum a few float arrays. ``lookup`` answers "what is X" questions
+when X is a glossary term or alias; anything else goes to the model backend.
+
+The index is built by the ``build`` command and by ``serve.py`` before its
+workers start. The app opens it with ``open_index``, which never writes next
+to the corpus: a missing or stale index is built in the temp directory
+instead, and the chatbot runs without the glossary if that fails too.
+
+    python glossary_index.py build [--corpus data/glossary.jsonl] [--index data/glossary.idx]
+    python glossary_index.py search "how do bond coupons work"
+"""
+import argparse
+import hashlib
+import json
+import logging
+import math
+import mmap
+import os
+import re
+import struct
+import tempfile
+import time
+from collections import Counter
+
+import numpy as np
+
+from text_normalization import normalize_question
+
+log = logging.getLogger(__name__)
+
+_DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+GLOSSARY_CORPUS = os.environ.get('FINSENTIO_GLOSSARY_CORPUS', os.path.join(_DATA_DIR, 'glossary.jsonl'))
+GLOSSARY_INDEX = os.environ.get('FINSENTIO_GLOSSARY_INDEX', os.path.join(_DATA_DIR, 'glossary.idx'))
+
+MAGIC = b'FSGLOSS1'
+FORMAT_VERSION = 1
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+# Title and alias tokens count this many times, so a term's own entry ranks first
+TITLE_WEIGHT = 3
+
+_STOPWORDS = frozenset(
+    "a an the is are was were be of to in on for and or what how why who which do does did "
+    "can could should would i me my you your it its this that there about please tell explain "
+    "mean means meaning define definition".split()
+)
+
+# "what is X", "what does X mean", "define X", ... on normalized text
+_DEFINITION_RE = re.compile(
+    r'^(?:what is|what are|what does|what do|who is|define|definition of|meaning of|explain|tell me about)'
+    r'\s+(.+?)(?:\s+mean)?$'
+)
+_ARTICLE_RE = re.compile(r'^(?:a|an|the)\s+')
+
+
+def tokenize(text):
+    """Normalized, stemmed index terms of a text, stopwords removed"""
+    return [word for word in normalize_question(text).split() if word not in _STOPWORDS]
+
+
+def _term_hash(term):
+    return int.from_bytes(hashlib.blake2b(term.encode('utf-8'), digest_size=8).digest(), 'little', signed=True)
+
+
+def read_corpus(path):
+    """Yield glossary documents as {'term', 'aliases', 'definition'} dicts"""
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            yield {
+                'term': entry.get('term') or entry.get('title', ''),
+                'aliases': list(entry.get('aliases') or []),
+                'definition': entry.get('definition') or entry.get('text', ''),
+            }
+
+
+def build_index(documents, index_path, source=None):
+    """Compile documents into a BM25 index file; returns its header.
+
+    `source` is the corpus path whose size and mtime are recorded so that
+    ``load_index`` can tell when the index is stale.
+    """
+    postings = {}
+    lengths = []
+    blobs = []
+    for doc_id, doc in enumerate(documents):
+        counts = Counter(tokenize(doc['definition']))
+        for title in [doc['term']] + doc['aliases']:
+            for token in tokenize(title):
+                counts[token] += TITLE_WEIGHT
+        for token, tf in counts.items():
+            postings.setdefault(token, []).append((doc_id, tf))
+        lengths.append(sum(counts.values()))
+        blobs.append(json.dumps(doc, ensure_ascii=False).encode('utf-8'))
+
+    documents_count = len(lengths)
+    lengths = np.asarray(lengths, dtype=np.float64)
+    avgdl = float(lengths.mean()) if documents_count else 0.0
+
+    terms = sorted(postings, key=_term_hash)
+    term_hashes = np.fromiter((_term_hash(t) for t in terms), dtype=np.int64, count=len(terms))
+    posting_offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+    docs_parts, impact_parts = [], []
+    for index, term in enumerate(terms):
+        entries = postings[term]
+        docs = np.fromiter((d for d, _ in entries), dtype=np.int32, count=len(entries))
+        tfs = np.fromiter((tf for _, tf in entries), dtype=np.float64, count=len(entries))
+        idf = math.log(1 + (documents_count - len(entries) + 0.5) / (len(entries) + 0.5))
+        norm = K1 * (1 - B + B * lengths[docs] / avgdl)
+        docs_parts.append(docs)
+        impact_parts.append((idf * tfs * (K1 + 1) / (tfs + norm)).astype(np.float32))
+        posting_offsets[index + 1] = posting_offsets[index] + len(entries)
+
+    doc_offsets = np.zeros(documents_count + 1, dtype=np.int64)
+    np.cumsum([len(blob) for blob in blobs], out=doc_offsets[1:])
+    arrays = {
+        'term_hashes': term_hashes,
+        'posting_offsets': posting_offsets,
+        'posting_docs': np.concatenate(docs_parts) if docs_parts else np.zeros(0, np.int32),
+        'posting_impacts': np.concatenate(impact_parts) if impact_parts else np.zeros(0, np.float32),
+        'doc_offsets': doc_offsets,
+        'doc_blob': np.frombuffer(b''.join(blobs), dtype=np.uint8),
+    }
+
+    header = {'version': FORMAT_VERSION, 'documents': documents_count, 'terms': len(terms),
+              'avgdl': avgdl, 'k1': K1, 'b': B, 'arrays': {}}
+    if source is not None:
+        stat = os.stat(source)
+        header['source'] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+    # Lay arrays out after the header, each 8-byte aligned
+    offset = 0
+    for name, array in arrays.items():
+        header['arrays'][name] = [array.dtype.str, offset, int(array.size)]
+        offset += -(-array.nbytes // 8) * 8
+    header_bytes = json.dumps(header).encode('utf-8')
+    data_start = -(-(len(MAGIC) + 8 + len(header_bytes)) // 8) * 8
+
+    temporary = f'{index_path}.tmp{os.getpid()}'
+    with open(temporary, 'wb') as f:
+        f.write(MAGIC + struct.pack('<Q', len(header_bytes)) + header_bytes)
+        f.write(b'\0' * (data_start - f.tell()))
+        for name, array in arrays.items():
+            f.write(array.tobytes())
+            f.write(b'\0' * (-array.nbytes % 8))
+    os.replace(temporary, index_path)
+    return header
+
+
+class GlossaryIndex:
+    """Read-only, memory-mapped BM25 index built by ``build_index``"""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mmap[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not a glossary index")
+        (header_length,) = struct.unpack_from('<Q', self._mmap, len(MAGIC))
+        start = len(MAGIC) + 8
+        self.header = json.loads(self._mmap[start:start + header_length])
+        if self.header['version'] != FORMAT_VERSION:
+            raise ValueError(f"{path} has index format {self.header['version']}, expected {FORMAT_VERSION}")
+        data_start = -(-(start + header_length) // 8) * 8
+        for name, (dtype, offset, count) in self.header['arrays'].items():
+            setattr(self, name, np.frombuffer(self._mmap, dtype=dtype, count=count, offset=data_start + offset))
+
+    def __len__(self):
+        return self.header['documents']
+
+    def document(self, doc_id):
+        """The stored {'term', 'aliases', 'definition'} dict of a document"""
+        start, end = self.doc_offsets[doc_id], self.doc_offsets[doc_id + 1]
+        return json.loads(self.doc_blob[start:end].tobytes())
+
+    def _postings(self, token):
+        index = int(np.searchsorted(self.term_hashes, _term_hash(token)))
+        if index == len(self.term_hashes) or self.term_hashes[index] != _term_hash(token):
+            return None
+        start, end = self.posting_offsets[index], self.posting_offsets[index + 1]
+        return self.posting_docs[start:end], self.posting_impacts[start:end]
+
+    def search_ids(self, query, k=5):
+        """Top-k (doc_id, score) pairs for a free-text query"""
+        lists = [p for p in map(self._postings, set(tokenize(query))) if p is not None]
+        if not lists:
+            return []
+        if len(lists) == 1:
+            docs, scores = lists[0]
+        else:
+            all_docs = np.concatenate([docs for docs, _ in lists])
+            all_scores = np.concatenate([scores for _, scores in lists])
+            if len(all_docs) * 8 > len(self):
+                # Dense accumulator: one slot per document beats sorting long posting lists
+                scores = np.bincount(all_docs, weights=all_scores, minlength=len(self))
+                docs = np.arange(len(self))
+            else:
+                docs, inverse = np.unique(all_docs, return_inverse=True)
+                scores = np.bincount(inverse, weights=all_scores)
+        if len(docs) > k:
+            top = np.argpartition(scores, -k)[-k:]
+        else:
+            top = np.arange(len(docs))
+        top = top[np.argsort(-scores[top], kind='stable')]
+        return [(int(docs[i]), float(scores[i])) for i in top]
+
+    def search(self, query, k=5):
+        """Top-k (score, document) pairs for a free-text query"""
+        return [(score, self.document(doc_id)) for doc_id, score in self.search_ids(query, k)]
+
+    def lookup(self, question, candidates=5):
+        """The glossary entry a "what is X" question (or a bare term) asks about, or None.
+
+        Only an entry whose term or alias matches X exactly is returned; BM25
+        narrows the candidates so no per-term table has to be loaded.
+        """
+        normalized = normalize_question(question)
+        match = _DEFINITION_RE.match(normalized)
+        subject = _ARTICLE_RE.sub('', match.group(1) if match else normalized)
+        if not subject:
+            return None
+        for doc_id, _ in self.search_ids(subject, candidates):
+            doc = self.document(doc_id)
+            if any(normalize_question(title) == subject for title in [doc['term']] + doc['aliases']):
+                return doc
+        return None
+
+
+def format_answer(doc):
+    """Chat reply for a glossary entry"""
+    return f"**{doc['term']}**: {doc['definition']}"
+
+
+def _is_stale(corpus_path, index_path):
+    try:
+        with open(index_path, 'rb') as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                return True
+            (header_length,) = struct.unpack('<Q', f.read(8))
+            header = json.loads(f.read(header_length))
+    except (OSError, ValueError, struct.error):
+        return True
+    stat = os.stat(corpus_path)
+    source = header.get('source') or {}
+    return (header.get('version') != FORMAT_VERSION or source.get('size') != stat.st_size
+            or source.get('mtime_ns') != stat.st_mtime_ns)
+
+
+def load_index(corpus_path=GLOSSARY_CORPUS, index_path=GLOSSARY_INDEX):
+    """Open the glossary index, (re)building it first if the corpus changed; None without a corpus"""
+    if not os.path.exists(corpus_path):
+        return None
+    if _is_stale(corpus_path, index_path):
+        build_index(read_corpus(corpus_path), index_path, source=corpus_path)
+    return GlossaryIndex(index_path)
+
+
+def _fallback_path(index_path):
+    """Per-install index location in the temp directory"""
+    digest = hashlib.blake2b(os.path.abspath(index_path).encode('utf-8'), digest_size=8).hexdigest()
+    return os.path.join(tempfile.gettempdir(), f'finsentio-glossary-{digest}.idx')
+
+
+def open_index(corpus_path=GLOSSARY_CORPUS, index_path=GLOSSARY_INDEX):
+    """Open the index for serving without writing to its directory; None without a corpus or usable index"""
+    if not os.path.exists(corpus_path):
+        return None
+    try:
+        if not _is_stale(corpus_path, index_path):
+            return GlossaryIndex(index_path)
+        fallback = _fallback_path(index_path)
+        log.warning("Glossary index %s is missing or out of date (run `python glossary_index.py build`); "
+                    "using %s", index_path, fallback)
+        if _is_stale(corpus_path, fallback):
+            build_index(read_corpus(corpus_path), fallback, source=corpus_path)
+        return GlossaryIndex(fallback)
+    except (OSError, ValueError) as e:
+        log.warning("Glossary unavailable, answering without it: %s", e)
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Financial glossary index")
+    subcommands = parser.add_subparsers(dest='command', required=True)
+    build_parser = subcommands.add_parser('build', help="compile the corpus into the index file")
+    build_parser.add_argument('--corpus', default=GLOSSARY_CORPUS)
+    build_parser.add_argument('--index', default=GLOSSARY_INDEX)
+    search_parser = subcommands.add_parser('search', help="query the index")
+    search_parser.add_argument('query')
+    search_parser.add_argument('-k', type=int, default=5)
+    search_parser.add_argument('--index', default=GLOSSARY_INDEX)
+    args = parser.parse_args(argv)
+
+    if args.command == 'build':
+        started = time.perf_counter()
+        header = build_index(read_corpus(args.corpus), args.index, source=args.corpus)
+        print(f"Indexed {header['documents']} documents ({header['terms']} terms) into {args.index} "
+              f"in {time.perf_counter() - started:.1f}s, {os.path.getsize(args.index) / 1024:.0f} KiB")
+    else:
+        index = GlossaryIndex(args.index)
+        doc = index.lookup(args.query)
+        if doc:
+            print(f"Definition match: {format_answer(doc)}\n")
+        for score, doc in index.search(args.query, args.k):
+            print(f"{score:7.3f}  {doc['term']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,37 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class HashQueueFull(Exception):
+    """Raised when too many hashing jobs are already waiting"""
+
+
+class HashExecutor:
+    """A bounded worker pool for CPU-heavy password hashing.
+
+    hashlib releases the GIL while running PBKDF2, so a thread pool gives real
+    parallelism without the pickling cost of a process pool. ``max_pending``
+    caps running plus queued jobs; beyond that ``submit`` fails fast instead of
+    letting a login burst build an unbounded backlog.
+    """
+
+    def __init__(self, workers, max_pending):
+        self.workers = workers
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hash')
+        self._slots = threading.BoundedSemaphore(max_pending)
+
+    def submit(self, fn, *args):
+        """Schedule fn(*args) and return a Future; raise HashQueueFull if saturated"""
+        if not self._slots.acquire(blocking=False):
+            raise HashQueueFull("Too many password operations in progress")
+        try:
+            future = self._executor.submit(fn, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait, cancel_futures=not wait)
@@ -0,0 +1,68 @@
+"""CPU stand-in for a local language model, for exercising batched inference.
+
+``LocalModelBackend`` runs a real (if meaningless) forward pass with numpy:
+the prompt is encoded first, at a cost proportional to its length, then every
+decoding step pushes the hidden state of each sequence in the batch through
+a stack of dense layers. As with a real model the step is bound by reading
+the weights, so decoding sixteen sequences together costs far less than
+sixteen separate steps. The text itself is a fixed reply streamed word by
+word, like ``PlaceholderBackend``.
+
+    FINSENTIO_EDUCATION_BACKEND=local_model:LocalModelBackend python app.py
+"""
+import os
+import zlib
+
+import numpy as np
+
+from chat_backend import ChatBackend
+
+LOCAL_MODEL_HIDDEN = int(os.environ.get('FINSENTIO_LOCAL_MODEL_HIDDEN', '1024'))
+LOCAL_MODEL_LAYERS = int(os.environ.get('FINSENTIO_LOCAL_MODEL_LAYERS', '4'))
+
+DEFAULT_REPLY = ("This answer comes from the local stand-in model. It spends about as much CPU "
+                 "per word as a small language model would, but the words themselves are fixed.")
+
+_VOCABULARY = 4096
+
+
+class LocalModelBackend(ChatBackend):
+    """Deterministic local model whose cost per decoding step barely grows with the batch"""
+
+    supports_batching = True
+
+    def __init__(self, reply=DEFAULT_REPLY, hidden=LOCAL_MODEL_HIDDEN, layers=LOCAL_MODEL_LAYERS, seed=0):
+        self.words = reply.split(' ')
+        rng = np.random.default_rng(seed)
+        scale = np.float32(1 / np.sqrt(hidden))
+        self.embeddings = rng.standard_normal((hidden, _VOCABULARY), dtype=np.float32)
+        # (out, in) weights applied as W @ H to column states: BLAS handles a
+        # thin right-hand matrix far better than a thin left-hand one
+        self.weights = [rng.standard_normal((hidden, hidden), dtype=np.float32) * scale for _ in range(layers)]
+
+    def _forward(self, states):
+        for weight in self.weights:
+            states = np.tanh(weight @ states)
+        return states
+
+    def _encode(self, requests):
+        """Initial (hidden, batch) state: all prompt tokens of the batch go through the layers together"""
+        token_lists = []
+        for message, history, context in requests:
+            text = ' '.join([message, str(context or '')] + [part for turn in history for part in turn if part])
+            token_lists.append([zlib.crc32(word.encode()) % _VOCABULARY for word in text.split()] or [0])
+        encoded = self._forward(self.embeddings[:, [token for tokens in token_lists for token in tokens]])
+        bounds = np.cumsum([0] + [len(tokens) for tokens in token_lists])
+        return np.stack([encoded[:, start:end].mean(axis=1) for start, end in zip(bounds, bounds[1:])], axis=1)
+
+    def stream_batch(self, requests):
+        states = self._encode(requests)
+        for index, word in enumerate(self.words):
+            states = self._forward(states)
+            chunk = word if index == 0 else ' ' + word
+            yield [chunk] * len(requests)
+
+    def stream(self, message, history, context=None):
+        for step in self.stream_batch([(message, history, context)]):
+            yield step[0]
+
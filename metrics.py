@@ -0,0 +1,386 @@
+"""Low-overhead latency and error metrics for the handlers and the database layer.
+
+Handlers wired into the gr.Blocks app are wrapped by ``instrument_blocks``;
+every SQL statement run on a pooled connection is timed by ``TimedConnection``;
+password hashing and pool waits are recorded by database.py. Metrics are
+served in Prometheus text format on a local HTTP port and can be written as
+periodic JSON snapshots.
+
+Call and error counts are always exact. Latencies are recorded for a
+``FINSENTIO_METRICS_SAMPLE_RATE`` share of calls, and ``FINSENTIO_METRICS=0``
+turns the whole layer into no-ops.
+"""
+import bisect
+import functools
+import inspect
+import json
+import os
+import random
+import re
+import sqlite3
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ENABLED = os.environ.get('FINSENTIO_METRICS', '1') != '0'
+SAMPLE_RATE = float(os.environ.get('FINSENTIO_METRICS_SAMPLE_RATE', '1.0'))
+METRICS_PORT = int(os.environ.get('FINSENTIO_METRICS_PORT', '9464'))
+SNAPSHOT_PATH = os.environ.get('FINSENTIO_METRICS_SNAPSHOT_PATH', '')
+SNAPSHOT_INTERVAL = float(os.environ.get('FINSENTIO_METRICS_SNAPSHOT_INTERVAL', '60'))
+
+# Histogram bucket upper bounds, in seconds
+BUCKETS = (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Bucket upper bounds for rates, in events per second
+RATE_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000)
+
+HELP = {
+    'finsentio_handler_seconds': 'Gradio event handler latency',
+    'finsentio_handler_calls_total': 'Gradio event handler calls',
+    'finsentio_handler_errors_total': 'Gradio event handler exceptions',
+    'finsentio_db_query_seconds': 'SQLite statement latency, including busy waits',
+    'finsentio_db_query_calls_total': 'SQLite statements executed',
+    'finsentio_db_errors_total': 'SQLite statement errors',
+    'finsentio_db_locked_total': 'SQLite "database is locked" errors',
+    'finsentio_db_lock_wait_seconds': 'Time spent waiting for a pooled connection',
+    'finsentio_password_hash_seconds': 'Password hashing and verification time',
+    'finsentio_chat_ttft_seconds': 'Chatbot time to first token',
+    'finsentio_chat_tokens_per_second': 'Chatbot streaming rate per reply',
+    'finsentio_answer_cache_exact_hits_total': 'Answer cache lookups served by the normalized question',
+    'finsentio_answer_cache_similar_hits_total': 'Answer cache lookups served by a near-duplicate question',
+    'finsentio_answer_cache_misses_total': 'Answer cache lookups that went to the backend',
+}
+
+
+class Histogram:
+    """Cumulative-bucket histogram (latencies by default)"""
+
+    __slots__ = ('buckets', 'counts', 'count', 'sum', 'lock')
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.lock = threading.Lock()
+
+    def observe(self, seconds):
+        index = bisect.bisect_left(self.buckets, seconds)
+        with self.lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.sum += seconds
+
+    def quantile(self, q):
+        """Approximate quantile: upper bound of the bucket holding it"""
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        running = 0
+        for index, count in enumerate(self.counts):
+            running += count
+            if running >= target:
+                return self.buckets[index] if index < len(self.buckets) else float('inf')
+        return float('inf')
+
+
+class Registry:
+    """Histograms and counters keyed by (metric name, label value)"""
+
+    def __init__(self):
+        self.histograms = {}
+        self.counters = {}
+        self._lock = threading.Lock()
+
+    def histogram(self, name, label, buckets=BUCKETS):
+        key = (name, label)
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            with self._lock:
+                histogram = self.histograms.setdefault(key, Histogram(buckets))
+        return histogram
+
+    def inc(self, name, label, amount=1):
+        key = (name, label)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def reset(self):
+        with self._lock:
+            self.histograms.clear()
+            self.counters.clear()
+
+    def prometheus(self):
+        """Render all metrics in the Prometheus text exposition format"""
+        lines = []
+        by_name = {}
+        for (name, label), histogram in sorted(self.histograms.items()):
+            by_name.setdefault(name, []).append((label, histogram))
+        for name, series in by_name.items():
+            lines.append(f'# HELP {name} {HELP.get(name, name)}')
+            lines.append(f'# TYPE {name} histogram')
+            for label, histogram in series:
+                with histogram.lock:
+                    counts, count, total = list(histogram.counts), histogram.count, histogram.sum
+                tag = _label_text(label)
+                running = 0
+                for bound, bucket_count in zip(histogram.buckets + (float('inf'),), counts):
+                    running += bucket_count
+                    le = '+Inf' if bound == float('inf') else repr(bound)
+                    lines.append(f'{name}_bucket{{{tag}le="{le}"}} {running}')
+                lines.append(f'{name}_sum{{{tag.rstrip(",")}}} {total}')
+                lines.append(f'{name}_count{{{tag.rstrip(",")}}} {count}')
+
+        counters_by_name = {}
+        for (name, label), value in sorted(self.counters.items()):
+            counters_by_name.setdefault(name, []).append((label, value))
+        for name, series in counters_by_name.items():
+            lines.append(f'# HELP {name} {HELP.get(name, name)}')
+            lines.append(f'# TYPE {name} counter')
+            for label, value in series:
+                lines.append(f'{name}{{{_label_text(label).rstrip(",")}}} {value}')
+        return '\n'.join(lines) + '\n'
+
+    def snapshot(self):
+        """JSON-friendly summary: count, sum and approximate p50/p95/p99 per series"""
+        histograms = {}
+        for (name, label), histogram in sorted(self.histograms.items()):
+            histograms.setdefault(name, {})[label] = {
+                'count': histogram.count,
+                'sum': histogram.sum,
+                'p50': histogram.quantile(0.50),
+                'p95': histogram.quantile(0.95),
+                'p99': histogram.quantile(0.99),
+            }
+        counters = {}
+        for (name, label), value in sorted(self.counters.items()):
+            counters.setdefault(name, {})[label] = value
+        return {'timestamp': time.time(), 'sample_rate': SAMPLE_RATE,
+                'histograms': histograms, 'counters': counters}
+
+
+def _label_text(label):
+    kind, _, value = label.partition('=')
+    value = value.replace('\\', '\\\\').replace('"', '\\"')
+    return f'{kind}="{value}",'
+
+
+registry = Registry()
+
+
+def _sampled():
+    return SAMPLE_RATE >= 1.0 or random.random() < SAMPLE_RATE
+
+
+def observe(name, label, seconds, buckets=BUCKETS):
+    """Record a latency (or, with RATE_BUCKETS, a rate) sample, subject to sampling"""
+    if ENABLED and _sampled():
+        registry.histogram(name, label, buckets).observe(seconds)
+
+
+def inc(name, label, amount=1):
+    """Increment a counter"""
+    if ENABLED:
+        registry.inc(name, label, amount)
+
+
+def instrument(fn, label):
+    """Wrap a sync, async, generator or async-generator handler with call/latency/error metrics.
+
+    The wrapper keeps the function kind and signature, so Gradio treats it
+    exactly like the original.
+    """
+    if not ENABLED:
+        return fn
+    tag = f'handler={label}'
+
+    def record(started, sampled):
+        if sampled:
+            registry.histogram('finsentio_handler_seconds', tag).observe(time.perf_counter() - started)
+
+    if inspect.isasyncgenfunction(fn):
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            registry.inc('finsentio_handler_calls_total', tag)
+            sampled, started = _sampled(), time.perf_counter()
+            try:
+                async for item in fn(*args, **kwargs):
+                    yield item
+            except Exception:
+                registry.inc('finsentio_handler_errors_total', tag)
+                raise
+            finally:
+                record(started, sampled)
+    elif inspect.isgeneratorfunction(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            registry.inc('finsentio_handler_calls_total', tag)
+            sampled, started = _sampled(), time.perf_counter()
+            try:
+                yield from fn(*args, **kwargs)
+            except Exception:
+                registry.inc('finsentio_handler_errors_total', tag)
+                raise
+            finally:
+                record(started, sampled)
+    elif inspect.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            registry.inc('finsentio_handler_calls_total', tag)
+            sampled, started = _sampled(), time.perf_counter()
+            try:
+                return await fn(*args, **kwargs)
+            except Exception:
+                registry.inc('finsentio_handler_errors_total', tag)
+                raise
+            finally:
+                record(started, sampled)
+    else:
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            registry.inc('finsentio_handler_calls_total', tag)
+            sampled, started = _sampled(), time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            except Exception:
+                registry.inc('finsentio_handler_errors_total', tag)
+                raise
+            finally:
+                record(started, sampled)
+    return wrapper
+
+
+def instrument_blocks(blocks):
+    """Wrap every event handler registered on a gr.Blocks app"""
+    if not ENABLED:
+        return blocks
+    functions = blocks.fns.values() if isinstance(blocks.fns, dict) else blocks.fns
+    for block_fn in functions:
+        if block_fn.fn is not None:
+            label = block_fn.api_name or block_fn.name or 'fn'
+            block_fn.fn = instrument(block_fn.fn, label)
+    return blocks
+
+
+def timed(name, label):
+    """Decorator recording a function's latency in histogram `name`"""
+    def decorate(fn):
+        if not ENABLED:
+            return fn
+        tag = label if '=' in label else f'op={label}'
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _sampled():
+                return fn(*args, **kwargs)
+            started = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                registry.histogram(name, tag).observe(time.perf_counter() - started)
+        return wrapper
+    return decorate
+
+
+_TABLE_RE = re.compile(r'\b(?:FROM|INTO|UPDATE|TABLE|ON)\s+(?:IF\s+NOT\s+EXISTS\s+)?([A-Za-z_][A-Za-z0-9_]*)', re.I)
+_query_labels = {}
+
+
+def query_label(sql):
+    """Low-cardinality label for a statement: its verb and first table"""
+    label = _query_labels.get(sql)
+    if label is None:
+        words = sql.split(None, 1)
+        verb = words[0].upper() if words else '?'
+        match = _TABLE_RE.search(sql)
+        label = f'query={verb} {match.group(1)}' if match else f'query={verb}'
+        if len(_query_labels) < 10000:
+            _query_labels[sql] = label
+    return label
+
+
+def _timed_statement(method, sql, *args):
+    label = query_label(sql)
+    registry.inc('finsentio_db_query_calls_total', label)
+    sampled = _sampled()
+    started = time.perf_counter() if sampled else 0.0
+    try:
+        return method(sql, *args)
+    except sqlite3.Error as e:
+        registry.inc('finsentio_db_errors_total', label)
+        if 'locked' in str(e):
+            registry.inc('finsentio_db_locked_total', label)
+        raise
+    finally:
+        if sampled:
+            registry.histogram('finsentio_db_query_seconds', label).observe(time.perf_counter() - started)
+
+
+class TimedCursor(sqlite3.Cursor):
+    """Cursor that records every statement it runs"""
+
+    def execute(self, sql, *args):
+        return _timed_statement(super().execute, sql, *args)
+
+    def executemany(self, sql, *args):
+        return _timed_statement(super().executemany, sql, *args)
+
+
+class TimedConnection(sqlite3.Connection):
+    """sqlite3 connection factory whose statements are recorded in the metrics"""
+
+    def cursor(self, factory=TimedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, *args):
+        return self.cursor().execute(sql, *args)
+
+    def executemany(self, sql, *args):
+        return self.cursor().executemany(sql, *args)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] == '/metrics':
+            body = registry.prometheus().encode('utf-8')
+            content_type = 'text/plain; version=0.0.4; charset=utf-8'
+        elif self.path.split('?')[0] == '/metrics.json':
+            body = json.dumps(registry.snapshot()).encode('utf-8')
+            content_type = 'application/json'
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_http_server(port=METRICS_PORT, host='127.0.0.1'):
+    """Serve /metrics (Prometheus) and /metrics.json on a background thread"""
+    if not ENABLED or not port:
+        return None
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='metrics-http', daemon=True).start()
+    return server
+
+
+def start_snapshot_writer(path=SNAPSHOT_PATH, interval=SNAPSHOT_INTERVAL):
+    """Write registry.snapshot() to `path` every `interval` seconds on a background thread"""
+    if not ENABLED or not path:
+        return None
+    stop = threading.Event()
+
+    def run():
+        while not stop.wait(interval):
+            temporary = f'{path}.tmp'
+            with open(temporary, 'w', encoding='utf-8') as f:
+                json.dump(registry.snapshot(), f)
+            os.replace(temporary, path)
+
+    threading.Thread(target=run, name='metrics-snapshot', daemon=True).start()
+    return stop
@@ -0,0 +1,169 @@
+"""Versioned schema migrations for users.db.
+
+Each migration is a (version, description, function) entry in MIGRATIONS.
+``migrate`` applies the pending ones in order, each in its own transaction,
+and records it in the ``schema_version`` table. Migration functions must be
+idempotent so that databases created before versioning upgrade cleanly.
+"""
+import cohort_stats
+import risk_scoring
+
+
+def _create_base_tables(conn):
+    """Tables that existed before schema versioning"""
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS users (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        username TEXT UNIQUE NOT NULL,
+        password_hash TEXT NOT NULL,
+        email TEXT UNIQUE NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    ''')
+
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS user_profiles (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        profile_data TEXT NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (user_id) REFERENCES users (id)
+    )
+    ''')
+
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS sessions (
+        token TEXT PRIMARY KEY,
+        user_id INTEGER NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        expires_at REAL NOT NULL,
+        FOREIGN KEY (user_id) REFERENCES users (id)
+    )
+    ''')
+
+
+def _unique_profile_per_user(conn):
+    """Keep the most recent profile row per user, then enforce one row per user"""
+    conn.execute('''
+    DELETE FROM user_profiles WHERE id NOT IN (
+        SELECT id FROM (
+            SELECT id, ROW_NUMBER() OVER (
+                PARTITION BY user_id ORDER BY updated_at DESC, id DESC
+            ) AS rank
+            FROM user_profiles
+        ) WHERE rank = 1
+    )
+    ''')
+    conn.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_user_profiles_user_id ON user_profiles (user_id)')
+
+
+def _index_session_expiry(conn):
+    """Let purge_expired() delete expired sessions without a table scan"""
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_sessions_expires_at ON sessions (expires_at)')
+
+
+def _add_risk_score_columns(conn):
+    """Materialized risk score, filled in for the existing rows"""
+    existing = {row[1] for row in conn.execute('PRAGMA table_info(user_profiles)')}
+    if 'risk_score' not in existing:
+        conn.execute('ALTER TABLE user_profiles ADD COLUMN risk_score REAL')
+    if 'risk_category' not in existing:
+        conn.execute('ALTER TABLE user_profiles ADD COLUMN risk_category TEXT')
+    risk_scoring.backfill_risk_scores(conn, commit=False)
+
+
+def _create_answer_cache(conn):
+    """Persistent store behind the education chatbot answer cache"""
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS answer_cache (
+        question_key TEXT PRIMARY KEY,
+        answer TEXT NOT NULL,
+        expires_at REAL NOT NULL
+    )
+    ''')
+
+
+def _create_chat_messages(conn):
+    """Append-only chatbot history, one row per exchange"""
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS chat_messages (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        tab TEXT NOT NULL,
+        message TEXT NOT NULL,
+        reply TEXT NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (user_id) REFERENCES users (id)
+    )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_chat_messages_user_tab ON chat_messages (user_id, tab, id)')
+
+
+def _index_export_timestamps(conn):
+    """Let incremental exports find rows changed since a timestamp without a table scan"""
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_user_profiles_updated_at ON user_profiles (updated_at)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_users_created_at ON users (created_at)')
+
+
+def _create_answer_counts(conn):
+    """Per-cohort answer counters for the dashboard comparison, filled from existing profiles"""
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS answer_counts (
+        cohort TEXT NOT NULL,
+        question TEXT NOT NULL,
+        answer TEXT NOT NULL,
+        count INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (cohort, question, answer)
+    ) WITHOUT ROWID
+    ''')
+    cohort_stats.rebuild(conn)
+
+
+MIGRATIONS = [
+    (1, 'Base users, user_profiles and sessions tables', _create_base_tables),
+    (2, 'Deduplicate user_profiles and add a unique index on user_id', _unique_profile_per_user),
+    (3, 'Index sessions by expiry', _index_session_expiry),
+    (4, 'Add risk_score and risk_category to user_profiles', _add_risk_score_columns),
+    (5, 'Answer cache table', _create_answer_cache),
+    (6, 'Chat history table', _create_chat_messages),
+    (7, 'Index profile and user timestamps for incremental exports', _index_export_timestamps),
+    (8, 'Answer counters per cohort', _create_answer_counts),
+]
+
+
+def current_version(conn):
+    """Return the highest applied migration version (0 for a fresh database)"""
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS schema_version (
+        version INTEGER PRIMARY KEY,
+        description TEXT NOT NULL,
+        applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    ''')
+    row = conn.execute('SELECT MAX(version) FROM schema_version').fetchone()
+    return row[0] or 0
+
+
+def migrate(conn):
+    """Apply all pending migrations in order; return the resulting version"""
+    version = current_version(conn)
+    for target, description, step in MIGRATIONS:
+        if target <= version:
+            continue
+        # BEGIN IMMEDIATE takes the write lock up front, so concurrent
+        # processes starting together apply each migration exactly once
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            if current_version(conn) < target:
+                step(conn)
+                conn.execute(
+                    'INSERT INTO schema_version (version, description) VALUES (?, ?)',
+                    (target, description)
+                )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        version = target
+    return version
@@ -0,0 +1,245 @@
+"""Monte Carlo projections of the questionnaire's allocation mixes.
+
+Each path draws correlated yearly log returns for the low, medium and high
+risk buckets, rebalances to the allocation weights every year and compounds
+the portfolio value from 1.0. Paths are generated in fixed-size shards, each
+seeded from ``SeedSequence(seed).spawn``, so a given (allocation, horizon,
+paths, seed, assumptions) always produces the same numbers however many
+worker processes run the shards.
+
+Results (yearly percentile bands, probability of ending below the starting
+value) are memoized; ``precompute`` fills the cache for every question 4 mix
+and investment goal horizon when the app starts.
+
+    python monte_carlo.py --allocation "10% in low-risk, 40% in medium-risk, 50% in high-risk investments" --years 30
+"""
+import argparse
+import atexit
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from portfolio_analytics import ALLOCATION_MIXES, RISK_CLASSES
+from ttl_cache import TTLCache
+
+MC_PATHS = int(os.environ.get('FINSENTIO_MC_PATHS', '100000'))
+MC_SEED = int(os.environ.get('FINSENTIO_MC_SEED', '20240601'))
+MC_WORKERS = int(os.environ.get('FINSENTIO_MC_WORKERS', str(os.cpu_count() or 1)))
+MC_CACHE_SIZE = int(os.environ.get('FINSENTIO_MC_CACHE_SIZE', '256'))
+
+# Paths per shard; fixed so results don't depend on the worker count
+SHARD_PATHS = 10000
+PERCENTILES = (5, 25, 50, 75, 95)
+
+# Expected annual return and volatility of each risk bucket
+ASSET_ASSUMPTIONS = {
+    'low': (0.03, 0.05),
+    'medium': (0.06, 0.12),
+    'high': (0.09, 0.22),
+}
+# Correlation of yearly returns between the low, medium and high buckets
+CORRELATIONS = (
+    (1.0, 0.3, 0.1),
+    (0.3, 1.0, 0.7),
+    (0.1, 0.7, 1.0),
+)
+
+# Projection horizon in years for each investment goal answer
+GOAL_HORIZONS = {
+    "Short-term profit": 3,
+    "Long-term savings": 15,
+    "Retirement planning": 30,
+    "Wealth preservation": 10,
+}
+
+
+def _simulate_shard(weights, years, paths, seed_sequence, means, cholesky):
+    """Wealth paths of one shard as a (years+1) x paths float32 array; runs in a worker process"""
+    rng = np.random.default_rng(seed_sequence)
+    returns = rng.standard_normal((paths * years, len(weights)), dtype=np.float32) @ cholesky.T.astype(np.float32)
+    returns += means.astype(np.float32)
+    np.expm1(returns, out=returns)
+    portfolio = (returns @ np.asarray(weights, dtype=np.float32)).reshape(paths, years)
+    portfolio += 1.0
+    wealth = np.empty((years + 1, paths), dtype=np.float32)
+    wealth[0] = 1.0
+    np.cumprod(portfolio, axis=1, out=portfolio)
+    wealth[1:] = portfolio.T
+    return wealth
+
+
+def _log_params(assumptions):
+    """Mean vector and Cholesky factor of yearly bucket log returns"""
+    expected = np.array([assumptions[risk][0] for risk in RISK_CLASSES])
+    volatility = np.array([assumptions[risk][1] for risk in RISK_CLASSES])
+    sigma = np.sqrt(np.log1p((volatility / (1 + expected)) ** 2))
+    means = np.log1p(expected) - sigma ** 2 / 2
+    covariance = np.asarray(CORRELATIONS) * np.outer(sigma, sigma)
+    return means, np.linalg.cholesky(covariance)
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """Shared process pool for simulation shards.
+
+    Workers come from a forkserver, not a fork of the (multi-threaded) app
+    process, and only import this module.
+    """
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                context = multiprocessing.get_context('forkserver')
+                context.set_forkserver_preload([__name__])
+                _executor = ProcessPoolExecutor(max_workers=MC_WORKERS, mp_context=context)
+    return _executor
+
+
+def shutdown():
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+
+
+atexit.register(shutdown)
+
+
+def _run(weights, years, paths, seed, assumptions, workers):
+    means, cholesky = _log_params(assumptions)
+    sizes = [SHARD_PATHS] * (paths // SHARD_PATHS)
+    if paths % SHARD_PATHS:
+        sizes.append(paths % SHARD_PATHS)
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    jobs = [(weights, years, size, seq, means, cholesky) for size, seq in zip(sizes, seeds)]
+    if workers <= 1 or len(jobs) == 1:
+        shards = [_simulate_shard(*job) for job in jobs]
+    else:
+        shards = list(get_executor().map(_simulate_shard, *zip(*jobs)))
+    return np.concatenate(shards, axis=1)
+
+
+def _summarize(weights, years, paths, wealth):
+    """Percentile bands, loss probability and growth of simulated wealth paths"""
+    # Nearest-rank percentiles of each year's row, by partial sort
+    ranks = [round(p / 100 * (paths - 1)) for p in PERCENTILES]
+    bands = np.partition(wealth, ranks, axis=1)[:, ranks].T
+    terminal = wealth[-1]
+    return {
+        'weights': dict(zip(RISK_CLASSES, weights)),
+        'years': years,
+        'paths': paths,
+        'percentiles': {p: band.round(4).tolist() for p, band in zip(PERCENTILES, bands)},
+        'probability_of_loss': float((terminal < 1.0).mean()),
+        'expected_value': float(terminal.mean()),
+        'median_annual_return': float(np.median(terminal) ** (1 / years) - 1) if years else 0.0,
+    }
+
+
+_cache = TTLCache(maxsize=MC_CACHE_SIZE, ttl=float('inf'))
+# key -> lock held while that key is simulated, so identical concurrent requests run it once
+_key_locks = {}
+_key_locks_lock = threading.Lock()
+
+
+def simulate(allocation, years, paths=MC_PATHS, seed=MC_SEED, assumptions=None, workers=None):
+    """Percentile bands and loss probability for an allocation (question 4 answer or weights)"""
+    weights = ALLOCATION_MIXES[allocation] if isinstance(allocation, str) else allocation
+    weights = tuple(float(w) for w in weights)
+    assumptions = assumptions or ASSET_ASSUMPTIONS
+    key = (weights, years, paths, seed, tuple(sorted((k, tuple(v)) for k, v in assumptions.items())))
+    result = _cache.get(key)
+    if result is not None:
+        return result
+    with _key_locks_lock:
+        key_lock = _key_locks.setdefault(key, threading.Lock())
+    try:
+        with key_lock:
+            # Filled while this request waited for the one simulating the same key
+            result = _cache.peek(key)
+            if result is None:
+                wealth = _run(weights, years, paths, seed, assumptions, MC_WORKERS if workers is None else workers)
+                result = _summarize(weights, years, paths, wealth)
+                _cache.set(key, result)
+    finally:
+        with _key_locks_lock:
+            if _key_locks.get(key) is key_lock:
+                del _key_locks[key]
+    return result
+
+
+def project(allocation, goal):
+    """Projection of a question 4 answer over the horizon of an investment goal answer"""
+    return simulate(allocation, GOAL_HORIZONS.get(goal, GOAL_HORIZONS["Long-term savings"]))
+
+
+def precompute():
+    """Simulate every allocation mix and goal horizon so the first requests hit the cache"""
+    for allocation in ALLOCATION_MIXES:
+        for years in sorted(set(GOAL_HORIZONS.values())):
+            simulate(allocation, years)
+
+
+def precompute_in_background():
+    """Run precompute() on a daemon thread"""
+    thread = threading.Thread(target=precompute, name='monte-carlo-precompute', daemon=True)
+    thread.start()
+    return thread
+
+
+def cache_stats():
+    """Hit/miss counters of the projection cache"""
+    return _cache.stats()
+
+
+def format_projection(result, goal=None):
+    """Markdown summary of a simulate() result for the adviser tab"""
+    years = result['years']
+    weights = '/'.join(f"{w * 100:.0f}%" for w in result['weights'].values())
+    heading = f"Projected value of $1,000 with a {weights} low/medium/high-risk mix over {years} years"
+    if goal:
+        heading += f" ({goal.lower()})"
+    lines = [heading + ":", "",
+             "| Year | Pessimistic (5%) | Lower (25%) | Median | Upper (75%) | Optimistic (95%) |",
+             "|---|---|---|---|---|---|"]
+    shown = sorted({1, years // 4, years // 2, (3 * years) // 4, years} - {0})
+    for year in shown:
+        row = ' | '.join(f"${result['percentiles'][p][year] * 1000:,.0f}" for p in PERCENTILES)
+        lines.append(f"| {year} | {row} |")
+    lines += ["",
+              f"Chance of ending below $1,000: {result['probability_of_loss']:.1%}. "
+              f"Median growth {result['median_annual_return']:+.1%} per year. "
+              f"Based on {result['paths']:,} simulated paths; projections are not guarantees."]
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Monte Carlo allocation projection")
+    parser.add_argument('--allocation', default=next(iter(ALLOCATION_MIXES)),
+                        help="question 4 answer, or low,medium,high weights such as 0.1,0.4,0.5")
+    parser.add_argument('--years', type=int, default=30)
+    parser.add_argument('--paths', type=int, default=MC_PATHS)
+    parser.add_argument('--seed', type=int, default=MC_SEED)
+    parser.add_argument('--workers', type=int, default=MC_WORKERS)
+    args = parser.parse_args(argv)
+
+    allocation = args.allocation
+    if allocation not in ALLOCATION_MIXES:
+        allocation = tuple(float(w) for w in allocation.split(','))
+    started = time.perf_counter()
+    result = simulate(allocation, args.years, args.paths, args.seed, workers=args.workers)
+    print(format_projection(result))
+    print(f"\n{args.paths:,} paths x {args.years} years with {args.workers} worker(s) in "
+          f"{time.perf_counter() - started:.2f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,180 @@
+"""Self-describing password hashes.
+
+Hashes are stored as ``$<algorithm>$<params>$<salt>$<key>`` strings (salt and
+key in unpadded base64), so the cost can be raised or the algorithm switched
+without invalidating existing accounts: ``needs_rehash`` tells the login path
+when a stored hash no longer matches the configured policy.
+
+    $pbkdf2-sha256$i=100000$<salt>$<key>
+    $scrypt$n=16384,r=8,p=1$<salt>$<key>
+
+Hashes written before this format existed are raw ``salt (32 bytes) + key
+(32 bytes)`` PBKDF2-SHA256 values with 100,000 iterations; they still verify
+and are always reported as needing a rehash.
+
+    python password_hashing.py calibrate --target-ms 250 --algorithm scrypt
+"""
+import argparse
+import base64
+import hashlib
+import hmac
+import os
+import time
+
+PBKDF2 = 'pbkdf2-sha256'
+SCRYPT = 'scrypt'
+
+# Policy for new hashes; `python password_hashing.py calibrate` suggests values
+HASH_ALGORITHM = os.environ.get('FINSENTIO_HASH_ALGORITHM', PBKDF2)
+PBKDF2_ITERATIONS = int(os.environ.get('FINSENTIO_PBKDF2_ITERATIONS', '100000'))
+SCRYPT_N = int(os.environ.get('FINSENTIO_SCRYPT_N', str(2 ** 14)))
+SCRYPT_R = int(os.environ.get('FINSENTIO_SCRYPT_R', '8'))
+SCRYPT_P = int(os.environ.get('FINSENTIO_SCRYPT_P', '1'))
+
+SALT_BYTES = 16
+KEY_BYTES = 32
+
+# Pre-format hashes: 32-byte salt followed by a 32-byte PBKDF2-SHA256 key
+LEGACY_SALT_BYTES = 32
+LEGACY_ITERATIONS = 100000
+
+
+class UnknownHashFormat(ValueError):
+    """Raised for a stored hash that is neither self-describing nor legacy"""
+
+
+def default_params(algorithm=None):
+    """Configured parameters for new hashes of `algorithm`"""
+    algorithm = algorithm or HASH_ALGORITHM
+    if algorithm == PBKDF2:
+        return {'i': PBKDF2_ITERATIONS}
+    if algorithm == SCRYPT:
+        return {'n': SCRYPT_N, 'r': SCRYPT_R, 'p': SCRYPT_P}
+    raise ValueError(f"Unsupported password hash algorithm: {algorithm}")
+
+
+def _b64encode(data):
+    return base64.b64encode(data).decode('ascii').rstrip('=')
+
+
+def _b64decode(text):
+    return base64.b64decode(text + '=' * (-len(text) % 4))
+
+
+def _derive(algorithm, params, password, salt, length=KEY_BYTES):
+    if algorithm == PBKDF2:
+        return hashlib.pbkdf2_hmac('sha256', password, salt, params['i'], length)
+    if algorithm == SCRYPT:
+        n, r, p = params['n'], params['r'], params['p']
+        # hashlib's default 32 MB memory cap is too small for n >= 2**15
+        maxmem = 128 * r * (n + p + 2) + 1024 * 1024
+        return hashlib.scrypt(password, salt=salt, n=n, r=r, p=p, maxmem=maxmem, dklen=length)
+    raise UnknownHashFormat(f"Unsupported password hash algorithm: {algorithm}")
+
+
+def parse(stored):
+    """Split a stored hash into (algorithm, params, salt, key)"""
+    if isinstance(stored, (bytes, bytearray, memoryview)):
+        stored = bytes(stored)
+        if len(stored) == LEGACY_SALT_BYTES + KEY_BYTES:
+            return PBKDF2, {'i': LEGACY_ITERATIONS}, stored[:LEGACY_SALT_BYTES], stored[LEGACY_SALT_BYTES:]
+        try:
+            stored = stored.decode('ascii')
+        except UnicodeDecodeError:
+            raise UnknownHashFormat("Unrecognized password hash")
+
+    parts = stored.split('$')
+    if len(parts) != 5 or parts[0]:
+        raise UnknownHashFormat("Unrecognized password hash")
+    _, algorithm, param_text, salt, key = parts
+    params = {}
+    for item in param_text.split(','):
+        name, _, value = item.partition('=')
+        params[name] = int(value)
+    return algorithm, params, _b64decode(salt), _b64decode(key)
+
+
+def hash_password(password, algorithm=None, params=None):
+    """Hash a password with the configured (or given) algorithm and parameters"""
+    algorithm = algorithm or HASH_ALGORITHM
+    params = params or default_params(algorithm)
+    salt = os.urandom(SALT_BYTES)
+    key = _derive(algorithm, params, password.encode('utf-8'), salt)
+    param_text = ','.join(f'{name}={value}' for name, value in params.items())
+    return f'${algorithm}${param_text}${_b64encode(salt)}${_b64encode(key)}'
+
+
+def verify_password(stored, password):
+    """Check a password against a stored hash in any supported format"""
+    algorithm, params, salt, key = parse(stored)
+    candidate = _derive(algorithm, params, password.encode('utf-8'), salt, len(key))
+    return hmac.compare_digest(candidate, key)
+
+
+def needs_rehash(stored):
+    """True if the stored hash uses a different algorithm or parameters than the current policy"""
+    if isinstance(stored, (bytes, bytearray, memoryview)):
+        return True
+    try:
+        algorithm, params, _, _ = parse(stored)
+    except (UnknownHashFormat, ValueError):
+        return True
+    return algorithm != HASH_ALGORITHM or params != default_params(algorithm)
+
+
+def _time_hash(algorithm, params, rounds):
+    """Best-of-`rounds` seconds to derive one key"""
+    best = float('inf')
+    for _ in range(rounds):
+        started = time.perf_counter()
+        _derive(algorithm, params, b'calibration password', os.urandom(SALT_BYTES))
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def calibrate(target_seconds, algorithm=None, rounds=3):
+    """Pick parameters whose verify time on this host is close to, without exceeding, target_seconds.
+
+    PBKDF2 cost is linear in the iteration count, so it is scaled from one
+    measurement; scrypt's n must be a power of two, so it is doubled until
+    the next step would overshoot. Returns (params, measured_seconds).
+    """
+    algorithm = algorithm or HASH_ALGORITHM
+    if algorithm == PBKDF2:
+        probe = {'i': 20000}
+        elapsed = _time_hash(algorithm, probe, rounds)
+        iterations = max(10000, int(probe['i'] * target_seconds / elapsed) // 1000 * 1000)
+        params = {'i': iterations}
+    elif algorithm == SCRYPT:
+        params = {'n': 2 ** 12, 'r': SCRYPT_R, 'p': SCRYPT_P}
+        while True:
+            larger = dict(params, n=params['n'] * 2)
+            if _time_hash(algorithm, larger, rounds) > target_seconds:
+                break
+            params = larger
+    else:
+        raise ValueError(f"Unsupported password hash algorithm: {algorithm}")
+    return params, _time_hash(algorithm, params, rounds)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Password hash cost calibration")
+    subcommands = parser.add_subparsers(dest='command', required=True)
+    calibrate_parser = subcommands.add_parser('calibrate', help="pick hash parameters for a target verify time")
+    calibrate_parser.add_argument('--target-ms', type=float, default=250.0)
+    calibrate_parser.add_argument('--algorithm', choices=(PBKDF2, SCRYPT), default=HASH_ALGORITHM)
+    args = parser.parse_args(argv)
+
+    params, elapsed = calibrate(args.target_ms / 1000, args.algorithm)
+    print(f"{args.algorithm}: {params} verifies in {elapsed * 1000:.0f} ms on this host")
+    print(f"FINSENTIO_HASH_ALGORITHM={args.algorithm}")
+    if args.algorithm == PBKDF2:
+        print(f"FINSENTIO_PBKDF2_ITERATIONS={params['i']}")
+    else:
+        print(f"FINSENTIO_SCRYPT_N={params['n']}")
+        print(f"FINSENTIO_SCRYPT_R={params['r']}")
+        print(f"FINSENTIO_SCRYPT_P={params['p']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,322 @@
+"""Portfolio analytics over local historical price data.
+
+A dataset is a days x instruments array of prices stored as ``.npy`` (opened
+memory-mapped) with a ``.json`` sidecar listing the symbols and, optionally,
+dates and a low/medium/high risk class per symbol. A wide CSV (``date,SYM1,
+SYM2,...``) is converted to that layout on first use. Instruments without a
+risk class are bucketed by volatility terciles.
+
+Returns, volatility, Sharpe ratio, max drawdown and correlations are computed
+column-wise with NumPy for every instrument at once. ``evaluate_allocation``
+scores the low/medium/high-risk mixes offered by the profile questionnaire
+(question 4) as daily-rebalanced blends of equal-weighted risk buckets.
+Results are cached per (dataset version, allocation, window); the version
+changes whenever the data file does.
+
+Missing prices (NaN) are carried forward: no change that day, and the move
+across the gap counts on the day trading resumes.
+
+    python portfolio_analytics.py sample data/prices.npy --instruments 500
+    python portfolio_analytics.py convert prices.csv
+    python portfolio_analytics.py report --window 756
+"""
+import argparse
+import csv
+import hashlib
+import json
+import os
+import re
+import threading
+
+import numpy as np
+
+import risk_scoring
+from ttl_cache import TTLCache
+
+_DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+PRICE_DATA = os.environ.get('FINSENTIO_PRICE_DATA', os.path.join(_DATA_DIR, 'prices.npy'))
+RISK_FREE_RATE = float(os.environ.get('FINSENTIO_RISK_FREE_RATE', '0.02'))
+ANALYTICS_CACHE_SIZE = int(os.environ.get('FINSENTIO_ANALYTICS_CACHE_SIZE', '256'))
+
+TRADING_DAYS = 252
+RISK_CLASSES = ('low', 'medium', 'high')
+# Look-back windows offered in reports, in trading days (None: full history)
+WINDOWS = {'1 year': 252, '3 years': 756, '5 years': 1260}
+
+
+def _parse_allocation(answer):
+    """(low, medium, high) weights from a question 4 answer such as "60% in low-risk, ..." """
+    shares = dict((risk, int(pct) / 100) for pct, risk in re.findall(r'(\d+)% in (low|medium|high)-risk', answer))
+    return tuple(shares.get(risk, 0.0) for risk in RISK_CLASSES)
+
+
+# Question 4 answers and their (low, medium, high) risk weights
+ALLOCATION_MIXES = {answer: _parse_allocation(answer) for answer in risk_scoring.ANSWER_WEIGHTS['investment_allocation']}
+
+
+class PriceDataset:
+    """A memory-mapped days x instruments price matrix and its metadata"""
+
+    def __init__(self, npy_path):
+        self.path = npy_path
+        self.prices = np.load(npy_path, mmap_mode='r')
+        if self.prices.ndim != 2:
+            raise ValueError(f"{npy_path}: expected a days x instruments array, got shape {self.prices.shape}")
+        meta_path = os.path.splitext(npy_path)[0] + '.json'
+        meta = {}
+        if os.path.exists(meta_path):
+            with open(meta_path, encoding='utf-8') as f:
+                meta = json.load(f)
+        self.symbols = meta.get('symbols') or [f'I{i}' for i in range(self.prices.shape[1])]
+        self.dates = meta.get('dates')
+        self.risk_classes = meta.get('risk') or {}
+
+        stat = os.stat(npy_path)
+        meta_stamp = os.stat(meta_path).st_mtime_ns if meta else 0
+        self.version = hashlib.blake2b(
+            f'{os.path.abspath(npy_path)}:{stat.st_size}:{stat.st_mtime_ns}:{meta_stamp}'.encode(), digest_size=8
+        ).hexdigest()
+
+    @property
+    def days(self):
+        return self.prices.shape[0]
+
+    @property
+    def instruments(self):
+        return self.prices.shape[1]
+
+
+def convert_csv(csv_path, npy_path=None):
+    """Convert a wide date,SYM1,SYM2,... CSV into a .npy price matrix plus .json sidecar"""
+    npy_path = npy_path or os.path.splitext(csv_path)[0] + '.npy'
+    with open(csv_path, newline='', encoding='utf-8') as f:
+        reader = csv.reader(f)
+        symbols = next(reader)[1:]
+        dates, rows = [], []
+        for row in reader:
+            if not row:
+                continue
+            dates.append(row[0])
+            rows.append([float(value) if value else np.nan for value in row[1:]])
+    prices = np.asarray(rows, dtype=np.float64).reshape(len(rows), len(symbols))
+    temporary = f'{npy_path}.tmp{os.getpid()}.npy'
+    np.save(temporary, prices)
+    os.replace(temporary, npy_path)
+    meta_path = os.path.splitext(npy_path)[0] + '.json'
+    meta = {}
+    if os.path.exists(meta_path):
+        with open(meta_path, encoding='utf-8') as f:
+            meta = json.load(f)
+    meta.update(symbols=symbols, dates=dates)
+    with open(meta_path, 'w', encoding='utf-8') as f:
+        json.dump(meta, f)
+    return npy_path
+
+
+_dataset = None
+_dataset_stamp = None
+_dataset_lock = threading.Lock()
+
+
+def load_dataset(path=PRICE_DATA):
+    """The dataset at `path` (.npy, or .csv converted on first use), reopened when the file changes; None if absent"""
+    global _dataset, _dataset_stamp
+    if path.endswith('.csv'):
+        if not os.path.exists(path):
+            return None
+        npy_path = os.path.splitext(path)[0] + '.npy'
+        if not os.path.exists(npy_path) or os.stat(npy_path).st_mtime_ns < os.stat(path).st_mtime_ns:
+            convert_csv(path, npy_path)
+        path = npy_path
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    stamp = (path, stat.st_size, stat.st_mtime_ns)
+    with _dataset_lock:
+        if stamp != _dataset_stamp:
+            _dataset = PriceDataset(path)
+            _dataset_stamp = stamp
+        return _dataset
+
+
+_cache = TTLCache(maxsize=ANALYTICS_CACHE_SIZE, ttl=float('inf'))
+
+
+def _cached(key, compute):
+    value = _cache.get(key)
+    if value is None:
+        value = compute()
+        _cache.set(key, value)
+    return value
+
+
+def cache_stats():
+    return _cache.stats()
+
+
+def daily_returns(dataset, window=None):
+    """(days-1) x instruments simple returns over the last `window` days.
+
+    Missing prices are carried forward from the last known one, so a gap
+    returns 0 and the move across it lands on the day trading resumes.
+    """
+    prices = np.asarray(dataset.prices if window is None else dataset.prices[-(window + 1):], dtype=np.float64)
+    # Index of the last finite price at or before each day, per column
+    known = np.where(np.isfinite(prices), np.arange(len(prices))[:, None], 0)
+    np.maximum.accumulate(known, axis=0, out=known)
+    prices = prices[known, np.arange(prices.shape[1])]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        returns = prices[1:] / prices[:-1] - 1
+    returns[~np.isfinite(returns)] = 0.0
+    return returns
+
+
+def _metrics(returns):
+    """Annualized return, volatility, Sharpe ratio and max drawdown of each returns column"""
+    mean = returns.mean(axis=0)
+    volatility = returns.std(axis=0, ddof=1) * np.sqrt(TRADING_DAYS) if len(returns) > 1 else np.zeros(returns.shape[1:])
+    growth = np.cumprod(1 + returns, axis=0)
+    total_return = growth[-1] - 1 if len(growth) else np.zeros(returns.shape[1:])
+    annual_return = (1 + total_return) ** (TRADING_DAYS / max(len(returns), 1)) - 1
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sharpe = np.where(volatility > 0, (mean * TRADING_DAYS - RISK_FREE_RATE) / volatility, 0.0)
+    peaks = np.maximum.accumulate(np.maximum(growth, 1.0), axis=0)
+    max_drawdown = (1 - growth / peaks).max(axis=0) if len(growth) else np.zeros(returns.shape[1:])
+    return {
+        'annual_return': annual_return,
+        'volatility': volatility,
+        'sharpe': sharpe,
+        'max_drawdown': max_drawdown,
+        'total_return': total_return,
+    }
+
+
+def instrument_metrics(dataset, window=None):
+    """Per-instrument metric arrays (indexed like dataset.symbols)"""
+    return _cached((dataset.version, 'metrics', window), lambda: _metrics(daily_returns(dataset, window)))
+
+
+def correlation_matrix(dataset, window=None):
+    """instruments x instruments correlation of daily returns"""
+    def compute():
+        returns = daily_returns(dataset, window)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            matrix = np.corrcoef(returns, rowvar=False)
+        return np.nan_to_num(np.atleast_2d(matrix))
+    return _cached((dataset.version, 'correlation', window), compute)
+
+
+def risk_buckets(dataset, window=None):
+    """Column indices of the low, medium and high risk instruments"""
+    def compute():
+        volatility = instrument_metrics(dataset, window)['volatility']
+        low_cut, high_cut = np.quantile(volatility, [1 / 3, 2 / 3]) if len(volatility) else (0.0, 0.0)
+        by_volatility = np.where(volatility <= low_cut, 0, np.where(volatility <= high_cut, 1, 2))
+        classes = np.array([RISK_CLASSES.index(dataset.risk_classes[symbol])
+                            if dataset.risk_classes.get(symbol) in RISK_CLASSES else by_volatility[i]
+                            for i, symbol in enumerate(dataset.symbols)], dtype=np.int8)
+        return tuple(np.flatnonzero(classes == bucket) for bucket in range(len(RISK_CLASSES)))
+    return _cached((dataset.version, 'buckets', window), compute)
+
+
+def bucket_returns(dataset, window=None):
+    """days x 3 daily returns of the equal-weighted low, medium and high risk buckets"""
+    def compute():
+        returns = daily_returns(dataset, window)
+        return np.column_stack([
+            returns[:, index].mean(axis=1) if len(index) else np.zeros(len(returns))
+            for index in risk_buckets(dataset, window)
+        ])
+    return _cached((dataset.version, 'bucket_returns', window), compute)
+
+
+def evaluate_allocation(dataset, allocation, window=None):
+    """Metrics of a question 4 allocation mix (answer text or (low, medium, high) weights) as floats"""
+    weights = ALLOCATION_MIXES[allocation] if isinstance(allocation, str) else allocation
+    weights = tuple(float(w) for w in weights)
+
+    def compute():
+        buckets = risk_buckets(dataset, window)
+        returns = bucket_returns(dataset, window)
+        # Blend the buckets daily; weight of an empty bucket is spread over the others
+        present = np.array([len(index) > 0 for index in buckets])
+        mix = np.asarray(weights) * present
+        mix = mix / mix.sum() if mix.sum() else mix
+        metrics = _metrics((returns @ mix)[:, None])
+        result = {name: float(values[0]) for name, values in metrics.items()}
+        result['weights'] = dict(zip(RISK_CLASSES, weights))
+        result['instruments'] = {risk: int(len(index)) for risk, index in zip(RISK_CLASSES, buckets)}
+        result['days'] = int(len(returns))
+        return result
+    return dict(_cached((dataset.version, 'allocation', weights, window), compute))
+
+
+def compare_allocations(dataset, window=None):
+    """evaluate_allocation for every question 4 answer"""
+    return {answer: evaluate_allocation(dataset, answer, window) for answer in ALLOCATION_MIXES}
+
+
+def format_report(dataset, selected=None, window=None):
+    """Markdown table comparing the question 4 allocation mixes; `selected` is highlighted"""
+    period = f"last {window} trading days" if window else "full history"
+    lines = [
+        f"Based on {dataset.instruments:,} instruments, {period}. Past performance does not guarantee future results.",
+        "",
+        "| Allocation (low/medium/high risk) | Annual return | Volatility | Sharpe | Max drawdown |",
+        "|---|---|---|---|---|",
+    ]
+    for answer, result in compare_allocations(dataset, window).items():
+        weights = '/'.join(f"{w * 100:.0f}%" for w in result['weights'].values())
+        label = f"**{weights} (your choice)**" if answer == selected else weights
+        lines.append(f"| {label} | {result['annual_return']:+.1%} | {result['volatility']:.1%} | "
+                     f"{result['sharpe']:.2f} | {-result['max_drawdown']:.1%} |")
+    return '\n'.join(lines)
+
+
+def generate_sample(path, instruments=500, days=2520, seed=0):
+    """Write a synthetic geometric-Brownian-motion dataset (for demos and benchmarks)"""
+    rng = np.random.default_rng(seed)
+    annual_vol = rng.uniform(0.02, 0.6, instruments)
+    annual_drift = 0.01 + 0.12 * annual_vol + rng.normal(0, 0.02, instruments)
+    market = rng.normal(0, 0.01, (days, 1))
+    beta = rng.uniform(0, 1.5, instruments) * (annual_vol > 0.1)
+    daily_vol = annual_vol / np.sqrt(TRADING_DAYS)
+    noise = rng.standard_normal((days, instruments)) * daily_vol
+    # Ito correction keeps the expected simple return at annual_drift
+    variance = daily_vol ** 2 + (beta * 0.01) ** 2
+    log_returns = annual_drift / TRADING_DAYS - variance / 2 + noise + market * beta
+    prices = 100 * np.exp(np.cumsum(log_returns, axis=0))
+    np.save(path, prices)
+    with open(os.path.splitext(path)[0] + '.json', 'w', encoding='utf-8') as f:
+        json.dump({'symbols': [f'SYN{i:05d}' for i in range(instruments)]}, f)
+    return path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Portfolio analytics over local price data")
+    subcommands = parser.add_subparsers(dest='command', required=True)
+    sample = subcommands.add_parser('sample', help="write a synthetic price dataset")
+    sample.add_argument('path', nargs='?', default=PRICE_DATA)
+    sample.add_argument('--instruments', type=int, default=500)
+    sample.add_argument('--days', type=int, default=2520)
+    convert = subcommands.add_parser('convert', help="convert a wide CSV into .npy + .json")
+    convert.add_argument('csv_path')
+    report = subcommands.add_parser('report', help="compare the allocation mixes")
+    report.add_argument('--data', default=PRICE_DATA)
+    report.add_argument('--window', type=int)
+    args = parser.parse_args(argv)
+
+    if args.command == 'sample':
+        print(f"Wrote {generate_sample(args.path, args.instruments, args.days)}")
+    elif args.command == 'convert':
+        print(f"Wrote {convert_csv(args.csv_path)}")
+    else:
+        dataset = load_dataset(args.data)
+        if dataset is None:
+            raise SystemExit(f"No price data at {args.data}")
+        print(format_report(dataset, window=args.window))
+
+
+if __name__ == '__main__':
+    main()
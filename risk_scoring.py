@@ -0,0 +1,236 @@
+"""Risk-tolerance scoring for the ten profile questionnaire answers.
+
+Every answer maps to a weight between 0 (risk averse) and 1 (risk seeking).
+The composite score is the importance-weighted mean of the ten answer weights,
+scaled to 0-100, and is bucketed into a risk category.
+
+``score_profile`` scores one saved profile. ``score_columns`` scores many at
+once: each column's few distinct answers are weighed once, the per-row weights
+are gathered into NumPy arrays and the composite score and category are
+computed array-wide. ``backfill_risk_scores`` uses it to (re)score the
+whole user_profiles table in batches.
+
+    python risk_scoring.py backfill [--all]
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+
+# Weight of each answer, per question
+ANSWER_WEIGHTS = {
+    'risk_taker': {
+        "A real gambler": 1.0,
+        "Willing to take risks after completing adequate research": 0.67,
+        "Cautious": 0.33,
+        "A real risk avoider": 0.0,
+    },
+    'risk_word': {
+        "Loss": 0.0,
+        "Uncertainty": 0.33,
+        "Opportunity": 0.67,
+        "Thrill": 1.0,
+    },
+    'game_show': {
+        "$1,000 in cash": 0.0,
+        "A 50% chance at winning $5,000": 0.33,
+        "A 25% chance at winning $10,000": 0.67,
+        "A 5% chance at winning $100,000": 1.0,
+    },
+    'investment_allocation': {
+        "60% in low-risk, 30% in medium-risk, 10% in high-risk investments": 0.0,
+        "30% in low-risk, 30% in medium-risk, 40% in high-risk investments": 0.5,
+        "10% in low-risk, 40% in medium-risk, 50% in high-risk investments": 1.0,
+    },
+    'market_follow': {
+        "Daily": 1.0,
+        "Weekly": 0.67,
+        "Occasionally": 0.33,
+        "Never": 0.0,
+    },
+    'new_investment': {
+        "Immediately jump in": 1.0,
+        "Research thoroughly before investing": 0.67,
+        "Ask others first, then decide": 0.33,
+        "Wait and observe over time": 0.0,
+    },
+    'buy_things': {
+        "Agree": 0.0,
+        "Neutral": 0.5,
+        "Disagree": 1.0,
+    },
+    'finance_reading': {
+        "Agree": 1.0,
+        "Neutral": 0.5,
+        "Disagree": 0.0,
+    },
+    'investment_goal': {
+        "Short-term profit": 1.0,
+        "Long-term savings": 0.5,
+        "Retirement planning": 0.33,
+        "Wealth preservation": 0.0,
+    },
+}
+
+# Question 9 is multi-select: it scores as the riskiest asset class chosen
+PREVIOUS_INVESTMENT_WEIGHTS = {
+    "Stocks": 0.67,
+    "Cryptocurrency": 1.0,
+    "Foreign currencies": 0.67,
+    "Gold or other commodities": 0.33,
+    "Fixed deposit accounts": 0.0,
+    "I have never invested": 0.0,
+}
+
+# Relative importance of each question; the direct risk-attitude questions count double
+QUESTION_IMPORTANCE = {
+    'risk_taker': 2.0,
+    'risk_word': 2.0,
+    'game_show': 2.0,
+    'investment_allocation': 2.0,
+    'market_follow': 1.0,
+    'new_investment': 1.0,
+    'buy_things': 0.5,
+    'finance_reading': 0.5,
+    'previous_investments': 1.0,
+    'investment_goal': 1.0,
+}
+
+QUESTIONS = tuple(QUESTION_IMPORTANCE)
+
+# Missing or unrecognized answers count as neutral
+NEUTRAL_WEIGHT = 0.5
+
+# (upper bound of score, category), checked in order
+CATEGORIES = (
+    (20.0, 'Conservative'),
+    (40.0, 'Moderately Conservative'),
+    (60.0, 'Moderate'),
+    (80.0, 'Moderately Aggressive'),
+    (100.1, 'Aggressive'),
+)
+
+_TOTAL_IMPORTANCE = sum(QUESTION_IMPORTANCE.values())
+_CATEGORY_BOUNDS = np.array([bound for bound, _ in CATEGORIES[:-1]])
+_CATEGORY_NAMES = np.array([name for _, name in CATEGORIES], dtype=object)
+
+
+def _previous_investments_weight(value):
+    """Weight for question 9; accepts a list or its JSON encoding"""
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except ValueError:
+            value = [value]
+    if not value:
+        return 0.0
+    return max(PREVIOUS_INVESTMENT_WEIGHTS.get(item, NEUTRAL_WEIGHT) for item in value)
+
+
+def answer_weight(question, answer):
+    """Weight in [0, 1] of a single answer"""
+    if question == 'previous_investments':
+        return _previous_investments_weight(answer)
+    return ANSWER_WEIGHTS[question].get(answer, NEUTRAL_WEIGHT)
+
+
+def categorize(score):
+    """Risk category for a 0-100 score"""
+    for bound, name in CATEGORIES:
+        if score < bound:
+            return name
+    return CATEGORIES[-1][1]
+
+
+def score_profile(profile_data):
+    """Return (score, category) for one profile dict"""
+    total = sum(
+        QUESTION_IMPORTANCE[q] * answer_weight(q, profile_data.get(q)) for q in QUESTIONS
+    )
+    score = round(100.0 * total / _TOTAL_IMPORTANCE, 2)
+    return score, categorize(score)
+
+
+def score_columns(columns):
+    """Score many profiles at once.
+
+    ``columns`` maps each question to a sequence of raw answers (one per
+    profile, all the same length; question 9 as a list or JSON text). Returns
+    (scores, categories) as NumPy arrays.
+    """
+    total = None
+    for question in QUESTIONS:
+        values = columns[question]
+        if question == 'previous_investments':
+            # Lists are unhashable; tuples score the same
+            values = [v if v is None or isinstance(v, str) else tuple(v) for v in values]
+        # Each question has only a handful of distinct answers: weigh those
+        # once, then map every row through the lookup table in C
+        table = {v: answer_weight(question, v) for v in set(values)}
+        weights = np.fromiter(map(table.__getitem__, values), dtype=np.float64, count=len(values))
+        contribution = QUESTION_IMPORTANCE[question] * weights
+        total = contribution if total is None else total + contribution
+
+    scores = np.round(100.0 * total / _TOTAL_IMPORTANCE, 2)
+    categories = _CATEGORY_NAMES[np.searchsorted(_CATEGORY_BOUNDS, scores, side='right')]
+    return scores, categories
+
+
+_EXTRACT_COLUMNS = ', '.join(f"json_extract(profile_data, '$.{q}')" for q in QUESTIONS)
+
+
+def backfill_risk_scores(conn, batch_size=50000, only_missing=True, commit=True):
+    """Score user_profiles rows in batches and store the results; return rows updated.
+
+    json_extract pulls the answers out in SQLite so no profile blob is parsed
+    in Python. Each batch is committed separately, so the job can be
+    interrupted and resumed (with ``only_missing=True``); ``commit=False``
+    leaves committing to the caller, as the schema migrations do.
+    """
+    condition = 'AND risk_score IS NULL' if only_missing else ''
+    last_id, updated = 0, 0
+    while True:
+        rows = conn.execute(
+            f'''SELECT id, {_EXTRACT_COLUMNS} FROM user_profiles
+                WHERE id > ? {condition} ORDER BY id LIMIT ?''',
+            (last_id, batch_size)
+        ).fetchall()
+        if not rows:
+            return updated
+        ids = [row[0] for row in rows]
+        columns = {q: [row[i + 1] for row in rows] for i, q in enumerate(QUESTIONS)}
+        scores, categories = score_columns(columns)
+        conn.executemany(
+            'UPDATE user_profiles SET risk_score = ?, risk_category = ? WHERE id = ?',
+            zip(scores.tolist(), categories.tolist(), ids)
+        )
+        if commit:
+            conn.commit()
+        updated += len(ids)
+        last_id = ids[-1]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Risk score maintenance")
+    sub = parser.add_subparsers(dest='command', required=True)
+    backfill = sub.add_parser('backfill', help="score profiles that have no risk score yet")
+    backfill.add_argument('--all', action='store_true', help="rescore every profile")
+    backfill.add_argument('--batch-size', type=int, default=50000)
+    args = parser.parse_args(argv)
+
+    import cohort_stats
+    import database as db
+    started = time.perf_counter()
+    with db.get_db_connection() as conn:
+        updated = backfill_risk_scores(conn, args.batch_size, only_missing=not args.all)
+        # Counters per risk category follow the new categories
+        conn.execute('BEGIN IMMEDIATE')
+        cohort_stats.rebuild(conn)
+        conn.commit()
+    elapsed = time.perf_counter() - started
+    print(f"Scored {updated} profiles and rebuilt the cohort counters in {elapsed:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
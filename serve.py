@@ -0,0 +1,425 @@
+"""Multi-process serving: N app workers behind a local reverse proxy.
+
+One Python process is limited to about one core by the GIL, so ``serve.py``
+starts several worker processes, each running the Gradio app under uvicorn
+on a private loopback port, and accepts public traffic on a small asyncio
+proxy. Workers share everything that must outlive a request through SQLite
+(WAL mode): sessions are persisted and looked up in the ``sessions`` table on
+every request, and the per-process profile and adviser context caches get
+short TTLs, so any worker can serve any logged-in user.
+
+Gradio keeps a browser tab's queue and ``gr.State`` in the memory of the
+worker that served it, so the proxy routes by the ``session_hash`` that
+Gradio sends with every queue request (rendezvous hashing over the healthy
+workers); requests without one are spread round-robin.
+
+The supervisor polls each worker's ``/healthz`` (which runs ``SELECT 1``),
+replaces workers that exit or stop answering, and on SIGHUP does a rolling
+restart: a replacement is started and must pass its health check before the
+old worker is taken out of rotation and sent SIGTERM, letting it finish its
+in-flight requests. SIGTERM or SIGINT stops the proxy and all workers.
+
+    python serve.py --workers 4 --port 7860
+    kill -HUP <pid>     # rolling restart, e.g. after a deploy
+"""
+import argparse
+import asyncio
+import hashlib
+import itertools
+import json
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+from urllib.parse import parse_qs, urlsplit
+
+SERVE_HOST = os.environ.get('FINSENTIO_SERVE_HOST', '0.0.0.0')
+SERVE_PORT = int(os.environ.get('FINSENTIO_SERVE_PORT', '7860'))
+SERVE_WORKERS = int(os.environ.get('FINSENTIO_SERVE_WORKERS', str(os.cpu_count() or 1)))
+# Workers listen on 127.0.0.1, two ports per worker slot from here (old and replacement)
+WORKER_BASE_PORT = int(os.environ.get('FINSENTIO_WORKER_BASE_PORT', '7900'))
+HEALTH_INTERVAL = float(os.environ.get('FINSENTIO_HEALTH_INTERVAL', '2'))
+HEALTH_TIMEOUT = float(os.environ.get('FINSENTIO_HEALTH_TIMEOUT', '2'))
+# Consecutive failed health checks before a running worker is replaced
+HEALTH_FAILURES = 3
+# Seconds a stopping worker gets to finish in-flight requests
+GRACEFUL_TIMEOUT = float(os.environ.get('FINSENTIO_GRACEFUL_TIMEOUT', '30'))
+# Seconds a new worker has to pass its first health check
+STARTUP_TIMEOUT = 120.0
+# Largest JSON request body read to find the session_hash
+MAX_ROUTING_BODY = 1 << 20
+
+_SCRIPT = os.path.abspath(__file__)
+
+
+def worker_environment(workers):
+    """Environment for worker processes: shared state goes through SQLite"""
+    env = dict(os.environ)
+    env['FINSENTIO_SESSION_PERSIST'] = '1'
+    # Each worker exposes /metrics on its own port instead of the shared exporter port
+    env['FINSENTIO_METRICS_PORT'] = '0'
+    env.setdefault('FINSENTIO_SESSION_LOCAL_TTL', '0')
+    env.setdefault('FINSENTIO_PROFILE_CACHE_TTL', '5')
+    env.setdefault('FINSENTIO_ADVISER_CONTEXT_CACHE_TTL', '5')
+    # The cores are already split between worker processes
+    env.setdefault('FINSENTIO_MC_WORKERS', '1')
+    env.setdefault('FINSENTIO_HASH_WORKERS', str(max(2, (os.cpu_count() or 1) // workers)))
+    return env
+
+
+def run_worker(port):
+    """Serve the app on 127.0.0.1:port with /healthz and /metrics; runs in a worker process"""
+    import gradio as gr
+    import uvicorn
+    from fastapi import FastAPI
+    from fastapi.responses import JSONResponse, PlainTextResponse
+
+    import app as finsentio
+    import database as db
+    import metrics
+    import monte_carlo
+
+    api = FastAPI()
+
+    @api.get('/healthz')
+    def healthz():
+        try:
+            with db.get_db_connection() as conn:
+                conn.execute('SELECT 1').fetchone()
+        except Exception as e:
+            return JSONResponse({'status': 'error', 'error': str(e)}, status_code=503)
+        return {'status': 'ok', 'pid': os.getpid()}
+
+    @api.get('/metrics')
+    def prometheus_metrics():
+        return PlainTextResponse(metrics.registry.prometheus())
+
+    api = gr.mount_gradio_app(api, finsentio.create_app(), path='/')
+    monte_carlo.precompute_in_background()
+    uvicorn.run(api, host='127.0.0.1', port=port, log_level='warning',
+                timeout_graceful_shutdown=GRACEFUL_TIMEOUT)
+
+
+class Worker:
+    """One worker process serving on a loopback port"""
+
+    def __init__(self, slot, port, env):
+        self.slot = slot
+        self.port = port
+        self.started_at = time.monotonic()
+        self.healthy = False
+        self.failures = 0
+        self.process = subprocess.Popen([sys.executable, _SCRIPT, 'worker', '--port', str(port)], env=env)
+
+    def check(self):
+        """Probe /healthz and update the health state; returns it"""
+        try:
+            with urllib.request.urlopen(f'http://127.0.0.1:{self.port}/healthz', timeout=HEALTH_TIMEOUT) as r:
+                ok = r.status == 200
+        except Exception:
+            ok = False
+        self.failures = 0 if ok else self.failures + 1
+        self.healthy = ok
+        return ok
+
+    def alive(self):
+        return self.process.poll() is None
+
+    def stop(self, timeout=GRACEFUL_TIMEOUT):
+        """SIGTERM the worker, killing it if it hasn't exited after `timeout` seconds"""
+        self.healthy = False
+        if self.alive():
+            self.process.terminate()
+        try:
+            self.process.wait(timeout)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+
+
+class Supervisor:
+    """Starts, health-checks, replaces and rolling-restarts the worker processes"""
+
+    def __init__(self, workers, base_port=WORKER_BASE_PORT):
+        self.size = workers
+        self.base_port = base_port
+        self.env = worker_environment(workers)
+        self.slots = [None] * workers
+        self._generation = [0] * workers
+        self._replace_lock = threading.Lock()
+        self._restarting = threading.Lock()
+        self._stopping = threading.Event()
+        self._round_robin = itertools.count()
+
+    def _spawn(self, slot):
+        self._generation[slot] += 1
+        port = self.base_port + 2 * slot + self._generation[slot] % 2
+        return Worker(slot, port, self.env)
+
+    def _wait_healthy(self, worker, timeout=STARTUP_TIMEOUT):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline and not self._stopping.is_set():
+            if not worker.alive():
+                return False
+            if worker.check():
+                return True
+            time.sleep(0.2)
+        return False
+
+    def start(self):
+        for slot in range(self.size):
+            self.slots[slot] = self._spawn(slot)
+        threading.Thread(target=self._monitor, name='serve-health', daemon=True).start()
+
+    def _replace(self, slot, old):
+        """Start a fresh worker in place of `old` and swap it in once it is healthy"""
+        with self._replace_lock:
+            if self.slots[slot] is not old:
+                return True
+            new = self._spawn(slot)
+            if not self._wait_healthy(new):
+                new.stop(timeout=5)
+                return False
+            self.slots[slot] = new
+        old.stop()
+        return True
+
+    def _monitor(self):
+        while not self._stopping.wait(HEALTH_INTERVAL):
+            for slot, worker in enumerate(list(self.slots)):
+                if self._stopping.is_set() or worker is None or worker is not self.slots[slot]:
+                    continue
+                if not worker.alive():
+                    print(f"serve: worker {slot} (pid {worker.process.pid}) exited with "
+                          f"{worker.process.returncode}, restarting", file=sys.stderr)
+                    worker.healthy = False
+                    self._replace(slot, worker)
+                elif not worker.check() and worker.failures >= HEALTH_FAILURES and \
+                        time.monotonic() - worker.started_at > STARTUP_TIMEOUT:
+                    print(f"serve: worker {slot} (pid {worker.process.pid}) failed "
+                          f"{worker.failures} health checks, replacing", file=sys.stderr)
+                    self._replace(slot, worker)
+
+    def rolling_restart(self):
+        """Replace the workers one at a time without dropping capacity to zero"""
+        if not self._restarting.acquire(blocking=False):
+            return
+        try:
+            for slot in range(self.size):
+                if self._stopping.is_set():
+                    break
+                if not self._replace(slot, self.slots[slot]):
+                    print(f"serve: replacement for worker {slot} failed its health check; "
+                          f"keeping the old one and stopping the restart", file=sys.stderr)
+                    break
+            else:
+                print("serve: rolling restart complete", file=sys.stderr)
+        finally:
+            self._restarting.release()
+
+    def stop(self):
+        self._stopping.set()
+        workers = [w for w in self.slots if w is not None]
+        for worker in workers:
+            if worker.alive():
+                worker.process.terminate()
+        for worker in workers:
+            worker.stop()
+
+    def healthy(self):
+        return [w for w in self.slots if w is not None and w.healthy]
+
+    def choose(self, key):
+        """The healthy worker for a routing key (round-robin without one), or None"""
+        workers = self.healthy()
+        if not workers:
+            return None
+        if key is None:
+            return workers[next(self._round_robin) % len(workers)]
+        return max(workers, key=lambda w: hashlib.blake2b(f'{key}:{w.slot}'.encode(), digest_size=8).digest())
+
+    def status(self):
+        return [{'slot': w.slot, 'pid': w.process.pid, 'port': w.port, 'healthy': w.healthy}
+                for w in self.slots if w is not None]
+
+
+def _session_hash(target, headers, body):
+    """Gradio's session_hash from the query string or a JSON request body, if present"""
+    values = parse_qs(urlsplit(target).query).get('session_hash')
+    if values:
+        return values[0]
+    if body and 'json' in headers.get('content-type', ''):
+        try:
+            payload = json.loads(body)
+        except ValueError:
+            return None
+        if isinstance(payload, dict) and isinstance(payload.get('session_hash'), str):
+            return payload['session_hash']
+    return None
+
+
+async def _pipe(reader, writer):
+    try:
+        while True:
+            chunk = await reader.read(65536)
+            if not chunk:
+                break
+            writer.write(chunk)
+            await writer.drain()
+    except (ConnectionError, asyncio.IncompleteReadError):
+        pass
+    finally:
+        try:
+            writer.write_eof()
+        except (OSError, RuntimeError):
+            pass
+
+
+def _simple_response(writer, status, body, content_type='application/json'):
+    writer.write(f'HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\n'
+                 f'Content-Length: {len(body)}\r\nConnection: close\r\n\r\n'.encode('latin-1') + body)
+
+
+async def _proxy(supervisor, client_reader, client_writer):
+    """Forward one client connection (one request, or an upgraded stream) to a worker"""
+    try:
+        head = await client_reader.readuntil(b'\r\n\r\n')
+    except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+        client_writer.close()
+        return
+    lines = head.decode('latin-1').split('\r\n')
+    try:
+        method, target, _ = lines[0].split(' ', 2)
+    except ValueError:
+        _simple_response(client_writer, '400 Bad Request', b'{"error": "bad request"}')
+        client_writer.close()
+        return
+    headers = {}
+    for line in lines[1:]:
+        if ':' in line:
+            name, value = line.split(':', 1)
+            headers[name.strip().lower()] = value.strip()
+
+    if method == 'GET' and urlsplit(target).path == '/healthz':
+        workers = supervisor.status()
+        ok = any(w['healthy'] for w in workers)
+        _simple_response(client_writer, '200 OK' if ok else '503 Service Unavailable',
+                         json.dumps({'status': 'ok' if ok else 'unavailable', 'workers': workers}).encode())
+        await client_writer.drain()
+        client_writer.close()
+        return
+
+    body = b''
+    length = int(headers.get('content-length') or 0)
+    if 0 < length <= MAX_ROUTING_BODY and 'json' in headers.get('content-type', ''):
+        try:
+            body = await client_reader.readexactly(length)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            client_writer.close()
+            return
+
+    worker = supervisor.choose(_session_hash(target, headers, body))
+    if worker is None:
+        _simple_response(client_writer, '503 Service Unavailable', b'{"error": "no healthy workers"}')
+        await client_writer.drain()
+        client_writer.close()
+        return
+    try:
+        backend_reader, backend_writer = await asyncio.open_connection('127.0.0.1', worker.port)
+    except OSError:
+        _simple_response(client_writer, '502 Bad Gateway', b'{"error": "worker unavailable"}')
+        await client_writer.drain()
+        client_writer.close()
+        return
+
+    # One request per connection, unless the client is upgrading (websockets)
+    forwarded = [lines[0]]
+    upgrade = 'upgrade' in headers.get('connection', '').lower()
+    for line in lines[1:]:
+        name = line.split(':', 1)[0].strip().lower()
+        if not line or name in ('x-forwarded-for', 'x-forwarded-proto') or (name == 'connection' and not upgrade):
+            continue
+        forwarded.append(line)
+    peer = client_writer.get_extra_info('peername')
+    if peer:
+        forwarded.append(f'X-Forwarded-For: {peer[0]}')
+    if not upgrade:
+        forwarded.append('Connection: close')
+    backend_writer.write(('\r\n'.join(forwarded) + '\r\n\r\n').encode('latin-1') + body)
+
+    upstream = asyncio.ensure_future(_pipe(client_reader, backend_writer))
+    await _pipe(backend_reader, client_writer)
+    upstream.cancel()
+    for writer in (backend_writer, client_writer):
+        writer.close()
+
+
+async def _serve(supervisor, host, port):
+    loop = asyncio.get_running_loop()
+    stopped = asyncio.Event()
+    loop.add_signal_handler(signal.SIGTERM, stopped.set)
+    loop.add_signal_handler(signal.SIGINT, stopped.set)
+    loop.add_signal_handler(
+        signal.SIGHUP, lambda: threading.Thread(target=supervisor.rolling_restart, daemon=True).start())
+
+    connections = set()
+
+    async def handle(reader, writer):
+        task = asyncio.current_task()
+        connections.add(task)
+        try:
+            await _proxy(supervisor, reader, writer)
+        except asyncio.CancelledError:
+            # Shutting down: drop connections still open, such as event streams
+            writer.close()
+        finally:
+            connections.discard(task)
+
+    server = await asyncio.start_server(handle, host, port)
+    print(f"serve: listening on http://{host}:{port} with {supervisor.size} worker(s), pid {os.getpid()}",
+          file=sys.stderr)
+    await stopped.wait()
+    server.close()
+    for task in list(connections):
+        task.cancel()
+    await asyncio.gather(*connections, return_exceptions=True)
+
+
+def prepare():
+    """One-time setup done before the workers start, so they don't race on it"""
+    import database
+    import glossary_index
+    database.initialize_db()
+    database.close_db()
+    glossary_index.load_index()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the app in several worker processes")
+    subcommands = parser.add_subparsers(dest='command')
+    worker_parser = subcommands.add_parser('worker', help="run one worker (started by the supervisor)")
+    worker_parser.add_argument('--port', type=int, required=True)
+    parser.add_argument('--workers', type=int, default=SERVE_WORKERS)
+    parser.add_argument('--host', default=SERVE_HOST)
+    parser.add_argument('--port', type=int, default=SERVE_PORT)
+    parser.add_argument('--worker-base-port', type=int, default=WORKER_BASE_PORT)
+    args = parser.parse_args(argv)
+
+    if args.command == 'worker':
+        run_worker(args.port)
+        return
+
+    prepare()
+    supervisor = Supervisor(max(1, args.workers), args.worker_base_port)
+    supervisor.start()
+    try:
+        asyncio.run(_serve(supervisor, args.host, args.port))
+    finally:
+        supervisor.stop()
+
+
+if __name__ == '__main__':
+    main()
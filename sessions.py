@@ -0,0 +1,119 @@
+import os
+import secrets
+import threading
+import time
+
+import database as db
+from ttl_cache import TTLCache
+
+# Session lifetime, in-memory table size and persistence can be set from the environment
+SESSION_TTL = float(os.environ.get('FINSENTIO_SESSION_TTL', str(12 * 60 * 60)))
+SESSION_MAX = int(os.environ.get('FINSENTIO_SESSION_MAX', '10000'))
+SESSION_PERSIST = os.environ.get('FINSENTIO_SESSION_PERSIST', '0') == '1'
+# Seconds a persisted session may be served from process memory; 0 reads SQLite on
+# every lookup, so a logout in one worker process is seen by all the others
+_local_ttl = os.environ.get('FINSENTIO_SESSION_LOCAL_TTL')
+SESSION_LOCAL_TTL = float(_local_ttl) if _local_ttl else None
+
+# Expired rows are purged from the sessions table once every this many logins
+PURGE_EVERY = 500
+
+
+class SessionStore:
+    """Maps opaque session tokens to user ids.
+
+    Sessions live in a bounded LRU table with a TTL. With ``persist=True`` they
+    are also written to the ``sessions`` table, so they survive restarts and a
+    token evicted from memory is reloaded from SQLite on its next use.
+    ``local_ttl`` caps how long a persisted session is trusted from memory.
+    """
+
+    def __init__(self, ttl=SESSION_TTL, max_sessions=SESSION_MAX, persist=SESSION_PERSIST,
+                 local_ttl=SESSION_LOCAL_TTL):
+        self.ttl = ttl
+        self.persist = persist
+        self.local_ttl = ttl if local_ttl is None or not persist else min(ttl, local_ttl)
+        self._cache = TTLCache(maxsize=max_sessions if self.local_ttl > 0 else 0, ttl=self.local_ttl)
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def create(self, user_id):
+        """Start a session for a user and return its token"""
+        token = secrets.token_urlsafe(32)
+        self._cache.set(token, user_id)
+        if self.persist:
+            with db.get_db_connection() as conn:
+                conn.execute(
+                    'INSERT INTO sessions (token, user_id, expires_at) VALUES (?, ?, ?)',
+                    (token, user_id, time.time() + self.ttl)
+                )
+                conn.commit()
+            with self._lock:
+                self._created += 1
+                purge = self._created % PURGE_EVERY == 0
+            if purge:
+                self.purge_expired()
+        return token
+
+    def get_user(self, token):
+        """Return the user id for a token, or None if it is unknown or expired"""
+        if not token:
+            return None
+        user_id = self._cache.get(token)
+        if user_id is not None or not self.persist:
+            return user_id
+
+        with db.get_db_connection() as conn:
+            row = conn.execute(
+                'SELECT user_id, expires_at FROM sessions WHERE token = ?', (token,)
+            ).fetchone()
+        if row is None:
+            return None
+        remaining = row['expires_at'] - time.time()
+        if remaining <= 0:
+            return None
+        self._cache.set(token, row['user_id'], ttl=min(remaining, self.local_ttl))
+        return row['user_id']
+
+    def delete(self, token):
+        """End a session"""
+        if not token:
+            return
+        self._cache.pop(token)
+        if self.persist:
+            with db.get_db_connection() as conn:
+                conn.execute('DELETE FROM sessions WHERE token = ?', (token,))
+                conn.commit()
+
+    async def create_async(self, user_id):
+        """create without blocking the event loop"""
+        if not self.persist:
+            return self.create(user_id)
+        return await db.run_async(self.create, user_id)
+
+    async def get_user_async(self, token):
+        """get_user without blocking the event loop; only a SQLite lookup leaves it"""
+        if not token:
+            return None
+        user_id = self._cache.get(token)
+        if user_id is not None or not self.persist:
+            return user_id
+        return await db.run_async(self.get_user, token)
+
+    async def delete_async(self, token):
+        """delete without blocking the event loop"""
+        if not self.persist:
+            return self.delete(token)
+        return await db.run_async(self.delete, token)
+
+    def purge_expired(self):
+        """Delete expired rows from the sessions table"""
+        with db.get_db_connection() as conn:
+            conn.execute('DELETE FROM sessions WHERE expires_at <= ?', (time.time(),))
+            conn.commit()
+
+    def stats(self):
+        return self._cache.stats()
+
+    def __len__(self):
+        return len(self._cache)
@@ -0,0 +1,6 @@
+import os
+import sys
+
+# Tests share one in-memory database; set before database is imported
+os.environ.setdefault('FINSENTIO_DB_PATH', ':memory:')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
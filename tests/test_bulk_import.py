@@ -0,0 +1,36 @@
+import json
+
+import bulk_import
+import database as db
+
+
+def _import(tmp_path, lines):
+    path = tmp_path / 'users.jsonl'
+    path.write_text('\n'.join(lines) + '\n', encoding='utf-8')
+    return list(bulk_import.register_users_bulk(bulk_import.read_users(str(path)), workers=0))
+
+
+def _user(username, email):
+    return json.dumps({'username': username, 'email': email, 'password': 'password123'})
+
+
+def test_malformed_line_fails_only_that_row(tmp_path):
+    results = _import(tmp_path, [
+        _user('bulk_before', 'bulk_before@example.com'),
+        '{"username": "bulk_broken", "email": ',
+        _user('bulk_after', 'bulk_after@example.com'),
+    ])
+    assert [(row, success) for row, _, success, _ in results] == [(0, True), (1, False), (2, True)]
+    assert results[1][3].startswith("Invalid JSON on line 2")
+    assert db.authenticate_user('bulk_after', 'password123')[0]
+
+
+def test_numeric_username_is_reported(tmp_path):
+    results = _import(tmp_path, [
+        json.dumps({'username': 12345, 'email': 'bulk_numeric@example.com', 'password': 'password123'}),
+        json.dumps(['not', 'an', 'object']),
+        _user('bulk_valid', 'bulk_valid@example.com'),
+    ])
+    assert results[0] == (0, '12345', False, "Username, email and password must be text")
+    assert results[1][2] is False
+    assert results[2][2] is True
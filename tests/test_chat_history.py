@@ -0,0 +1,33 @@
+import asyncio
+
+import gradio as gr
+
+import app
+import database as db
+
+
+def _send(token, view, message):
+    for chat, view in app.education_chatbot(message, token, view):
+        pass
+    return chat, view
+
+
+def test_load_earlier_after_clear_stays_cleared():
+    db.register_user('chat_clear', 'password123', 'chat_clear@example.com')
+    user_id = db.authenticate_user('chat_clear', 'password123')[1]
+    token = app.get_sessions().create(user_id)
+
+    view = dict(app.CHAT_VIEW_START)
+    for message in ("first question", "second question"):
+        chat, view = _send(token, view, message)
+    assert [pair[0] for pair in chat] == ["first question", "second question"]
+
+    chat, view = asyncio.run(app.clear_chat('education', token))
+    assert chat == []
+    earlier, view = asyncio.run(app.load_earlier_messages('education', token, view))
+    assert earlier == gr.update()
+
+    chat, view = _send(token, view, "after clear")
+    assert [pair[0] for pair in chat] == ["after clear"]
+    earlier, view = asyncio.run(app.load_earlier_messages('education', token, view))
+    assert earlier == gr.update()
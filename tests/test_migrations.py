@@ -0,0 +1,43 @@
+import json
+import random
+import sqlite3
+
+import migrations
+import risk_scoring
+from benchmarks.seed import random_profile
+
+
+def _migrate_to(conn, version):
+    steps = migrations.MIGRATIONS
+    migrations.MIGRATIONS = [step for step in steps if step[0] <= version]
+    try:
+        return migrations.migrate(conn)
+    finally:
+        migrations.MIGRATIONS = steps
+
+
+def test_fresh_database_reaches_latest_version():
+    conn = sqlite3.connect(':memory:')
+    assert migrations.migrate(conn) == 8
+    assert migrations.current_version(conn) == 8
+    assert migrations.migrate(conn) == 8
+
+
+def test_risk_columns_migration_scores_existing_profiles():
+    conn = sqlite3.connect(':memory:')
+    assert _migrate_to(conn, 3) == 3
+    profiles = [random_profile(random.Random(i)) for i in range(1, 51)]
+    for i, profile in enumerate(profiles, 1):
+        conn.execute("INSERT INTO users (username, password_hash, email) VALUES (?, 'x', ?)", (f'u{i}', f'u{i}@x'))
+        conn.execute('INSERT INTO user_profiles (user_id, profile_data) VALUES (?, ?)', (i, json.dumps(profile)))
+    conn.commit()
+
+    assert migrations.migrate(conn) == 8
+    rows = conn.execute('SELECT user_id, risk_score, risk_category FROM user_profiles ORDER BY user_id').fetchall()
+    for (user_id, score, category), profile in zip(rows, profiles):
+        expected_score, expected_category = risk_scoring.score_profile(profile)
+        assert score == expected_score
+        assert category == expected_category
+    # The cohort counters built by the later migration see the categories
+    counted = conn.execute("SELECT SUM(count) FROM answer_counts WHERE question = 'risk_taker'").fetchone()[0]
+    assert counted == 2 * len(profiles)
@@ -0,0 +1,17 @@
+from types import SimpleNamespace
+
+import numpy as np
+
+import portfolio_analytics
+
+
+def test_daily_returns_carry_prices_across_a_gap():
+    dataset = SimpleNamespace(prices=np.array([[100.0, 50.0], [np.nan, 55.0], [110.0, 55.0]]))
+    returns = portfolio_analytics.daily_returns(dataset)
+    np.testing.assert_allclose(returns, [[0.0, 0.1], [0.1, 0.0]])
+
+
+def test_daily_returns_leading_gap_is_flat():
+    dataset = SimpleNamespace(prices=np.array([[np.nan], [np.nan], [100.0], [120.0]]))
+    returns = portfolio_analytics.daily_returns(dataset)
+    np.testing.assert_allclose(returns[:, 0], [0.0, 0.0, 0.2])
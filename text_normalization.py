@@ -0,0 +1,35 @@
+"""Question normalization shared by the answer cache and the glossary index.
+
+Lower-cases, expands common contractions, strips punctuation and applies a
+light suffix stemmer, so "What's an ETF?" and "what is an etf" compare equal.
+"""
+import re
+
+_CONTRACTIONS = {
+    "what's": "what is", "whats": "what is", "what're": "what are", "how's": "how is",
+    "who's": "who is", "where's": "where is", "it's": "it is", "isn't": "is not",
+    "aren't": "are not", "don't": "do not", "doesn't": "does not", "can't": "can not",
+    "i'm": "i am", "you're": "you are", "let's": "let us",
+}
+_CONTRACTION_RE = re.compile(r"\b(" + "|".join(re.escape(c) for c in _CONTRACTIONS) + r")\b")
+_PUNCTUATION_RE = re.compile(r"[^\w\s]")
+
+
+def _stem(word):
+    """A deliberately small suffix stemmer: enough to merge plurals and verb forms"""
+    if len(word) <= 4:
+        return word
+    for suffix, replacement in (('ies', 'y'), ('sses', 'ss'), ('ing', ''), ('ed', ''), ('es', ''), ('s', '')):
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            if suffix == 's' and word.endswith('ss'):
+                return word
+            return word[:-len(suffix)] + replacement
+    return word
+
+
+def normalize_question(question):
+    """Canonical form of a question, used as cache key and glossary lookup key"""
+    text = question.lower().replace('’', "'")
+    text = _CONTRACTION_RE.sub(lambda m: _CONTRACTIONS[m.group(0)], text)
+    text = _PUNCTUATION_RE.sub(' ', text)
+    return ' '.join(_stem(word) for word in text.split())
@@ -0,0 +1,163 @@
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+import metrics
+
+
+class WriteQueueFull(Exception):
+    """Raised when too many writes are already waiting to be committed"""
+
+
+class WriteQueueClosed(Exception):
+    """Raised when a write is submitted after the queue was closed"""
+
+
+class WriteBehindQueue:
+    """A single writer thread that applies queued writes in group commits.
+
+    Each write is a function ``fn(conn, *args)`` run on the writer's own
+    connection. Writes are batched into one transaction, committed once the
+    batch reaches ``max_batch`` writes or the oldest has waited ``max_delay``
+    seconds, so a burst of saves costs one commit (and one fsync) instead of
+    one each, and only one connection ever holds the SQLite write lock.
+
+    A write submitted with a ``key`` replaces a not-yet-committed write with
+    the same key, so repeated saves of one profile are written once, in the
+    position of the latest. One failing write doesn't abort the rest of its
+    batch. ``submit`` returns a Future that resolves after the commit.
+    """
+
+    def __init__(self, pool, max_batch=256, max_delay=0.01, max_pending=10000):
+        self.pool = pool
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.max_pending = max_pending
+        self._pending = OrderedDict()   # key -> [fn, args, futures, queued_at]
+        self._condition = threading.Condition()
+        self._closed = False
+        self._sequence = 0
+        self._in_flight = []
+        self._thread = threading.Thread(target=self._run, name='write-behind', daemon=True)
+        self._thread.start()
+
+    def submit(self, key, fn, *args):
+        """Queue fn(conn, *args) and return a Future of its result; key=None never coalesces"""
+        future = Future()
+        with self._condition:
+            if self._closed:
+                raise WriteQueueClosed("Write queue is closed")
+            if key is not None and key in self._pending:
+                entry = self._pending[key]
+                entry[0], entry[1] = fn, args
+                entry[2].append(future)
+                # Apply it after any other write queued since the one it replaces
+                self._pending.move_to_end(key)
+                metrics.inc('finsentio_write_behind_coalesced_total', 'queue=main')
+                return future
+            if len(self._pending) >= self.max_pending:
+                raise WriteQueueFull("Too many database writes in progress")
+            if key is None:
+                self._sequence += 1
+                key = ('write', self._sequence)
+            self._pending[key] = [fn, args, [future], time.monotonic()]
+            if len(self._pending) == 1 or len(self._pending) >= self.max_batch:
+                self._condition.notify()
+        return future
+
+    def _take_batch(self):
+        """Wait for a full batch or the oldest write's deadline; None once closed and drained"""
+        with self._condition:
+            while True:
+                if self._pending:
+                    oldest = next(iter(self._pending.values()))[3]
+                    wait = oldest + self.max_delay - time.monotonic()
+                    if len(self._pending) >= self.max_batch or wait <= 0 or self._closed:
+                        break
+                    self._condition.wait(wait)
+                elif self._closed:
+                    return None
+                else:
+                    self._condition.wait()
+            batch = []
+            while self._pending and len(batch) < self.max_batch:
+                batch.append(self._pending.popitem(last=False)[1])
+            self._in_flight = batch
+            return batch
+
+    def _apply(self, conn, batch):
+        """Run one batch in a transaction; returns [(futures, result, error)].
+
+        The batch first runs without savepoints; only if one of its writes
+        fails is it retried with every write in its own savepoint.
+        """
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            outcomes = [(futures, fn(conn, *args), None) for fn, args, futures, _ in batch]
+        except Exception:
+            conn.rollback()
+        else:
+            conn.commit()
+            return outcomes
+
+        outcomes = []
+        conn.execute('BEGIN IMMEDIATE')
+        for fn, args, futures, _ in batch:
+            conn.execute('SAVEPOINT write')
+            try:
+                result = fn(conn, *args)
+            except Exception as e:
+                conn.execute('ROLLBACK TO write')
+                outcomes.append((futures, None, e))
+            else:
+                outcomes.append((futures, result, None))
+            conn.execute('RELEASE write')
+        conn.commit()
+        return outcomes
+
+    def _run(self):
+        while True:
+            batch = self._take_batch()
+            if batch is None:
+                return
+            started = time.perf_counter()
+            try:
+                with self.pool.connection() as conn:
+                    outcomes = self._apply(conn, batch)
+            except Exception as e:
+                # The whole transaction failed, e.g. still locked after busy_timeout
+                outcomes = [(futures, None, e) for _, _, futures, _ in batch]
+            else:
+                metrics.observe('finsentio_write_behind_commit_seconds', 'queue=main',
+                                time.perf_counter() - started)
+                metrics.inc('finsentio_write_behind_commits_total', 'queue=main')
+                metrics.inc('finsentio_write_behind_writes_total', 'queue=main', len(batch))
+            for futures, result, error in outcomes:
+                for future in futures:
+                    if error is None:
+                        future.set_result(result)
+                    else:
+                        future.set_exception(error)
+
+    def flush(self, timeout=None):
+        """Block until every write submitted so far is committed (or failed)"""
+        with self._condition:
+            entries = self._in_flight + list(self._pending.values())
+            futures = [f for entry in entries for f in entry[2]]
+            self._condition.notify()
+        for future in futures:
+            try:
+                future.result(timeout)
+            except Exception:
+                pass
+
+    def close(self, timeout=None):
+        """Commit the queued writes and stop the writer thread"""
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+        self._thread.join(timeout)
+
+    def __len__(self):
+        return len(self._pending)